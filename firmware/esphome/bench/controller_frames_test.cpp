@@ -0,0 +1,177 @@
+// controller_frames_test.cpp
+//
+// Host test of the precomputed controller frames in controller_frames.h.
+//
+// ControllerFrames is built for every power level and every frame kind. Each
+// frame must match the frame assembled byte by byte from its fields, with the
+// checksum computed by FrameDecoder. Every distinct short frame of the capture must then be
+// exactly the frame ControllerFrames sends for its kind and level, and every
+// kind must occur in the capture. Mismatches are printed and the exit status
+// is non-zero.
+//
+// Build and run from the repository root:
+//   g++ -O2 -std=c++17 -I firmware/esphome/components/vevorheater
+//       firmware/esphome/bench/controller_frames_test.cpp -o /tmp/controller_frames_test
+//   /tmp/controller_frames_test docs/communication/log_start_running_stop.txt
+
+#include <algorithm>
+#include <cstdio>
+#include <cstdlib>
+#include <fstream>
+#include <set>
+#include <sstream>
+#include <string>
+#include <vector>
+
+#include "controller_frames.h"
+#include "frame_decoder.h"
+
+using namespace esphome::vevorheater;
+
+static const uint8_t MIN_LEVEL = 1;
+static const uint8_t MAX_LEVEL = 10;
+// The level of the SET_OFF and KEEP_COOLING frames never changes
+static const uint8_t FIXED_LEVEL = 10;
+
+static const char *const KIND_NAMES[FRAME_KIND_COUNT] = {"SET_OFF", "KEEP_COOLING", "SET_ON", "RUNNING"};
+
+// Command and requested state bytes of each kind, as documented in the README
+struct KindBytes {
+  uint8_t command;
+  uint8_t requested_state;
+};
+static const KindBytes KIND_BYTES[FRAME_KIND_COUNT] = {{0x06, 0x05}, {0x02, 0x02}, {0x06, 0x06}, {0x02, 0x08}};
+
+static int failures = 0;
+
+static void print_frame(const char *label, const ControllerFrame &frame) {
+  std::printf("  %-12s", label);
+  for (uint8_t byte : frame)
+    std::printf(" %02X", byte);
+  std::printf("\n");
+}
+
+static void fail(const char *what, const ControllerFrame &got, const ControllerFrame &expected) {
+  std::printf("FAIL %s\n", what);
+  print_frame("got", got);
+  print_frame("expected", expected);
+  failures++;
+}
+
+// The frame assembled field by field, independently of make_controller_frame()
+static ControllerFrame reference_frame(ControllerFrameKind kind, uint8_t level) {
+  ControllerFrame frame{};
+  frame[0] = FRAME_START_BYTE;
+  frame[1] = CONTROLLER_ID;
+  frame[2] = KIND_BYTES[kind].command;
+  frame[3] = SHORT_LENGTH_FIELD;
+  frame[CONTROLLER_FRAME_LEVEL_INDEX] = level;
+  frame[CONTROLLER_FRAME_LEVEL_INDEX + 1] = KIND_BYTES[kind].requested_state;
+  frame[SHORT_FRAME_SIZE - 1] = FrameDecoder::checksum(frame.data(), frame.size());
+  return frame;
+}
+
+static bool levels_with(ControllerFrameKind kind) { return kind == FRAME_SET_ON || kind == FRAME_RUNNING; }
+
+static std::vector<uint8_t> read_capture(const char *path) {
+  std::ifstream in(path);
+  std::vector<uint8_t> bytes;
+  std::string line;
+  while (std::getline(in, line)) {
+    std::istringstream tokens(line);
+    std::string token;
+    while (tokens >> token) {
+      bytes.push_back(static_cast<uint8_t>(std::strtoul(token.c_str(), nullptr, 16)));
+    }
+  }
+  return bytes;
+}
+
+static void check_built_frames() {
+  ControllerFrames frames;
+  // Down and up again, so every level is also patched from a level above it
+  std::vector<uint8_t> levels;
+  for (uint8_t level = MAX_LEVEL; level >= MIN_LEVEL; level--)
+    levels.push_back(level);
+  for (uint8_t level = MIN_LEVEL; level <= MAX_LEVEL; level++)
+    levels.push_back(level);
+  for (uint8_t level : levels) {
+    frames.set_level(level);
+    for (int k = 0; k < FRAME_KIND_COUNT; k++) {
+      auto kind = static_cast<ControllerFrameKind>(k);
+      const ControllerFrame &frame = frames.get(kind);
+      char what[64];
+      std::snprintf(what, sizeof(what), "%s at level %u", KIND_NAMES[kind], level);
+      ControllerFrame expected = reference_frame(kind, levels_with(kind) ? level : FIXED_LEVEL);
+      if (frame != expected)
+        fail(what, frame, expected);
+    }
+  }
+}
+
+// Every distinct short frame of the capture against the frame sent for it
+static void check_capture(const std::vector<uint8_t> &stream) {
+  FrameDecoder decoder;
+  std::set<ControllerFrame> seen;
+  for (uint8_t byte : stream) {
+    for (bool complete = decoder.push(byte); complete; complete = decoder.next()) {
+      if (decoder.size() != SHORT_FRAME_SIZE || decoder.data()[1] != CONTROLLER_ID)
+        continue;
+      ControllerFrame frame;
+      std::copy(decoder.data(), decoder.data() + SHORT_FRAME_SIZE, frame.begin());
+      seen.insert(frame);
+    }
+  }
+
+  bool kind_seen[FRAME_KIND_COUNT] = {};
+  for (const ControllerFrame &logged : seen) {
+    int kind = -1;
+    for (int k = 0; k < FRAME_KIND_COUNT; k++) {
+      if (logged[2] == KIND_BYTES[k].command && logged[CONTROLLER_FRAME_LEVEL_INDEX + 1] == KIND_BYTES[k].requested_state)
+        kind = k;
+    }
+    uint8_t level = logged[CONTROLLER_FRAME_LEVEL_INDEX];
+    if (kind < 0 || level < MIN_LEVEL || level > MAX_LEVEL) {
+      std::printf("FAIL capture frame of no known kind and level\n");
+      print_frame("logged", logged);
+      failures++;
+      continue;
+    }
+    kind_seen[kind] = true;
+    ControllerFrames frames;
+    frames.set_level(level);
+    const ControllerFrame &sent = frames.get(static_cast<ControllerFrameKind>(kind));
+    char what[64];
+    std::snprintf(what, sizeof(what), "%s at level %u against the capture", KIND_NAMES[kind], level);
+    if (sent != logged)
+      fail(what, sent, logged);
+    else
+      print_frame(KIND_NAMES[kind], sent);
+  }
+  for (int k = 0; k < FRAME_KIND_COUNT; k++) {
+    if (!kind_seen[k]) {
+      std::printf("FAIL no %s frame in the capture\n", KIND_NAMES[k]);
+      failures++;
+    }
+  }
+  std::printf("%zu distinct controller frames in the capture\n", seen.size());
+}
+
+int main(int argc, char **argv) {
+  if (argc < 2) {
+    std::fprintf(stderr, "usage: %s capture.txt\n", argv[0]);
+    return 2;
+  }
+  std::vector<uint8_t> stream = read_capture(argv[1]);
+  if (stream.empty()) {
+    std::fprintf(stderr, "no bytes in %s\n", argv[1]);
+    return 2;
+  }
+  check_built_frames();
+  check_capture(stream);
+  if (failures == 0)
+    std::printf("OK\n");
+  else
+    std::printf("%d failure(s)\n", failures);
+  return failures == 0 ? 0 : 1;
+}
@@ -0,0 +1,178 @@
+// log_bench.cpp
+//
+// Host benchmark of the logging done per long frame by process_frame in each
+// log_mode of the VevorHeater component.
+//
+// Every long frame of a captured log is decoded the way process_frame does
+// and its log lines are formatted the way the ESPHome logger does, a
+// "[D][tag:line]: " prefix followed by the message, into a line buffer.
+// Reported are CPU time per frame and the log bytes per frame, which the
+// logger then writes to its UART: at 115200 baud every byte costs 87 us,
+// far more than the formatting. "fields" is the per-field logging every
+// frame got before log_mode existed; "summary 10s" is the default, one
+// summary line every tenth frame at one long frame per second. Sensor
+// publishing needs ESPHome and is not included.
+//
+// Build and run from the repository root:
+//   g++ -O2 -std=c++17 -I firmware/esphome/components/vevorheater
+//       firmware/esphome/bench/log_bench.cpp -o /tmp/log_bench
+//   /tmp/log_bench docs/communication/log_start_running_stop.txt
+
+#include <chrono>
+#include <cstdarg>
+#include <cstdio>
+#include <cstdlib>
+#include <fstream>
+#include <sstream>
+#include <string>
+#include <vector>
+
+#include "frame_decoder.h"
+
+using namespace esphome::vevorheater;
+
+// Capture passes per run, to get measurable times
+static const int REPEAT = 2000;
+static const double LOGGER_BAUD_RATE = 115200.0;
+
+enum Mode { MODE_NONE, MODE_SUMMARY_10S, MODE_SUMMARY, MODE_HEX, MODE_FIELDS, MODE_COUNT };
+static const char *const MODE_NAMES[] = {"none", "summary 10s", "summary", "hex", "fields"};
+
+struct Logger {
+  char line[512];
+  size_t bytes{0};
+
+  void log(const char *format, ...) __attribute__((format(printf, 2, 3))) {
+    int prefix = std::snprintf(this->line, sizeof(this->line), "[D][vevorheater.component:%03d]: ", 100);
+    va_list args;
+    va_start(args, format);
+    int message = std::vsnprintf(this->line + prefix, sizeof(this->line) - prefix, format, args);
+    va_end(args);
+    this->bytes += prefix + message + 2;  // CR LF
+  }
+};
+
+static std::vector<uint8_t> read_capture(const char *path) {
+  std::ifstream in(path);
+  std::vector<uint8_t> bytes;
+  std::string line;
+  while (std::getline(in, line)) {
+    std::istringstream tokens(line);
+    std::string token;
+    while (tokens >> token) {
+      bytes.push_back(static_cast<uint8_t>(std::strtoul(token.c_str(), nullptr, 16)));
+    }
+  }
+  return bytes;
+}
+
+static uint16_t read_uint16(const uint8_t *frame, size_t index) {
+  return (static_cast<uint16_t>(frame[index]) << 8) | frame[index + 1];
+}
+
+static std::string format_hex_pretty(const uint8_t *data, size_t length) {
+  static const char *const DIGITS = "0123456789ABCDEF";
+  std::string out;
+  out.reserve(length * 3);
+  for (size_t i = 0; i < length; i++) {
+    out += DIGITS[data[i] >> 4];
+    out += DIGITS[data[i] & 0x0F];
+    out += i + 1 < length ? '.' : ' ';
+  }
+  out += "(" + std::to_string(length) + ")";
+  return out;
+}
+
+static void process_long_frame(const uint8_t *frame, Mode mode, bool due, Logger &logger) {
+  bool log_fields = due && mode == MODE_FIELDS;
+  if (due && mode == MODE_HEX)
+    logger.log("Frame %s", format_hex_pretty(frame, LONG_FRAME_SIZE).c_str());
+  if (log_fields)
+    logger.log("Processing Long Frame");
+
+  uint8_t heater_enabled = frame[4];
+  uint8_t state = frame[5];
+  uint8_t power_level = frame[6] * 10;
+  float input_voltage = frame[11] / 10.0;
+  uint8_t glow_plug_current = frame[13];
+  uint8_t cooling_down = frame[14];
+  float fan_voltage = frame[15] / 1.0;
+  float heat_exchanger_temp = static_cast<int16_t>(read_uint16(frame, 16)) / 10.0;
+  uint16_t state_duration_raw = read_uint16(frame, 20);
+  float pump_frequency = frame[23] / 10.0;
+  uint8_t glow_plug_voltage = frame[24];
+  uint8_t glow_plug_current_2 = frame[25];
+  uint8_t glow_plug_temperature = frame[26];
+  uint16_t fan_speed_raw = read_uint16(frame, 28);
+
+  if (log_fields) {
+    logger.log("Long Frame - Heater Enabled: %u", heater_enabled);
+    logger.log("Long Frame - State: %u", state);
+    logger.log("Long Frame - Power Level: %u%%", power_level);
+    logger.log("Long Frame - Input Voltage: %.1f V", input_voltage);
+    logger.log("Long Frame - Glow Plug Current: %u A", glow_plug_current);
+    logger.log("Long Frame - Cooling Down: %u", cooling_down);
+    logger.log("Long Frame - Fan Voltage: %.1f V", fan_voltage);
+    logger.log("Long Frame - Heat Exchanger Temperature: %.2f °C", heat_exchanger_temp);
+    logger.log("Long Frame - State Duration: %us", state_duration_raw);
+    logger.log("Long Frame - Pump Frequency: %.1f Hz", pump_frequency);
+    logger.log("Long Frame - Glow Plug Voltage: %u V", glow_plug_voltage);
+    logger.log("Long Frame - Glow Plug Current 2: %u A", glow_plug_current_2);
+    logger.log("Long Frame - Glow Plug Temperature: %u °C", glow_plug_temperature);
+    logger.log("Long Frame - Fan Speed: %u RPM", fan_speed_raw);
+  }
+  if (due && (mode == MODE_SUMMARY || mode == MODE_SUMMARY_10S)) {
+    logger.log("State %u, level %u%%, heat exchanger %.1f °C, input %.1f V, pump %.1f Hz, fan %u rpm", state,
+               power_level, heat_exchanger_temp, input_voltage, pump_frequency, fan_speed_raw);
+  }
+}
+
+static double run(const std::vector<std::vector<uint8_t>> &frames, Mode mode, size_t *bytes_out) {
+  Logger logger;
+  uint32_t sink = 0;
+  auto start = std::chrono::steady_clock::now();
+  size_t n = 0;
+  for (int pass = 0; pass < REPEAT; pass++) {
+    for (const auto &frame : frames) {
+      bool due = mode != MODE_NONE && (mode != MODE_SUMMARY_10S || n % 10 == 0);
+      process_long_frame(frame.data(), mode, due, logger);
+      sink += logger.line[0];
+      n++;
+    }
+  }
+  auto elapsed = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+  if (sink == 1)
+    std::printf("(sink)\n");
+  *bytes_out = logger.bytes;
+  return elapsed;
+}
+
+int main(int argc, char **argv) {
+  if (argc < 2) {
+    std::fprintf(stderr, "usage: %s CAPTURE\n", argv[0]);
+    return 2;
+  }
+  std::vector<uint8_t> stream = read_capture(argv[1]);
+  FrameDecoder decoder;
+  std::vector<std::vector<uint8_t>> frames;
+  for (uint8_t byte : stream) {
+    if (decoder.push(byte) && decoder.size() == LONG_FRAME_SIZE)
+      frames.emplace_back(decoder.data(), decoder.data() + LONG_FRAME_SIZE);
+  }
+  if (frames.empty()) {
+    std::fprintf(stderr, "no long frames in %s\n", argv[1]);
+    return 1;
+  }
+
+  std::printf("%zu long frames x %d passes\n", frames.size(), REPEAT);
+  std::printf("%12s %10s %12s %16s\n", "log_mode", "ns/frame", "bytes/frame", "us UART/frame");
+  for (int mode = 0; mode < MODE_COUNT; mode++) {
+    size_t bytes = 0;
+    double elapsed = run(frames, static_cast<Mode>(mode), &bytes);
+    double count = static_cast<double>(frames.size()) * REPEAT;
+    double bytes_per_frame = bytes / count;
+    std::printf("%12s %10.1f %12.1f %16.1f\n", MODE_NAMES[mode], elapsed * 1e9 / count, bytes_per_frame,
+                bytes_per_frame * 10 / LOGGER_BAUD_RATE * 1e6);
+  }
+  return 0;
+}
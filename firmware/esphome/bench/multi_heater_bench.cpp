@@ -0,0 +1,118 @@
+// multi_heater_bench.cpp
+//
+// Host benchmark of the per-heater receive and transmit work of the
+// VevorHeater component when several heaters share one node.
+//
+// Every simulated heater owns a FrameDecoder and ControllerFrames and is fed
+// the bytes of a captured log, the same way receive_() drains its UART in
+// receive_mode loop: at most MAX_BYTES_PER_RECEIVE bytes per main loop pass,
+// heaters served in turn.
+// Reported are CPU time per frame and per heater, and the RAM these parts
+// take per heater. Sensor publishing (process_frame) needs ESPHome and is not
+// included; sizes are for the host ABI, pointers are half as wide on the C3.
+//
+// Build and run from the repository root:
+//   g++ -O2 -std=c++17 -I firmware/esphome/components/vevorheater
+//       firmware/esphome/bench/multi_heater_bench.cpp -o /tmp/multi_heater_bench
+//   /tmp/multi_heater_bench docs/communication/log_start_running_stop.txt 8
+
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <fstream>
+#include <sstream>
+#include <string>
+#include <vector>
+
+#include "controller_frames.h"
+#include "frame_decoder.h"
+
+using namespace esphome::vevorheater;
+
+static const size_t MAX_BYTES_PER_RECEIVE = LONG_FRAME_SIZE;
+// Capture passes per run, to get measurable times
+static const int REPEAT = 200;
+
+struct Heater {
+  FrameDecoder decoder;
+  ControllerFrames frames;
+  size_t offset{0};
+  uint32_t checksum{0};  // keeps the work from being optimized away
+};
+
+static std::vector<uint8_t> read_capture(const char *path) {
+  std::ifstream in(path);
+  std::vector<uint8_t> bytes;
+  std::string line;
+  while (std::getline(in, line)) {
+    std::istringstream tokens(line);
+    std::string token;
+    while (tokens >> token) {
+      bytes.push_back(static_cast<uint8_t>(std::strtoul(token.c_str(), nullptr, 16)));
+    }
+  }
+  return bytes;
+}
+
+static double run(const std::vector<uint8_t> &stream, size_t heater_count, uint32_t *frames_out) {
+  std::vector<Heater> heaters(heater_count);
+  size_t total = stream.size() * REPEAT;
+  auto start = std::chrono::steady_clock::now();
+  bool busy = true;
+  while (busy) {
+    busy = false;
+    // One main loop pass: every heater drains up to its byte budget
+    for (auto &heater : heaters) {
+      for (size_t budget = MAX_BYTES_PER_RECEIVE; budget > 0 && heater.offset < total; budget--) {
+        uint8_t byte = stream[heater.offset++ % stream.size()];
+        if (heater.decoder.push(byte)) {
+          heater.checksum += heater.decoder.data()[heater.decoder.size() - 1];
+          // Every completed long frame stands for one transmit slot
+          if (heater.decoder.size() == LONG_FRAME_SIZE) {
+            heater.frames.set_level(heater.decoder.data()[6]);
+            heater.checksum += heater.frames.get(FRAME_RUNNING)[SHORT_FRAME_SIZE - 1];
+          }
+        }
+      }
+      busy |= heater.offset < total;
+    }
+  }
+  auto elapsed = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+  uint32_t frames = 0;
+  uint32_t checksum = 0;
+  for (auto &heater : heaters) {
+    frames += heater.decoder.frames();
+    checksum += heater.checksum;
+  }
+  *frames_out = frames;
+  if (checksum == 0)
+    std::printf("(checksum 0)\n");
+  return elapsed;
+}
+
+int main(int argc, char **argv) {
+  if (argc < 2) {
+    std::fprintf(stderr, "usage: %s CAPTURE [MAX_HEATERS]\n", argv[0]);
+    return 2;
+  }
+  std::vector<uint8_t> stream = read_capture(argv[1]);
+  size_t max_heaters = argc > 2 ? std::strtoul(argv[2], nullptr, 10) : 4;
+  if (stream.empty()) {
+    std::fprintf(stderr, "no bytes in %s\n", argv[1]);
+    return 1;
+  }
+
+  std::printf("RAM per heater: decoder %zu B, controller frames %zu B\n", sizeof(FrameDecoder),
+              sizeof(ControllerFrames));
+  std::printf("%8s %10s %10s %18s %14s\n", "heaters", "frames", "ns/frame", "us CPU/heater/s", "CPU/heater");
+  for (size_t n = 1; n <= max_heaters; n *= 2) {
+    uint32_t frames = 0;
+    double elapsed = run(stream, n, &frames);
+    double ns_per_frame = elapsed * 1e9 / frames;
+    // One request/response pair per heater per second on the real bus
+    double us_per_heater_second = ns_per_frame * 2 / 1000.0;
+    std::printf("%8zu %10u %10.1f %18.2f %13.5f%%\n", n, frames, ns_per_frame, us_per_heater_second,
+                us_per_heater_second / 1e6 * 100.0);
+  }
+  return 0;
+}
@@ -0,0 +1,188 @@
+// transmit_bench.cpp
+//
+// Host simulation of the half-duplex heater bus, comparing the fixed transmit
+// timer the component used to have with TransmitScheduler.
+//
+// The bus carries our requests, the heater's replies (sent REPLY_DELAY after
+// a clean request, unless it is still replying) and the requests of a second
+// controller whose clock runs OTHER_DRIFT fast, like the original controller
+// left on the bus. Frames that overlap on the line are garbled. Our side only
+// sees the line every LOOP_US, as the main loop does: completed frames,
+// garbled bytes, and whether bytes are still arriving.
+//
+// Reported for each transmit interval: requests sent, requests garbled,
+// intervals of simulated time without a reply to us, retries, and the round trip time.
+//
+// Build and run from the repository root:
+//   g++ -O2 -std=c++17 -I firmware/esphome/components/vevorheater
+//       firmware/esphome/bench/transmit_bench.cpp -o /tmp/transmit_bench
+//   /tmp/transmit_bench 3600
+
+#include <cstdio>
+#include <cstdlib>
+#include <random>
+#include <vector>
+
+#include "frame_decoder.h"
+#include "transmit_scheduler.h"
+
+using namespace esphome::vevorheater;
+
+static const uint32_t LOOP_US = 16000;
+static const uint32_t REPLY_DELAY_MIN_US = 20000;
+static const uint32_t REPLY_DELAY_MAX_US = 60000;
+static const uint32_t OTHER_INTERVAL_US = 1000000;
+static const double OTHER_DRIFT = 300e-6;
+static const uint32_t STEP_US = 100;
+
+enum Talker { US, HEATER, OTHER };
+
+struct Transmission {
+  uint64_t start;
+  uint64_t end;
+  Talker talker;
+  Talker reply_to;  // requester a heater reply answers
+  bool garbled;
+};
+
+struct Result {
+  uint32_t sent{0};
+  uint32_t garbled{0};
+  uint32_t cycles{0};
+  uint32_t unanswered_cycles{0};
+  uint32_t retries{0};
+  double rtt_mean_ms{0};
+};
+
+static Result simulate(bool scheduled, uint32_t interval_us, double seconds, uint32_t seed) {
+  std::mt19937 rng(seed);
+  std::uniform_int_distribution<uint32_t> reply_delay(REPLY_DELAY_MIN_US, REPLY_DELAY_MAX_US);
+  std::vector<Transmission> line;  // transmissions not yet seen to their end
+  TransmitScheduler scheduler;
+  scheduler.set_interval_us(interval_us);
+  scheduler.start(0, interval_us / 2);
+
+  Result result;
+  uint64_t end = static_cast<uint64_t>(seconds * 1e6);
+  uint64_t next_timer = interval_us / 2;
+  double next_other = 0;
+  uint64_t heater_reply_at = 0;
+  Talker heater_reply_to = US;
+  bool heater_pending = false;
+  // Whether each interval of simulated time saw a reply to us
+  std::vector<bool> answered(end / interval_us + 1, false);
+  uint64_t sent_at = 0;
+  uint64_t rtt_sum = 0;
+  uint32_t replies = 0;
+  // What the controller has not looked at yet
+  bool seen_garbled = false;
+  std::vector<Transmission> seen;
+
+  auto transmit = [&](uint64_t now, Talker talker, size_t bytes, Talker reply_to) {
+    Transmission t{now, now + bytes * BUS_BYTE_TIME_US, talker, reply_to, false};
+    for (auto &other : line) {
+      if (other.end > now) {
+        other.garbled = true;
+        t.garbled = true;
+      }
+    }
+    line.push_back(t);
+  };
+
+  for (uint64_t now = 0; now < end; now += STEP_US) {
+    // Finished transmissions reach the heater and the controller's UART
+    for (size_t i = 0; i < line.size();) {
+      Transmission &t = line[i];
+      if (t.end > now) {
+        i++;
+        continue;
+      }
+      if (t.talker != HEATER && !t.garbled && !heater_pending) {
+        heater_pending = true;
+        heater_reply_at = t.end + reply_delay(rng);
+        heater_reply_to = t.talker;
+      }
+      if (t.garbled) {
+        seen_garbled = true;
+        if (t.talker == US)
+          result.garbled++;
+      } else {
+        seen.push_back(t);
+      }
+      line.erase(line.begin() + i);
+    }
+    if (heater_pending && now >= heater_reply_at) {
+      heater_pending = false;
+      transmit(now, HEATER, LONG_FRAME_SIZE, heater_reply_to);
+    }
+    if (now >= next_other) {
+      transmit(now, OTHER, SHORT_FRAME_SIZE, OTHER);
+      next_other += OTHER_INTERVAL_US * (1 - OTHER_DRIFT);
+    }
+
+    if (now % LOOP_US != 0) {
+      continue;
+    }
+    // One main loop pass: drain the UART, then maybe send
+    uint32_t now_us = static_cast<uint32_t>(now);
+    bool bytes_arriving = false;
+    for (const auto &t : line) {
+      bytes_arriving |= t.start <= now;
+    }
+    if (!seen.empty() || seen_garbled) {
+      scheduler.on_receive(now_us);
+    }
+    for (const auto &t : seen) {
+      BusFrameKind kind = t.talker == HEATER ? BUS_HEATER_REPLY : t.talker == US ? BUS_OWN_ECHO : BUS_OTHER_CONTROLLER;
+      scheduler.on_frame(now_us, kind);
+      if (t.talker == HEATER && t.reply_to == US) {
+        answered[now / interval_us] = true;
+        rtt_sum += now - sent_at;
+        replies++;
+      }
+    }
+    if (seen_garbled) {
+      scheduler.on_line_error(now_us);
+    }
+    seen.clear();
+    seen_garbled = false;
+
+    bool send;
+    if (scheduled) {
+      send = scheduler.poll(now_us, bytes_arriving);
+    } else {
+      send = now >= next_timer;
+      if (send)
+        next_timer += interval_us;
+    }
+    if (!send) {
+      continue;
+    }
+    transmit(now, US, SHORT_FRAME_SIZE, US);
+    scheduler.on_sent(now_us);
+    sent_at = now;
+    result.sent++;
+  }
+  result.cycles = end / interval_us;
+  for (uint32_t i = 1; i < result.cycles; i++) {
+    result.unanswered_cycles += answered[i] ? 0 : 1;
+  }
+  result.retries = scheduled ? scheduler.stats().retries : 0;
+  result.rtt_mean_ms = replies ? rtt_sum / 1000.0 / replies : 0;
+  return result;
+}
+
+int main(int argc, char **argv) {
+  double seconds = argc > 1 ? std::atof(argv[1]) : 3600;
+  std::printf("%-10s %8s %8s %8s %8s %11s %8s %8s\n", "mode", "interval", "sent", "garbled", "cycles",
+              "unanswered", "retries", "rtt ms");
+  for (uint32_t interval_ms : {1000u, 500u, 300u}) {
+    for (bool scheduled : {false, true}) {
+      Result r = simulate(scheduled, interval_ms * 1000, seconds, 1);
+      std::printf("%-10s %8u %8u %8u %8u %10.2f%% %8u %8.1f\n", scheduled ? "scheduler" : "timer", interval_ms,
+                  r.sent, r.garbled, r.cycles, r.cycles ? 100.0 * r.unanswered_cycles / r.cycles : 0.0, r.retries,
+                  r.rtt_mean_ms);
+    }
+  }
+  return 0;
+}
@@ -2,134 +2,313 @@
 
 import esphome.codegen as cg
 import esphome.config_validation as cv
-from esphome.components import sensor, uart, text_sensor, binary_sensor, number, switch
+from esphome.components import sensor, uart, text_sensor, binary_sensor, number, switch, web_server_base
+from esphome.components.web_server_base import CONF_WEB_SERVER_BASE_ID
+from esphome.core import CORE, TimePeriod
 from esphome.const import (
     CONF_ID,
+    CONF_PATH,
     CONF_UART_ID,
     CONF_NAME,
     CONF_UNIT_OF_MEASUREMENT,
     CONF_ICON,
     CONF_DEVICE_CLASS,
     CONF_ACCURACY_DECIMALS,
+    CONF_UPDATE_INTERVAL,
 )
 
+from .long_frame_fields import CPP_TABLE_NAME, LONG_FRAME_FIELDS, cpp_table
+
 AUTO_LOAD = ["sensor", "number", "text_sensor", "binary_sensor"]
+# One entry per heater, each on its own UART
+MULTI_CONF = True
 
 vevorheater_ns = cg.esphome_ns.namespace("vevorheater")
 VevorHeater = vevorheater_ns.class_("VevorHeater", cg.PollingComponent)
+ReceiveMode = vevorheater_ns.enum("ReceiveMode")
+LogMode = vevorheater_ns.enum("LogMode")
+
+RECEIVE_MODES = {
+    "polling": ReceiveMode.RECEIVE_POLLING,
+    "loop": ReceiveMode.RECEIVE_LOOP,
+}
+
+LOG_MODES = {
+    "none": LogMode.LOG_MODE_NONE,
+    "summary": LogMode.LOG_MODE_SUMMARY,
+    "hex": LogMode.LOG_MODE_HEX,
+    "fields": LogMode.LOG_MODE_FIELDS,
+}
 
 # Define configuration keys
 CONF_VOLTAGE_SENSOR = "voltage_sensor"
 CONF_TEMPERATURE_SENSOR = "temperature_sensor"
-CONF_STATE_SENSOR = "state_sensor"
 CONF_STATE_TEXT_SENSOR = "state_text_sensor"
-CONF_POWER_LEVEL_SENSOR = "power_level_sensor"
-CONF_FAN_SPEED_SENSOR = "fan_speed_sensor"
-CONF_PUMP_FREQUENCY_SENSOR = "pump_frequency_sensor"
-CONF_INPUT_VOLTAGE_SENSOR = "input_voltage_sensor"
-CONF_GLOW_PLUG_CURRENT_SENSOR = "glow_plug_current_sensor"
-CONF_COOLING_DOWN_SENSOR = "cooling_down_sensor"
-CONF_FAN_VOLTAGE_SENSOR = "fan_voltage_sensor"
-CONF_HEAT_EXCHANGER_TEMP_SENSOR = "heat_exchanger_temp_sensor"
-CONF_STATE_DURATION_SENSOR = "state_duration_sensor"
-CONF_GLOW_PLUG_VOLTAGE_SENSOR = "glow_plug_voltage_sensor"
-CONF_GLOW_PLUG_CURRENT_2_SENSOR = "glow_plug_current_2_sensor"
-CONF_GLOW_PLUG_TEMPERATURE_SENSOR = "glow_plug_temperature_sensor"
 
 # Short Frame Sensors
 CONF_SHORT_POWER_LEVEL_SENSOR = "short_power_level_sensor"
 CONF_SHORT_STATE_SENSOR = "short_state_sensor"
 CONF_SHORT_STATE_TEXT_SENSOR = "short_state_text_sensor"
 
+# Bus Error Counter Sensors
+CONF_BAD_FRAMES_SENSOR = "bad_frames_sensor"
+CONF_RESYNCS_SENSOR = "resyncs_sensor"
+CONF_DROPPED_BYTES_SENSOR = "dropped_bytes_sensor"
+
+# Prepended to the names of this heater's sensors
+CONF_NAME_PREFIX = "name_prefix"
+
+# Reception
+CONF_RECEIVE_MODE = "receive_mode"
+CONF_FRAME_LATENCY_SENSOR = "frame_latency_sensor"
+
+# Transmission
+CONF_TRANSMIT_INTERVAL = "transmit_interval"
+CONF_COLLISIONS_SENSOR = "collisions_sensor"
+CONF_ECHOES_SENSOR = "echoes_sensor"
+CONF_RETRIES_SENSOR = "retries_sensor"
+CONF_ROUND_TRIP_TIME_SENSOR = "round_trip_time_sensor"
+
+# Frame Diagnostics
+CONF_LOG_MODE = "log_mode"
+CONF_LOG_INTERVAL = "log_interval"
+
+# Telemetry Ring Buffer
+CONF_TELEMETRY = "telemetry"
+CONF_CAPACITY = "capacity"
+CONF_FLASH_BATCHES = "flash_batches"
+
+# Records per flash batch, TELEMETRY_KEYFRAME_INTERVAL in telemetry_buffer.h
+TELEMETRY_BATCH_RECORDS = 32
+
+# Raw Frame Capture
+CONF_CAPTURE = "capture"
+
+# Publish Policy
+CONF_PUBLISH_POLICY = "publish_policy"
+CONF_ONLY_ON_CHANGE = "only_on_change"
+CONF_DEADBAND = "deadband"
+CONF_RELATIVE_DEADBAND = "relative_deadband"
+CONF_HEARTBEAT = "heartbeat"
+
 # New Configuration Keys for Switch and Slider are removed
 
-CONFIG_SCHEMA = (
+# Component-wide publish policy, applied to every frame sensor
+PUBLISH_POLICY_SCHEMA = cv.Schema(
+    {
+        cv.Optional(CONF_ONLY_ON_CHANGE, default=False): cv.boolean,
+        cv.Optional(CONF_DEADBAND, default=0.0): cv.positive_float,
+        cv.Optional(CONF_RELATIVE_DEADBAND, default=0.0): cv.percentage,
+        cv.Optional(CONF_HEARTBEAT, default="0s"): cv.positive_time_period_milliseconds,
+    }
+)
+
+# Per-sensor override, keys left out fall back to the component-wide policy
+SENSOR_PUBLISH_POLICY_SCHEMA = cv.Schema(
+    {
+        cv.Optional(CONF_ONLY_ON_CHANGE): cv.boolean,
+        cv.Optional(CONF_DEADBAND): cv.positive_float,
+        cv.Optional(CONF_RELATIVE_DEADBAND): cv.percentage,
+        cv.Optional(CONF_HEARTBEAT): cv.positive_time_period_milliseconds,
+    }
+)
+
+# Decoded long frames kept in RAM, 8 bytes per record, downloadable from the
+# web server when it is configured
+TELEMETRY_SCHEMA = cv.Schema(
+    {
+        cv.Optional(CONF_CAPACITY, default=2048): cv.int_range(min=2 * TELEMETRY_BATCH_RECORDS, max=65535),
+        cv.Optional(CONF_FLASH_BATCHES, default=0): cv.int_range(min=0, max=32),
+        cv.Optional(CONF_PATH): cv.string,
+    }
+)
+
+# Raw bus frames buffered until downloaded from the web server, up to 61
+# bytes each
+CAPTURE_SCHEMA = cv.Schema(
+    {
+        cv.Optional(CONF_CAPACITY, default=128): cv.int_range(min=8, max=4096),
+        cv.Optional(CONF_PATH): cv.string,
+    }
+)
+
+def validate_capture(config):
+    if CONF_CAPTURE in config and CONF_WEB_SERVER_BASE_ID not in config:
+        raise cv.Invalid("capture is downloaded from the web server, add web_server to the configuration")
+    return config
+
+# RESPONSE_TIMEOUT_US in transmit_scheduler.h
+RESPONSE_TIMEOUT_MS = 300
+
+def validate_receive_mode(config):
+    # Polled replies are decoded up to one update_interval after they arrive,
+    # the firmware waits that much longer for them. The longer wait still has
+    # to fit in the transmit cycle.
+    if config[CONF_RECEIVE_MODE] != "polling":
+        return config
+    update_ms = config[CONF_UPDATE_INTERVAL].total_milliseconds
+    transmit_ms = config[CONF_TRANSMIT_INTERVAL].total_milliseconds
+    if update_ms + RESPONSE_TIMEOUT_MS > transmit_ms:
+        raise cv.Invalid(
+            f"receive_mode polling decodes replies up to update_interval late: update_interval "
+            f"({update_ms} ms) plus the {RESPONSE_TIMEOUT_MS} ms response timeout must not exceed "
+            f"transmit_interval ({transmit_ms} ms). Use receive_mode loop or a shorter update_interval"
+        )
+    return config
+
+def download_path(config, key):
+    return config[key].get(CONF_PATH, f"/vevorheater/{config[CONF_ID].id}/{key}")
+
+def policy_sensor_schema(**kwargs):
+    return sensor.sensor_schema(**kwargs).extend(
+        {cv.Optional(CONF_PUBLISH_POLICY): SENSOR_PUBLISH_POLICY_SCHEMA}
+    )
+
+def field_sensor_schema(field):
+    kwargs = {
+        "unit_of_measurement": field.unit,
+        "accuracy_decimals": field.accuracy_decimals,
+        "device_class": field.device_class,
+        "icon": field.icon,
+    }
+    return policy_sensor_schema(**{key: value for key, value in kwargs.items() if value is not None})
+
+def field_sensor_key(field):
+    return f"{field.key}_sensor"
+
+def entity_config(config, key):
+    conf = config[key]
+    prefix = config.get(CONF_NAME_PREFIX)
+    if prefix and conf.get(CONF_NAME):
+        conf = {**conf, CONF_NAME: f"{prefix} {conf[CONF_NAME]}"}
+    return conf
+
+async def new_policy_sensor(var, config, key):
+    sens = await sensor.new_sensor(entity_config(config, key))
+    policy = {**config[CONF_PUBLISH_POLICY], **config[key].get(CONF_PUBLISH_POLICY, {})}
+    cg.add(
+        var.set_sensor_publish_policy(
+            sens,
+            policy[CONF_ONLY_ON_CHANGE],
+            policy[CONF_DEADBAND],
+            policy[CONF_RELATIVE_DEADBAND],
+            policy[CONF_HEARTBEAT].total_milliseconds,
+        )
+    )
+    return sens
+
+CONFIG_SCHEMA = cv.All(
     cv.Schema(
         {
             cv.GenerateID(): cv.declare_id(VevorHeater),
             cv.Required(CONF_UART_ID): cv.use_id(uart.UARTComponent),
+            cv.Optional(CONF_NAME_PREFIX): cv.string,
+            # polling: drain the UART every update_interval, loop: on every main loop iteration
+            cv.Optional(CONF_RECEIVE_MODE, default="polling"): cv.enum(RECEIVE_MODES, lower=True),
+            # One request with its reply takes about 200 ms on the line
+            cv.Optional(CONF_TRANSMIT_INTERVAL, default="1s"): cv.All(
+                cv.positive_time_period_milliseconds,
+                cv.Range(min=TimePeriod(milliseconds=300)),
+            ),
+            # Frame diagnostics at DEBUG log level, at most once per log_interval for each frame type
+            cv.Optional(CONF_LOG_MODE, default="summary"): cv.enum(LOG_MODES, lower=True),
+            cv.Optional(CONF_LOG_INTERVAL, default="10s"): cv.positive_time_period_milliseconds,
+            cv.Optional(CONF_PUBLISH_POLICY, default={}): PUBLISH_POLICY_SCHEMA,
+            cv.Optional(CONF_TELEMETRY): TELEMETRY_SCHEMA,
+            cv.Optional(CONF_CAPTURE): CAPTURE_SCHEMA,
+            cv.OnlyWith(CONF_WEB_SERVER_BASE_ID, "web_server_base"): cv.use_id(web_server_base.WebServerBase),
             
             # Optional Sensors for Long Frame
-            cv.Optional(CONF_VOLTAGE_SENSOR): sensor.sensor_schema(
+            cv.Optional(CONF_VOLTAGE_SENSOR): policy_sensor_schema(
                 unit_of_measurement="V",
                 accuracy_decimals=2,
             ),
-            cv.Optional(CONF_TEMPERATURE_SENSOR): sensor.sensor_schema(
+            cv.Optional(CONF_TEMPERATURE_SENSOR): policy_sensor_schema(
                 unit_of_measurement="°C",
                 accuracy_decimals=1,
             ),
-            cv.Optional(CONF_STATE_SENSOR): sensor.sensor_schema(
-                device_class="power",
-                icon="mdi:power",
-            ),
             cv.Optional(CONF_STATE_TEXT_SENSOR): text_sensor.text_sensor_schema(
             ),
-            cv.Optional(CONF_POWER_LEVEL_SENSOR): sensor.sensor_schema(
+            # One sensor option per entry of long_frame_fields.py
+            **{
+                cv.Optional(field_sensor_key(field)): field_sensor_schema(field)
+                for field in LONG_FRAME_FIELDS
+            },
+            
+            # Optional Sensors for Short Frame
+            cv.Optional(CONF_SHORT_POWER_LEVEL_SENSOR): policy_sensor_schema(
                 unit_of_measurement="%",
                 accuracy_decimals=0,
             ),
-            cv.Optional(CONF_FAN_SPEED_SENSOR): sensor.sensor_schema(
-                unit_of_measurement="RPM",
-                accuracy_decimals=0,
-            ),
-            cv.Optional(CONF_PUMP_FREQUENCY_SENSOR): sensor.sensor_schema(
-                unit_of_measurement="Hz",
-                accuracy_decimals=1,
-            ),
-            cv.Optional(CONF_INPUT_VOLTAGE_SENSOR): sensor.sensor_schema(
-                unit_of_measurement="V",
-                accuracy_decimals=1,
-            ),
-            cv.Optional(CONF_GLOW_PLUG_CURRENT_SENSOR): sensor.sensor_schema(
-                unit_of_measurement="A",
-                accuracy_decimals=1,
-            ),
-            cv.Optional(CONF_COOLING_DOWN_SENSOR): sensor.sensor_schema(
-                unit_of_measurement="Status",
-                icon="mdi:fan-off",
+            cv.Optional(CONF_SHORT_STATE_SENSOR): policy_sensor_schema(
+                unit_of_measurement="State",
+                icon="mdi:power",
             ),
-            cv.Optional(CONF_FAN_VOLTAGE_SENSOR): sensor.sensor_schema(
-                unit_of_measurement="V",
-                accuracy_decimals=1,
+            cv.Optional(CONF_SHORT_STATE_TEXT_SENSOR): text_sensor.text_sensor_schema(
             ),
-            cv.Optional(CONF_HEAT_EXCHANGER_TEMP_SENSOR): sensor.sensor_schema(
-                unit_of_measurement="°C",
-                accuracy_decimals=2,
+
+            # Optional Sensors for Bus Error Counters
+            cv.Optional(CONF_BAD_FRAMES_SENSOR): sensor.sensor_schema(
+                accuracy_decimals=0,
+                icon="mdi:alert-circle-outline",
+                state_class="total_increasing",
+                entity_category="diagnostic",
             ),
-            cv.Optional(CONF_STATE_DURATION_SENSOR): sensor.sensor_schema(
-                unit_of_measurement="s",
+            cv.Optional(CONF_RESYNCS_SENSOR): sensor.sensor_schema(
                 accuracy_decimals=0,
+                icon="mdi:sync-alert",
+                state_class="total_increasing",
+                entity_category="diagnostic",
             ),
-            cv.Optional(CONF_GLOW_PLUG_VOLTAGE_SENSOR): sensor.sensor_schema(
-                unit_of_measurement="V",
-                accuracy_decimals=1,
+            cv.Optional(CONF_DROPPED_BYTES_SENSOR): sensor.sensor_schema(
+                unit_of_measurement="B",
+                accuracy_decimals=0,
+                icon="mdi:delete-alert-outline",
+                state_class="total_increasing",
+                entity_category="diagnostic",
             ),
-            cv.Optional(CONF_GLOW_PLUG_CURRENT_2_SENSOR): sensor.sensor_schema(
-                unit_of_measurement="A",
+            cv.Optional(CONF_FRAME_LATENCY_SENSOR): sensor.sensor_schema(
+                unit_of_measurement="ms",
                 accuracy_decimals=1,
+                icon="mdi:timer-outline",
+                state_class="measurement",
+                entity_category="diagnostic",
             ),
-            cv.Optional(CONF_GLOW_PLUG_TEMPERATURE_SENSOR): sensor.sensor_schema(
-                unit_of_measurement="°C",
-                accuracy_decimals=1,
+
+            # Optional Sensors for Transmission
+            cv.Optional(CONF_COLLISIONS_SENSOR): sensor.sensor_schema(
+                accuracy_decimals=0,
+                icon="mdi:call-split",
+                state_class="total_increasing",
+                entity_category="diagnostic",
             ),
-            
-            # Optional Sensors for Short Frame
-            cv.Optional(CONF_SHORT_POWER_LEVEL_SENSOR): sensor.sensor_schema(
-                unit_of_measurement="%",
+            cv.Optional(CONF_ECHOES_SENSOR): sensor.sensor_schema(
                 accuracy_decimals=0,
+                icon="mdi:repeat",
+                state_class="total_increasing",
+                entity_category="diagnostic",
             ),
-            cv.Optional(CONF_SHORT_STATE_SENSOR): sensor.sensor_schema(
-                unit_of_measurement="State",
-                icon="mdi:power",
+            cv.Optional(CONF_RETRIES_SENSOR): sensor.sensor_schema(
+                accuracy_decimals=0,
+                icon="mdi:restart",
+                state_class="total_increasing",
+                entity_category="diagnostic",
             ),
-            cv.Optional(CONF_SHORT_STATE_TEXT_SENSOR): text_sensor.text_sensor_schema(
+            cv.Optional(CONF_ROUND_TRIP_TIME_SENSOR): sensor.sensor_schema(
+                unit_of_measurement="ms",
+                accuracy_decimals=1,
+                icon="mdi:timer-sync-outline",
+                state_class="measurement",
+                entity_category="diagnostic",
             ),
 
             # Heater Switch and Level are now external
         }
     )
     .extend(cv.COMPONENT_SCHEMA)
-    .extend(cv.polling_component_schema('10ms'))
+    .extend(cv.polling_component_schema('10ms')),
+    validate_capture,
+    validate_receive_mode,
 )
 
 async def to_code(config):
@@ -138,79 +317,103 @@ async def to_code(config):
     
     uart_device = await cg.get_variable(config[CONF_UART_ID])
     cg.add(var.set_uart_bus(uart_device))
+    cg.add(var.set_receive_mode(config[CONF_RECEIVE_MODE]))
+    cg.add(var.set_transmit_interval(config[CONF_TRANSMIT_INTERVAL]))
+    cg.add(var.set_log_mode(config[CONF_LOG_MODE]))
+    cg.add(var.set_log_interval(config[CONF_LOG_INTERVAL]))
+    if CONF_NAME_PREFIX in config:
+        cg.add(var.set_name_prefix(config[CONF_NAME_PREFIX]))
     
+    # Downloads from the web server
+    web = CONF_WEB_SERVER_BASE_ID in config and (CONF_TELEMETRY in config or CONF_CAPTURE in config)
+    if web:
+        cg.add_define("USE_VEVORHEATER_WEB")
+        base = await cg.get_variable(config[CONF_WEB_SERVER_BASE_ID])
+        cg.add(var.set_web_server_base(base))
+
+    if CONF_TELEMETRY in config:
+        telemetry = config[CONF_TELEMETRY]
+        cg.add(var.set_telemetry(telemetry[CONF_CAPACITY], telemetry[CONF_FLASH_BATCHES]))
+        if web:
+            cg.add(var.set_telemetry_path(download_path(config, CONF_TELEMETRY)))
+
+    if CONF_CAPTURE in config:
+        cg.add(var.set_capture(config[CONF_CAPTURE][CONF_CAPACITY]))
+        cg.add(var.set_capture_path(download_path(config, CONF_CAPTURE)))
+
+    # Text sensors follow the component-wide policy: sent only on change
+    policy = config[CONF_PUBLISH_POLICY]
+    cg.add(
+        var.set_text_only_on_change(
+            policy[CONF_ONLY_ON_CHANGE]
+            or policy[CONF_DEADBAND] > 0
+            or policy[CONF_RELATIVE_DEADBAND] > 0
+        )
+    )
+
     # Handle optional sensors for Long Frame
     if CONF_VOLTAGE_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_VOLTAGE_SENSOR])
+        sens = await new_policy_sensor(var, config, CONF_VOLTAGE_SENSOR)
         cg.add(var.set_voltage_sensor(sens))
     
     if CONF_TEMPERATURE_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_TEMPERATURE_SENSOR])
+        sens = await new_policy_sensor(var, config, CONF_TEMPERATURE_SENSOR)
         cg.add(var.set_temperature_sensor(sens))
     
-    if CONF_STATE_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_STATE_SENSOR])
-        cg.add(var.set_state_sensor(sens))
-    
-    if CONF_POWER_LEVEL_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_POWER_LEVEL_SENSOR])
-        cg.add(var.set_power_level_sensor(sens))
-    
-    if CONF_FAN_SPEED_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_FAN_SPEED_SENSOR])
-        cg.add(var.set_fan_speed_sensor(sens))
-    
-    if CONF_PUMP_FREQUENCY_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_PUMP_FREQUENCY_SENSOR])
-        cg.add(var.set_pump_frequency_sensor(sens))
-    
-    if CONF_INPUT_VOLTAGE_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_INPUT_VOLTAGE_SENSOR])
-        cg.add(var.set_input_voltage_sensor(sens))
-    
-    if CONF_GLOW_PLUG_CURRENT_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_GLOW_PLUG_CURRENT_SENSOR])
-        cg.add(var.set_glow_plug_current_sensor(sens))
+    # Long frame field sensors point into one descriptor table, emitted once for all heaters
+    fields = [(index, field) for index, field in enumerate(LONG_FRAME_FIELDS) if field_sensor_key(field) in config]
+    if fields and not CORE.data.setdefault("vevorheater", {}).get("field_table"):
+        cg.add_global(cg.RawStatement(cpp_table()))
+        CORE.data["vevorheater"]["field_table"] = True
+    for index, field in fields:
+        sens = await new_policy_sensor(var, config, field_sensor_key(field))
+        cg.add(var.add_field_sensor(cg.RawExpression(f"&{CPP_TABLE_NAME}[{index}]"), sens))
+
+    # Handle optional sensors for Short Frame
+    if CONF_SHORT_POWER_LEVEL_SENSOR in config:
+        sens = await new_policy_sensor(var, config, CONF_SHORT_POWER_LEVEL_SENSOR)
+        cg.add(var.set_short_power_level_sensor(sens))
     
-    if CONF_COOLING_DOWN_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_COOLING_DOWN_SENSOR])
-        cg.add(var.set_cooling_down_sensor(sens))
+    if CONF_SHORT_STATE_SENSOR in config:
+        sens = await new_policy_sensor(var, config, CONF_SHORT_STATE_SENSOR)
+        cg.add(var.set_short_state_sensor(sens))
     
-    if CONF_FAN_VOLTAGE_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_FAN_VOLTAGE_SENSOR])
-        cg.add(var.set_fan_voltage_sensor(sens))
+    if CONF_SHORT_STATE_TEXT_SENSOR in config:
+        sens = await text_sensor.new_text_sensor(entity_config(config, CONF_SHORT_STATE_TEXT_SENSOR))
+        cg.add(var.set_short_state_text_sensor(sens))
     
-    if CONF_HEAT_EXCHANGER_TEMP_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_HEAT_EXCHANGER_TEMP_SENSOR])
-        cg.add(var.set_heat_exchanger_temp_sensor(sens))
+    # Handle optional sensors for Bus Error Counters
+    if CONF_BAD_FRAMES_SENSOR in config:
+        sens = await sensor.new_sensor(entity_config(config, CONF_BAD_FRAMES_SENSOR))
+        cg.add(var.set_bad_frames_sensor(sens))
     
-    if CONF_STATE_DURATION_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_STATE_DURATION_SENSOR])
-        cg.add(var.set_state_duration_sensor(sens))
+    if CONF_RESYNCS_SENSOR in config:
+        sens = await sensor.new_sensor(entity_config(config, CONF_RESYNCS_SENSOR))
+        cg.add(var.set_resyncs_sensor(sens))
     
-    if CONF_GLOW_PLUG_VOLTAGE_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_GLOW_PLUG_VOLTAGE_SENSOR])
-        cg.add(var.set_glow_plug_voltage_sensor(sens))
+    if CONF_DROPPED_BYTES_SENSOR in config:
+        sens = await sensor.new_sensor(entity_config(config, CONF_DROPPED_BYTES_SENSOR))
+        cg.add(var.set_dropped_bytes_sensor(sens))
     
-    if CONF_GLOW_PLUG_CURRENT_2_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_GLOW_PLUG_CURRENT_2_SENSOR])
-        cg.add(var.set_glow_plug_current_2_sensor(sens))
+    if CONF_FRAME_LATENCY_SENSOR in config:
+        sens = await sensor.new_sensor(entity_config(config, CONF_FRAME_LATENCY_SENSOR))
+        cg.add(var.set_frame_latency_sensor(sens))
     
-    if CONF_GLOW_PLUG_TEMPERATURE_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_GLOW_PLUG_TEMPERATURE_SENSOR])
-        cg.add(var.set_glow_plug_temperature_sensor(sens))
+    # Handle optional sensors for Transmission
+    if CONF_COLLISIONS_SENSOR in config:
+        sens = await sensor.new_sensor(entity_config(config, CONF_COLLISIONS_SENSOR))
+        cg.add(var.set_collisions_sensor(sens))
     
-    # Handle optional sensors for Short Frame
-    if CONF_SHORT_POWER_LEVEL_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_SHORT_POWER_LEVEL_SENSOR])
-        cg.add(var.set_short_power_level_sensor(sens))
+    if CONF_ECHOES_SENSOR in config:
+        sens = await sensor.new_sensor(entity_config(config, CONF_ECHOES_SENSOR))
+        cg.add(var.set_echoes_sensor(sens))
     
-    if CONF_SHORT_STATE_SENSOR in config:
-        sens = await sensor.new_sensor(config[CONF_SHORT_STATE_SENSOR])
-        cg.add(var.set_short_state_sensor(sens))
+    if CONF_RETRIES_SENSOR in config:
+        sens = await sensor.new_sensor(entity_config(config, CONF_RETRIES_SENSOR))
+        cg.add(var.set_retries_sensor(sens))
     
-    if CONF_SHORT_STATE_TEXT_SENSOR in config:
-        sens = await text_sensor.new_text_sensor(config[CONF_SHORT_STATE_TEXT_SENSOR])
-        cg.add(var.set_short_state_text_sensor(sens))
+    if CONF_ROUND_TRIP_TIME_SENSOR in config:
+        sens = await sensor.new_sensor(entity_config(config, CONF_ROUND_TRIP_TIME_SENSOR))
+        cg.add(var.set_round_trip_time_sensor(sens))
     
     # No direct handling of heater_switch and heater_level here
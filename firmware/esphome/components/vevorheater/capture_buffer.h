@@ -0,0 +1,105 @@
+// capture_buffer.h
+
+#pragma once
+
+#include <cstddef>
+#include <cstdint>
+#include <cstring>
+#include <vector>
+
+#include "frame_decoder.h"
+
+namespace esphome {
+namespace vevorheater {
+
+// Download format, read by software/capture_file.py (".vfrm"). Every download
+// is one batch; a capture file is the batches appended to each other.
+//
+//   CaptureBatchHeader
+//   frame_count times: uint32 time_ms, uint8 size, size frame bytes
+struct CaptureBatchHeader {
+  char magic[4];          // "VHFR"
+  uint8_t version;        // CAPTURE_BATCH_VERSION
+  uint8_t reserved;
+  uint16_t frame_count;   // frames in this batch
+  uint32_t dropped;       // frames lost to a full buffer before this batch
+};
+static_assert(sizeof(CaptureBatchHeader) == 12, "CaptureBatchHeader must stay packed");
+
+static const uint8_t CAPTURE_BATCH_VERSION = 1;
+static const size_t CAPTURE_FRAME_OVERHEAD = sizeof(uint32_t) + sizeof(uint8_t);
+
+// Raw bus frames with their arrival time, kept until the next download.
+// When the buffer is full new frames are counted as dropped, so every batch
+// is contiguous and the gap before it is known.
+//
+// Frames are serialized into the batch as they arrive, so a download only
+// swaps the finished batch out for an empty one. The batch leaves with the
+// download's response; the storage for the next one is passed to take(),
+// reserved beforehand so nothing is allocated while locked. Not thread safe:
+// the component locks add() and take() against each other.
+class CaptureBuffer {
+ public:
+  void init(size_t capacity) {
+    this->capacity_ = capacity;
+    this->start_batch_();
+  }
+
+  size_t capacity() const { return this->capacity_; }
+  // Bytes of a batch holding capacity() long frames
+  size_t max_batch_bytes() const {
+    return sizeof(CaptureBatchHeader) + this->capacity_ * (CAPTURE_FRAME_OVERHEAD + LONG_FRAME_SIZE);
+  }
+  size_t size() const { return this->count_; }
+  uint32_t total() const { return this->total_; }
+  uint32_t total_dropped() const { return this->total_dropped_; }
+
+  void add(uint32_t time_ms, const uint8_t *frame, size_t size) {
+    if (this->count_ == this->capacity_ || size > LONG_FRAME_SIZE) {
+      this->dropped_++;
+      this->total_dropped_++;
+      return;
+    }
+    uint8_t entry[CAPTURE_FRAME_OVERHEAD];
+    std::memcpy(entry, &time_ms, sizeof(time_ms));
+    entry[sizeof(time_ms)] = size;
+    this->batch_.insert(this->batch_.end(), entry, entry + CAPTURE_FRAME_OVERHEAD);
+    this->batch_.insert(this->batch_.end(), frame, frame + size);
+    this->count_++;
+    this->total_++;
+  }
+
+  // Hand out everything buffered as one batch and start over. out's old
+  // contents are dropped and its storage becomes the next batch; reserve
+  // max_batch_bytes() in it to keep take() from allocating.
+  void take(std::vector<uint8_t> &out) {
+    CaptureBatchHeader header;
+    std::memcpy(header.magic, "VHFR", 4);
+    header.version = CAPTURE_BATCH_VERSION;
+    header.reserved = 0;
+    header.frame_count = this->count_;
+    header.dropped = this->dropped_;
+    std::memcpy(this->batch_.data(), &header, sizeof(header));
+    out.swap(this->batch_);
+    this->start_batch_();
+    this->count_ = 0;
+    this->dropped_ = 0;
+  }
+
+ protected:
+  // Empty batch with room for capacity_ long frames, the header filled in by take()
+  void start_batch_() {
+    this->batch_.reserve(this->max_batch_bytes());
+    this->batch_.assign(sizeof(CaptureBatchHeader), 0);
+  }
+
+  std::vector<uint8_t> batch_;
+  size_t capacity_{0};
+  size_t count_{0};
+  uint32_t dropped_{0};
+  uint32_t total_{0};
+  uint32_t total_dropped_{0};
+};
+
+}  // namespace vevorheater
+}  // namespace esphome
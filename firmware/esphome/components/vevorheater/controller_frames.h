@@ -0,0 +1,67 @@
+// controller_frames.h
+
+#pragma once
+
+#include <array>
+#include <cstddef>
+#include <cstdint>
+
+#include "frame_decoder.h"
+
+namespace esphome {
+namespace vevorheater {
+
+using ControllerFrame = std::array<uint8_t, SHORT_FRAME_SIZE>;
+
+// Short frames the controller sends once per second
+enum ControllerFrameKind : uint8_t {
+  FRAME_SET_OFF = 0,       // turn heater off
+  FRAME_KEEP_COOLING = 1,  // keep heater shutting off
+  FRAME_SET_ON = 2,        // turn heater on
+  FRAME_RUNNING = 3,       // keep heater on
+  FRAME_KIND_COUNT = 4,
+};
+
+static const size_t CONTROLLER_FRAME_LEVEL_INDEX = 8;
+
+// Only the command, length, level and requested state bytes are non-zero
+// inside the checksummed range (bytes 2..N-2), so the checksum is their sum
+constexpr ControllerFrame make_controller_frame(uint8_t command, uint8_t level, uint8_t requested_state) {
+  return ControllerFrame{{FRAME_START_BYTE, CONTROLLER_ID, command, SHORT_LENGTH_FIELD, 0x00, 0x00, 0x00, 0x00, level,
+                          requested_state, 0x00, 0x00, 0x00, 0x00, 0x00,
+                          static_cast<uint8_t>(command + SHORT_LENGTH_FIELD + level + requested_state)}};
+}
+
+// Templates built at compile time, indexed by ControllerFrameKind
+static constexpr std::array<ControllerFrame, FRAME_KIND_COUNT> CONTROLLER_FRAME_TEMPLATES{{
+    make_controller_frame(0x06, 10, 0x05),  // FRAME_SET_OFF
+    make_controller_frame(0x02, 10, 0x02),  // FRAME_KEEP_COOLING
+    make_controller_frame(0x06, 10, 0x06),  // FRAME_SET_ON
+    make_controller_frame(0x02, 10, 0x08),  // FRAME_RUNNING
+}};
+
+// Ready-to-send controller frames. Only the level byte of the SET_ON and
+// RUNNING frames and their checksum are patched when the level changes, so
+// sending never allocates or recomputes anything.
+class ControllerFrames {
+ public:
+  const ControllerFrame &get(ControllerFrameKind kind) const { return this->frames_[kind]; }
+
+  // level is the power level byte, 1-10
+  void set_level(uint8_t level) {
+    patch_level_(this->frames_[FRAME_SET_ON], level);
+    patch_level_(this->frames_[FRAME_RUNNING], level);
+  }
+
+ protected:
+  static void patch_level_(ControllerFrame &frame, uint8_t level) {
+    uint8_t old_level = frame[CONTROLLER_FRAME_LEVEL_INDEX];
+    frame[CONTROLLER_FRAME_LEVEL_INDEX] = level;
+    frame[SHORT_FRAME_SIZE - 1] = static_cast<uint8_t>(frame[SHORT_FRAME_SIZE - 1] + level - old_level);
+  }
+
+  std::array<ControllerFrame, FRAME_KIND_COUNT> frames_{CONTROLLER_FRAME_TEMPLATES};
+};
+
+}  // namespace vevorheater
+}  // namespace esphome
@@ -0,0 +1,163 @@
+// frame_decoder.h
+
+#pragma once
+
+#include <cstddef>
+#include <cstdint>
+#include <cstring>
+
+namespace esphome {
+namespace vevorheater {
+
+static const uint8_t FRAME_START_BYTE = 0xAA;
+static const uint8_t CONTROLLER_ID = 0x66;
+static const uint8_t HEATER_ID = 0x77;
+static const uint8_t SHORT_LENGTH_FIELD = 0x0B;
+static const uint8_t LONG_LENGTH_FIELD = 0x33;
+static const size_t SHORT_FRAME_SIZE = SHORT_LENGTH_FIELD + 5;
+static const size_t LONG_FRAME_SIZE = LONG_LENGTH_FIELD + 5;
+
+// Incremental decoder for the heater bus.
+//
+// Bytes are pushed one at a time. A frame starts with 0xAA and a known device
+// ID, its length field (byte 3) tells exactly how many bytes follow, and it is
+// handed out as soon as its last byte arrives and the checksum matches. Nothing
+// depends on idle gaps, so back-to-back frames are split correctly.
+//
+// On a bad byte the candidate frame is dropped and the bytes buffered after its
+// start byte are scanned again for the next 0xAA. After such a resync the
+// buffer can hold a whole frame and the start of the next ones: the frame is
+// handed out with exactly the size its length field gives, and the bytes
+// behind it stay buffered and are scanned for the next frame. The Python twin
+// in software/vevor_protocol/stream.py implements the same state machine.
+class FrameDecoder {
+ public:
+  // Returns true when the byte completed a valid frame, available through
+  // data()/size() until the next call.
+  bool push(uint8_t byte) {
+    this->consume_();
+    this->buf_[this->len_++] = byte;
+    return this->scan_();
+  }
+
+  // Returns true when the bytes still buffered behind the last frame hold
+  // another complete frame. Call after push() returned true until it
+  // returns false, or the frame is handed out on the next push().
+  bool next() {
+    this->consume_();
+    return this->scan_();
+  }
+
+  void reset() {
+    this->len_ = 0;
+    this->frame_len_ = 0;
+  }
+
+  // Drop the bytes of a frame that stopped arriving, counted as dropped
+  void discard_partial() {
+    this->dropped_bytes_ += this->len_ - this->frame_len_;
+    this->reset();
+  }
+
+  const uint8_t *data() const { return this->buf_; }
+  size_t size() const { return this->frame_len_; }
+
+  uint32_t frames() const { return this->frames_; }
+  uint32_t checksum_errors() const { return this->checksum_errors_; }
+  uint32_t resyncs() const { return this->resyncs_; }
+  uint32_t dropped_bytes() const { return this->dropped_bytes_; }
+
+  static size_t frame_size(uint8_t length_field) {
+    if (length_field == SHORT_LENGTH_FIELD)
+      return SHORT_FRAME_SIZE;
+    if (length_field == LONG_LENGTH_FIELD)
+      return LONG_FRAME_SIZE;
+    return 0;
+  }
+
+  // Sum of bytes 2..N-2 modulo 256
+  static uint8_t checksum(const uint8_t *frame, size_t size) {
+    if (size < 4)
+      return 0;
+    uint32_t sum = 0;
+    for (size_t i = 2; i < size - 1; ++i)
+      sum += frame[i];
+    return static_cast<uint8_t>(sum & 0xFF);
+  }
+
+ protected:
+  enum PrefixResult { NEED_MORE, COMPLETE, BAD_CHECKSUM, INVALID };
+
+  // Remove the frame handed out last, keeping the bytes behind it
+  void consume_() {
+    if (this->frame_len_ == 0)
+      return;
+    this->len_ -= this->frame_len_;
+    std::memmove(this->buf_, this->buf_ + this->frame_len_, this->len_);
+    this->frame_len_ = 0;
+  }
+
+  bool scan_() {
+    while (this->len_ > 0) {
+      switch (this->check_prefix_()) {
+        case NEED_MORE:
+          return false;
+        case COMPLETE:
+          this->frame_len_ = frame_size(this->buf_[3]);
+          this->frames_++;
+          return true;
+        case BAD_CHECKSUM:
+          this->checksum_errors_++;
+          this->drop_candidate_();
+          break;
+        case INVALID:
+          this->drop_candidate_();
+          break;
+      }
+    }
+    return false;
+  }
+
+  PrefixResult check_prefix_() const {
+    if (this->buf_[0] != FRAME_START_BYTE)
+      return INVALID;
+    if (this->len_ < 2)
+      return NEED_MORE;
+    if (this->buf_[1] != CONTROLLER_ID && this->buf_[1] != HEATER_ID)
+      return INVALID;
+    if (this->len_ < 4)
+      return NEED_MORE;
+    size_t expected = frame_size(this->buf_[3]);
+    if (expected == 0)
+      return INVALID;
+    if (this->len_ < expected)
+      return NEED_MORE;
+    if (checksum(this->buf_, expected) != this->buf_[expected - 1])
+      return BAD_CHECKSUM;
+    return COMPLETE;
+  }
+
+  // Discard the first buffered byte and rescan the rest for a start byte
+  void drop_candidate_() {
+    if (this->buf_[0] == FRAME_START_BYTE) {
+      this->resyncs_++;
+    } else {
+      this->dropped_bytes_++;
+    }
+    this->len_--;
+    std::memmove(this->buf_, this->buf_ + 1, this->len_);
+  }
+
+  uint8_t buf_[LONG_FRAME_SIZE]{};
+  size_t len_{0};
+  // Size of the frame at the start of buf_ handed out last, 0 if none
+  size_t frame_len_{0};
+
+  uint32_t frames_{0};
+  uint32_t checksum_errors_{0};
+  uint32_t resyncs_{0};
+  uint32_t dropped_bytes_{0};
+};
+
+}  // namespace vevorheater
+}  // namespace esphome
@@ -0,0 +1,32 @@
+// long_frame_fields.h
+
+#pragma once
+
+#include <cstdint>
+
+namespace esphome {
+namespace vevorheater {
+
+// Layout of one long frame field published as a sensor. The table of all
+// fields is generated from long_frame_fields.py by __init__.py as a
+// constexpr array; every heater keeps pointers to the entries it publishes.
+struct LongFrameField {
+  const char *name;
+  const char *unit;
+  uint8_t offset;     // first byte in the long frame
+  uint8_t width;      // 1 or 2 bytes, big endian
+  bool is_signed;
+  uint8_t decimals;   // for logging
+  float scale;        // value = raw * scale
+
+  // frame must be a complete long frame
+  float decode(const uint8_t *frame) const {
+    uint16_t raw = this->width == 2 ? (frame[this->offset] << 8) | frame[this->offset + 1] : frame[this->offset];
+    if (!this->is_signed)
+      return raw * this->scale;
+    return (this->width == 2 ? static_cast<int16_t>(raw) : static_cast<int8_t>(raw)) * this->scale;
+  }
+};
+
+}  // namespace vevorheater
+}  // namespace esphome
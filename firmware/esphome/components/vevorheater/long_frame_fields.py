@@ -0,0 +1,75 @@
+# long_frame_fields.py
+"""
+Long frame fields published as sensors, the one place their layout is defined.
+
+__init__.py builds the <key>_sensor config options and the constexpr C++
+descriptor table (LongFrameField in long_frame_fields.h) from LONG_FRAME_FIELDS,
+and software/vevor_protocol/fields.py loads it for the analysis tools. Plain
+Python without ESPHome imports, so both can load it. A new field is one more
+entry here.
+"""
+
+import json
+from typing import NamedTuple, Optional
+
+# Bytes 0-3 are the header, the last byte of the 56-byte frame the checksum
+FIRST_PAYLOAD_OFFSET = 4
+CHECKSUM_OFFSET = 55
+
+CPP_TABLE_NAME = "VEVORHEATER_LONG_FRAME_FIELDS"
+
+class LongFrameField(NamedTuple):
+    key: str                                  # config option is <key>_sensor
+    name: str                                 # for logs and plots
+    offset: int                               # first byte in the long frame
+    width: int                                # 1 or 2 bytes, big endian
+    scale: float = 1.0                        # value = raw * scale
+    unit: Optional[str] = None
+    accuracy_decimals: Optional[int] = None
+    device_class: Optional[str] = None
+    icon: Optional[str] = None
+    signed: bool = False
+
+LONG_FRAME_FIELDS = (
+    LongFrameField("state", "State", 5, 1, device_class="power", icon="mdi:power"),
+    LongFrameField("power_level", "Power Level", 6, 1, 10, "%", 0),
+    LongFrameField("input_voltage", "Input Voltage", 11, 1, 0.1, "V", 1, "voltage"),
+    LongFrameField("glow_plug_current", "Glow Plug Current", 13, 1, 1, "A", 1, "current"),
+    LongFrameField("cooling_down", "Cooling Down", 14, 1, unit="Status", icon="mdi:fan-off"),
+    LongFrameField("fan_voltage", "Fan Voltage", 15, 1, 1, "V", 1, "voltage"),
+    LongFrameField("heat_exchanger_temp", "Heat Exchanger Temperature", 16, 2, 0.1, "°C", 2, "temperature",
+                   signed=True),
+    LongFrameField("state_duration", "State Duration", 20, 2, 1, "s", 0, "duration"),
+    LongFrameField("pump_frequency", "Pump Frequency", 23, 1, 0.1, "Hz", 1, "frequency"),
+    LongFrameField("glow_plug_voltage", "Glow Plug Voltage", 24, 1, 1, "V", 1, "voltage"),
+    LongFrameField("glow_plug_current_2", "Glow Plug Current 2", 25, 1, 1, "A", 1, "current"),
+    LongFrameField("glow_plug_temperature", "Glow Plug Temperature", 26, 1, 1, "°C", 1, "temperature"),
+    LongFrameField("fan_speed", "Fan Speed", 28, 2, 1, "RPM", 0),
+    LongFrameField("glow_plug_related", "Glow Plug Related", 52, 2, 1, None, 0),
+)
+
+for _field in LONG_FRAME_FIELDS:
+    assert _field.width in (1, 2), _field
+    assert FIRST_PAYLOAD_OFFSET <= _field.offset and _field.offset + _field.width <= CHECKSUM_OFFSET, _field
+
+def _cpp_string(value: Optional[str]) -> str:
+    return json.dumps(value or "", ensure_ascii=False)
+
+def cpp_table(name: str = CPP_TABLE_NAME) -> str:
+    """
+    C++ definition of the constexpr descriptor array, in LONG_FRAME_FIELDS order.
+    """
+    rows = []
+    for field in LONG_FRAME_FIELDS:
+        rows.append(
+            f"    {{{_cpp_string(field.name)}, {_cpp_string(field.unit)}, {field.offset}, {field.width}, "
+            f"{str(field.signed).lower()}, {field.accuracy_decimals or 0}, {float(field.scale)!r}f}},"
+        )
+    return "\n".join(
+        [f"static constexpr esphome::vevorheater::LongFrameField {name}[{len(LONG_FRAME_FIELDS)}] = {{"]
+        + rows
+        + ["};"]
+    )
+
+if __name__ == "__main__":
+    print(cpp_table())
@@ -0,0 +1,149 @@
+// telemetry_buffer.h
+
+#pragma once
+
+#include <cstddef>
+#include <cstdint>
+#include <cstring>
+#include <memory>
+
+namespace esphome {
+namespace vevorheater {
+
+// Decoded long frame fields kept in the telemetry buffer, in frame units
+struct TelemetrySample {
+  uint8_t state{0};
+  uint8_t level{0};
+  uint16_t heat_exchanger_temp{0};  // 0.1 °C
+  uint8_t input_voltage{0};         // 0.1 V
+  uint8_t pump_frequency{0};        // 0.1 Hz
+  uint16_t fan_speed{0};            // rpm
+};
+
+// One packed telemetry record, little endian.
+//
+// A keyframe holds absolute values. Every other record holds the difference
+// to the previous sample, modulo the field width, so any change is stored
+// exactly and a steady heater produces runs of zero bytes. A keyframe is
+// written every TELEMETRY_KEYFRAME_INTERVAL records, which bounds how much is
+// lost when the ring overwrites its oldest keyframe.
+struct TelemetryRecord {
+  uint8_t header;                // bit 7: keyframe, bits 4-6: state, bits 0-3: level
+  uint8_t dt;                    // time since the previous record [100 ms], saturates
+  uint16_t heat_exchanger_temp;  // absolute or delta
+  uint8_t input_voltage;         // absolute or delta
+  uint8_t pump_frequency;        // absolute or delta
+  uint16_t fan_speed;            // absolute or delta
+};
+static_assert(sizeof(TelemetryRecord) == 8, "TelemetryRecord must stay packed");
+
+static const uint8_t TELEMETRY_KEYFRAME = 0x80;
+static const uint8_t TELEMETRY_DT_MAX = 0xFF;
+static const uint32_t TELEMETRY_DT_UNIT_MS = 100;
+static const size_t TELEMETRY_KEYFRAME_INTERVAL = 32;
+
+// Download format: TelemetryDumpHeader followed by the records, oldest first.
+// Read by software/telemetry_dump.py.
+struct TelemetryDumpHeader {
+  char magic[4];           // "VHTL"
+  uint8_t version;         // TELEMETRY_DUMP_VERSION
+  uint8_t record_size;     // sizeof(TelemetryRecord)
+  uint16_t dt_unit_ms;     // TELEMETRY_DT_UNIT_MS
+  uint32_t record_count;   // records following the header
+  uint32_t newest_ms;      // uptime of the newest record [ms]
+};
+static_assert(sizeof(TelemetryDumpHeader) == 16, "TelemetryDumpHeader must stay packed");
+
+static const uint8_t TELEMETRY_DUMP_VERSION = 1;
+
+// Fixed-size ring of telemetry records, allocated once.
+class TelemetryBuffer {
+ public:
+  void init(size_t capacity) {
+    this->records_.reset(new TelemetryRecord[capacity]);
+    this->capacity_ = capacity;
+    this->clear();
+  }
+
+  void clear() {
+    this->head_ = 0;
+    this->count_ = 0;
+    this->since_keyframe_ = 0;
+    this->has_last_ = false;
+  }
+
+  size_t capacity() const { return this->capacity_; }
+  size_t size() const { return this->count_; }
+  uint32_t newest_ms() const { return this->last_ms_; }
+  // Records written since the last keyframe, 0 right after a keyframe
+  size_t since_keyframe() const { return this->since_keyframe_; }
+
+  // i = 0 is the oldest record
+  const TelemetryRecord &at(size_t i) const {
+    return this->records_[(this->head_ + this->capacity_ - this->count_ + i) % this->capacity_];
+  }
+
+  void add(uint32_t now_ms, const TelemetrySample &sample) {
+    if (this->capacity_ == 0)
+      return;
+    TelemetryRecord record;
+    uint32_t dt = this->has_last_ ? (now_ms - this->last_ms_) / TELEMETRY_DT_UNIT_MS : TELEMETRY_DT_MAX;
+    record.dt = dt < TELEMETRY_DT_MAX ? dt : TELEMETRY_DT_MAX;
+    record.header = ((sample.state & 0x07) << 4) | (sample.level & 0x0F);
+    if (!this->has_last_ || this->since_keyframe_ == 0) {
+      record.header |= TELEMETRY_KEYFRAME;
+      record.heat_exchanger_temp = sample.heat_exchanger_temp;
+      record.input_voltage = sample.input_voltage;
+      record.pump_frequency = sample.pump_frequency;
+      record.fan_speed = sample.fan_speed;
+    } else {
+      record.heat_exchanger_temp = sample.heat_exchanger_temp - this->last_.heat_exchanger_temp;
+      record.input_voltage = sample.input_voltage - this->last_.input_voltage;
+      record.pump_frequency = sample.pump_frequency - this->last_.pump_frequency;
+      record.fan_speed = sample.fan_speed - this->last_.fan_speed;
+    }
+    this->push_(record);
+    this->since_keyframe_ = (this->since_keyframe_ + 1) % TELEMETRY_KEYFRAME_INTERVAL;
+    this->last_ = sample;
+    this->last_ms_ = now_ms;
+    this->has_last_ = true;
+  }
+
+  // Append records saved before a reboot. The next sample starts a new keyframe.
+  void restore(const TelemetryRecord *records, size_t count) {
+    for (size_t i = 0; i < count; i++)
+      this->push_(records[i]);
+    this->has_last_ = false;
+    this->since_keyframe_ = 0;
+  }
+
+  // Fill a dump header for the current contents
+  void dump_header(TelemetryDumpHeader *header) const {
+    std::memcpy(header->magic, "VHTL", 4);
+    header->version = TELEMETRY_DUMP_VERSION;
+    header->record_size = sizeof(TelemetryRecord);
+    header->dt_unit_ms = TELEMETRY_DT_UNIT_MS;
+    header->record_count = this->count_;
+    header->newest_ms = this->last_ms_;
+  }
+
+ protected:
+  void push_(const TelemetryRecord &record) {
+    this->records_[this->head_] = record;
+    this->head_ = (this->head_ + 1) % this->capacity_;
+    if (this->count_ < this->capacity_)
+      this->count_++;
+  }
+
+  std::unique_ptr<TelemetryRecord[]> records_;
+  size_t capacity_{0};
+  size_t head_{0};
+  size_t count_{0};
+  size_t since_keyframe_{0};
+  TelemetrySample last_;
+  uint32_t last_ms_{0};
+  bool has_last_{false};
+};
+
+}  // namespace vevorheater
+}  // namespace esphome
@@ -0,0 +1,206 @@
+// transmit_scheduler.h
+
+#pragma once
+
+#include <cstddef>
+#include <cstdint>
+
+namespace esphome {
+namespace vevorheater {
+
+// One byte at 4800 baud: start bit, 8 data bits, stop bit
+static const uint32_t BUS_BYTE_TIME_US = 10 * 1000000 / 4800;
+// Quiet time after the last received byte before the line counts as idle
+static const uint32_t IDLE_GAP_US = 3 * BUS_BYTE_TIME_US;
+// A request and its reply take about 150 ms on the line; the heater answers
+// within a few tens of ms. Replies decoded late wait longer, see
+// set_response_timeout_us().
+static const uint32_t RESPONSE_TIMEOUT_US = 300000;
+// Waiting for a busy line doubles from the first to the last value
+static const uint32_t MIN_BACKOFF_US = 4 * BUS_BYTE_TIME_US;
+static const uint32_t MAX_BACKOFF_US = 128000;
+// Requests sent again within a cycle after a collision or timeout
+static const uint8_t MAX_RETRIES = 2;
+
+// What a completed frame on the line was, as seen by the controller
+enum BusFrameKind {
+  BUS_HEATER_REPLY = 0,      // long frame from the heater
+  BUS_OWN_ECHO = 1,          // our request, read back from the half-duplex line
+  BUS_OTHER_CONTROLLER = 2,  // a controller frame we did not send
+};
+
+struct TransmitStats {
+  uint32_t sent{0};           // requests written, retries included
+  uint32_t replies{0};        // heater replies to them
+  uint32_t echoes{0};         // our requests read back
+  uint32_t collisions{0};     // requests garbled on the line or crossed by another talker
+  uint32_t timeouts{0};       // requests without a reply
+  uint32_t retries{0};        // requests sent again after a collision or timeout
+  uint32_t busy_backoffs{0};  // sends postponed because the line was busy
+  // Round trip from writing a request to its reply being decoded
+  uint32_t rtt_last_us{0};
+  uint32_t rtt_min_us{UINT32_MAX};
+  uint32_t rtt_max_us{0};
+  uint64_t rtt_sum_us{0};
+};
+
+// Decides when the controller may send on the half-duplex heater bus.
+//
+// A request is due once per interval, but only goes out when the line is
+// idle: nothing waiting in the UART, nothing received for IDLE_GAP_US (bytes
+// of a frame follow each other much closer), and no reply outstanding. As
+// the heater only talks when asked, a request due while the line is quiet
+// lands in the gap after the previous reply. A busy line postpones the
+// request with exponential backoff. A request is answered
+// by the next heater frame; a decoder error or another controller's frame
+// while waiting is a collision, no reply within the response timeout a
+// timeout, and either is retried up to MAX_RETRIES times before the next
+// regular request.
+//
+// Times are micros() values; all comparisons survive its wrap-around.
+class TransmitScheduler {
+ public:
+  void set_interval_us(uint32_t interval_us) { this->interval_us_ = interval_us; }
+  uint32_t interval_us() const { return this->interval_us_; }
+  // How long a request waits for its reply, RESPONSE_TIMEOUT_US plus how late
+  // after their arrival replies are decoded
+  void set_response_timeout_us(uint32_t timeout_us) { this->response_timeout_us_ = timeout_us; }
+
+  // First request after phase_us
+  void start(uint32_t now_us, uint32_t phase_us) {
+    this->next_cycle_us_ = now_us + phase_us;
+    this->last_rx_us_ = now_us - IDLE_GAP_US;
+  }
+
+  // Bytes were received at now_us
+  void on_receive(uint32_t now_us) { this->last_rx_us_ = now_us; }
+
+  // A frame completed at now_us
+  void on_frame(uint32_t now_us, BusFrameKind kind) {
+    this->last_rx_us_ = now_us;
+    if (kind == BUS_OWN_ECHO) {
+      this->stats_.echoes++;
+      return;
+    }
+    if (!this->awaiting_) {
+      return;
+    }
+    if (kind == BUS_OTHER_CONTROLLER) {
+      this->collision_(now_us);
+      return;
+    }
+    this->awaiting_ = false;
+    this->attempts_ = 0;
+    uint32_t rtt = now_us - this->sent_us_;
+    TransmitStats &s = this->stats_;
+    s.replies++;
+    s.rtt_last_us = rtt;
+    s.rtt_sum_us += rtt;
+    if (rtt < s.rtt_min_us)
+      s.rtt_min_us = rtt;
+    if (rtt > s.rtt_max_us)
+      s.rtt_max_us = rtt;
+  }
+
+  // The decoder rejected bytes (bad checksum, resync, noise) at now_us
+  void on_line_error(uint32_t now_us) {
+    this->last_rx_us_ = now_us;
+    if (this->awaiting_) {
+      this->collision_(now_us);
+    }
+  }
+
+  // True if a request should be written now. line_busy: bytes wait in the
+  // UART. Call on_sent() right after writing, or skip() if there is nothing
+  // to send.
+  bool poll(uint32_t now_us, bool line_busy) {
+    if (this->awaiting_) {
+      if (now_us - this->sent_us_ < this->response_timeout_us_) {
+        return false;
+      }
+      this->awaiting_ = false;
+      this->stats_.timeouts++;
+      this->schedule_retry_(now_us);
+    }
+    uint32_t due = this->retry_pending_ ? this->retry_at_us_ : this->next_cycle_us_;
+    if (static_cast<int32_t>(now_us - due) < 0) {
+      return false;
+    }
+    if (line_busy || now_us - this->last_rx_us_ < IDLE_GAP_US) {
+      this->stats_.busy_backoffs++;
+      uint32_t retry_at = now_us + this->backoff_us_;
+      if (this->retry_pending_) {
+        this->retry_at_us_ = retry_at;
+      } else {
+        this->next_cycle_us_ = retry_at;
+      }
+      this->backoff_us_ = this->backoff_us_ * 2 > MAX_BACKOFF_US ? MAX_BACKOFF_US : this->backoff_us_ * 2;
+      return false;
+    }
+    return true;
+  }
+
+  void on_sent(uint32_t now_us) {
+    this->advance_(now_us);
+    this->awaiting_ = true;
+    this->sent_us_ = now_us;
+    this->stats_.sent++;
+  }
+
+  // A request was due but there was nothing to send
+  void skip(uint32_t now_us) {
+    this->advance_(now_us);
+    this->attempts_ = 0;
+  }
+
+  bool awaiting_reply() const { return this->awaiting_; }
+  const TransmitStats &stats() const { return this->stats_; }
+
+ protected:
+  void advance_(uint32_t now_us) {
+    this->backoff_us_ = MIN_BACKOFF_US;
+    if (this->retry_pending_) {
+      this->retry_pending_ = false;
+      return;
+    }
+    // Keep the phase of the cycle unless backoff pushed it past a whole interval
+    this->next_cycle_us_ += this->interval_us_;
+    if (static_cast<int32_t>(now_us - this->next_cycle_us_) >= 0) {
+      this->next_cycle_us_ = now_us + this->interval_us_;
+    }
+  }
+
+  void collision_(uint32_t now_us) {
+    this->awaiting_ = false;
+    this->stats_.collisions++;
+    this->schedule_retry_(now_us);
+  }
+
+  void schedule_retry_(uint32_t now_us) {
+    uint32_t retry_at = now_us + this->backoff_us_;
+    // A retry is pointless once the next regular request is due
+    if (this->attempts_ >= MAX_RETRIES || static_cast<int32_t>(retry_at - this->next_cycle_us_) >= 0) {
+      this->attempts_ = 0;
+      return;
+    }
+    this->attempts_++;
+    this->stats_.retries++;
+    this->retry_pending_ = true;
+    this->retry_at_us_ = retry_at;
+  }
+
+  uint32_t interval_us_{1000000};
+  uint32_t response_timeout_us_{RESPONSE_TIMEOUT_US};
+  uint32_t next_cycle_us_{0};
+  uint32_t last_rx_us_{0};
+  uint32_t sent_us_{0};
+  uint32_t retry_at_us_{0};
+  uint32_t backoff_us_{MIN_BACKOFF_US};
+  uint8_t attempts_{0};
+  bool awaiting_{false};
+  bool retry_pending_{false};
+  TransmitStats stats_;
+};
+
+}  // namespace vevorheater
+}  // namespace esphome
@@ -3,20 +3,25 @@
 
 #include "esphome/core/log.h"
 #include "esphome/core/hal.h"
+#include "esphome/core/helpers.h"
+#include "esphome/core/preferences.h"
+#include <algorithm>
 #include <cinttypes>
+#include <cmath>
+#include <cstring>
 
-uint8_t calculateChecksum(const std::vector<uint8_t>& frame) {
+uint8_t calculateChecksum(const uint8_t *frame, size_t size) {
     // Ensure the frame has at least 3 bytes:
     // - Byte 0: Identifier (0xAA)
     // - Byte 1: Device ID
     // - Byte 2: Start of data
     // - Byte (N-1): Checksum
-    if (frame.size() < 4) {
+    if (size < 4) {
         return 0;
     }
     uint32_t sum = 0;
     // Sum all bytes from index 2 to index (size - 2) inclusive
-    for (size_t i = 2; i < frame.size() - 1; ++i) {
+    for (size_t i = 2; i < size - 1; ++i) {
         sum += frame[i];
     }
     // Calculate checksum as sum modulo 256
@@ -29,6 +34,27 @@ namespace vevorheater {
 
 static const char *const TAG = "vevorheater.component";
 
+// Per-field frame logs: compiled out below DEBUG, and at DEBUG only written in
+// the fields log mode, so their float formatting never runs otherwise
+#if ESPHOME_LOG_LEVEL >= ESPHOME_LOG_LEVEL_DEBUG
+#define VEVOR_LOG_FIELD(enabled, ...) \
+  do { \
+    if (enabled) \
+      ESP_LOGD(TAG, __VA_ARGS__); \
+  } while (0)
+#else
+#define VEVOR_LOG_FIELD(enabled, ...) (void) (enabled)
+#endif
+
+static const uint32_t DIAGNOSTICS_INTERVAL_MS = 1000;
+static const uint32_t LATENCY_REPORT_INTERVAL_MS = 60000;
+// Bytes handled per receive_() call in receive_mode loop, so one busy bus
+// cannot stall the other heaters sharing the main loop. Polling drains the
+// whole FIFO, or it would fall behind the line between two updates.
+static const uint32_t MAX_BYTES_PER_RECEIVE = LONG_FRAME_SIZE;
+
+std::vector<VevorHeater *> VevorHeater::heaters_;
+
 void VevorHeater::setup() {
   ESP_LOGD(TAG, "VevorHeater setup");
   if (!this->uart_) {
@@ -36,208 +62,198 @@ void VevorHeater::setup() {
     return;
   }
   this->uart_->set_baud_rate(4800);
-  this->last_received_time_ = millis(); // Initialize the timestamp
+  this->decoder_.reset();
 
   this->state_ = VevorHeaterState::OFF;
   this->heater_requested_on_ = false;
   this->heater_level_percentage_ = 100;
-  this->last_send_time = millis();
+  this->controller_frames_.set_level(this->heater_level_percentage_ / 10);
+  this->setup_telemetry_();
+  if (this->capture_capacity_ > 0) {
+    this->capture_.init(this->capture_capacity_);
+  }
+#ifdef USE_VEVORHEATER_WEB
+  this->setup_web_();
+#endif
+
+  // The controller sends from loop() whenever the scheduler finds the line
+  // idle and a request due. With several heaters the first requests are
+  // phase shifted so each one gets its own transmit slot.
+  this->rx_empty_us_ = micros();
+  size_t slot = 0;
+  while (heaters_[slot] != this) {
+    slot++;
+  }
+  uint32_t phase_us = static_cast<uint32_t>(static_cast<uint64_t>(slot) * this->scheduler_.interval_us() /
+                                            heaters_.size());
+  // Polled replies are decoded up to one update_interval after they arrived
+  if (this->receive_mode_ == RECEIVE_POLLING) {
+    this->scheduler_.set_response_timeout_us(RESPONSE_TIMEOUT_US + this->get_update_interval() * 1000);
+  }
+  this->scheduler_.start(micros(), phase_us);
+  this->set_interval("diagnostics", DIAGNOSTICS_INTERVAL_MS, [this]() { this->publish_diagnostics_(); });
+  this->set_interval("latency_report", LATENCY_REPORT_INTERVAL_MS, [this]() {
+    this->log_latency_histogram_();
+    this->log_transmit_stats_();
+  });
+}
+
+void VevorHeater::loop() {
+  if (!this->uart_) {
+    return;
+  }
+  if (this->receive_mode_ == RECEIVE_LOOP) {
+    this->receive_();
+  }
+  this->transmit_();
+#ifdef USE_VEVORHEATER_WEB
+  this->serve_web_();
+#endif
 }
 
 void VevorHeater::update() {
-  bool received_data = false;
+  if (this->receive_mode_ == RECEIVE_POLLING) {
+    this->receive_();
+  }
+}
 
-  // Read available bytes and add them to the frame buffer
-  while (this->uart_->available()) {
+void VevorHeater::receive_() {
+  // Feed available bytes to the decoder; a frame is processed as soon as its
+  // last byte (known from the length field) has arrived
+  uint32_t bytes_since_empty = this->rx_bytes_since_empty_;
+  uint32_t budget = this->receive_mode_ == RECEIVE_LOOP ? MAX_BYTES_PER_RECEIVE : UINT32_MAX;
+  uint32_t bytes_read = 0;
+  uint32_t line_errors =
+      this->decoder_.checksum_errors() + this->decoder_.resyncs() + this->decoder_.dropped_bytes();
+  while (bytes_read < budget && this->uart_->available()) {
+    bytes_read++;
     uint8_t data;
     this->uart_->read_byte(&data);
-    this->frame_buffer_.push_back(data);
-    this->last_received_time_ = millis(); // Update the timestamp
-    ESP_LOGD(TAG, "Received byte: 0x%02X", data);
-    received_data = true;
-  }
-
-  // Check if the timeout has been exceeded and there is data in the buffer
-  if (!this->frame_buffer_.empty()) {
-    uint32_t current_time = millis();
-    if ((current_time - this->last_received_time_) > 10) { // 10 ms timeout
-      ESP_LOGD(TAG, "Frame complete. Processing frame of %d bytes.", this->frame_buffer_.size());
-      process_frame(this->frame_buffer_);
-      this->frame_buffer_.clear(); // Clear the buffer for the next frame
-    }
-  }
-
-  uint32_t now = millis();
-  if (now - last_send_time >= 1000) {
-    last_send_time = now;
-    
-    // Only send frames if heater is not already off and stable
-    // This allows continued communication during cooldown phase
-    bool should_send_frame = true;
-    if (!heater_requested_on_ && this->state_ == VevorHeaterState::OFF) {
-      should_send_frame = false;
-    }
-    
-    if (should_send_frame) {
-      std::vector<uint8_t> short_frame;
-      // if heater is requested to be off
-      if (!heater_requested_on_) {
-        if (this->state_ != VevorHeaterState::STOPPING_COOLING) {
-        // Send short frame to turn heater OFF
-        short_frame.push_back(0xAA); 
-        short_frame.push_back(0x66); 
-        short_frame.push_back(0x06); 
-        short_frame.push_back(0x0B);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(10);
-        short_frame.push_back(0x05);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        uint8_t checksum = calculateChecksum(short_frame);
-        short_frame.push_back(checksum);
-        
-        this->uart_->write_array(short_frame.data(), short_frame.size());
-        ESP_LOGD(TAG, "Sent short frame to set level %u%%", this->heater_level_percentage_);
-      } else {
-        // Send short frame to keep heater shutting OFF
-        short_frame.push_back(0xAA); 
-        short_frame.push_back(0x66); 
-        short_frame.push_back(0x02); 
-        short_frame.push_back(0x0B);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(10);
-        short_frame.push_back(0x02);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        uint8_t checksum = calculateChecksum(short_frame);
-        short_frame.push_back(checksum);
-        
-        this->uart_->write_array(short_frame.data(), short_frame.size());
-        ESP_LOGD(TAG, "Sent short frame to set level %u%%", this->heater_level_percentage_);
+    bytes_since_empty++;
+    ESP_LOGVV(TAG, "Received byte: 0x%02X", data);
+    // After a resync one byte can complete a frame with the next ones already
+    // buffered behind it
+    bool complete = this->decoder_.push(data);
+    while (complete) {
+      this->scheduler_.on_frame(micros(), this->classify_frame_(this->decoder_.data(), this->decoder_.size()));
+      if (this->capture_capacity_ > 0) {
+        LockGuard guard(this->capture_lock_);
+        this->capture_.add(millis(), this->decoder_.data(), this->decoder_.size());
       }
-    // if heater is requested to be on
-    } else {
-      if (this->state_ == VevorHeaterState::OFF) {
-        // Send short frame to turn heater ON
-        short_frame.push_back(0xAA); 
-        short_frame.push_back(0x66); 
-        short_frame.push_back(0x06); 
-        short_frame.push_back(0x0B);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(this->heater_level_percentage_/10);
-        short_frame.push_back(0x06);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        uint8_t checksum = calculateChecksum(short_frame);
-        short_frame.push_back(checksum);
-
-        this->uart_->write_array(short_frame.data(), short_frame.size());
-        ESP_LOGD(TAG, "Sent short frame to turn heater ON with level %u%%", this->heater_level_percentage_);
-      } else {
-        // Send short frame to keep heater ON
-        short_frame.push_back(0xAA); 
-        short_frame.push_back(0x66); 
-        short_frame.push_back(0x02); 
-        short_frame.push_back(0x0B);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(this->heater_level_percentage_/10);
-        short_frame.push_back(0x08);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        short_frame.push_back(0x00);
-        uint8_t checksum = calculateChecksum(short_frame);
-        short_frame.push_back(checksum);
-        
-        this->uart_->write_array(short_frame.data(), short_frame.size());
-        ESP_LOGD(TAG, "Sent short frame to set level %u%%", this->heater_level_percentage_);
+      ESP_LOGV(TAG, "Frame complete. Processing frame of %u bytes.", static_cast<unsigned>(this->decoder_.size()));
+      process_frame(this->decoder_.data(), this->decoder_.size());
+      // The FIFO was empty at rx_empty_us_ and bytes arrive no faster than
+      // the line rate, so the last byte came no earlier than this
+      uint32_t earliest_us = this->rx_empty_us_ + bytes_since_empty * BUS_BYTE_TIME_US;
+      int32_t elapsed_us = static_cast<int32_t>(micros() - earliest_us);
+      uint32_t latency_us = elapsed_us > 0 ? elapsed_us : 0;
+      this->latency_.record(latency_us);
+      if (latency_us > this->period_max_latency_us_) {
+        this->period_max_latency_us_ = latency_us;
       }
+      complete = this->decoder_.next();
     }
+  }
+  if (bytes_read > 0) {
+    uint32_t now = micros();
+    this->scheduler_.on_receive(now);
+    if (this->decoder_.checksum_errors() + this->decoder_.resyncs() + this->decoder_.dropped_bytes() != line_errors) {
+      this->scheduler_.on_line_error(now);
     }
   }
+  if (bytes_read == budget) {
+    // Out of budget, the rest is handled on the next call
+    this->rx_bytes_since_empty_ = bytes_since_empty;
+    return;
+  }
+  this->rx_bytes_since_empty_ = 0;
+  this->rx_empty_us_ = micros();
+}
+
+BusFrameKind VevorHeater::classify_frame_(const uint8_t *frame, size_t size) const {
+  if (frame[1] != CONTROLLER_ID) {
+    return BUS_HEATER_REPLY;
+  }
+  // The half-duplex line hands every request we send back to us
+  bool echo = this->sent_any_ && size == SHORT_FRAME_SIZE &&
+              std::memcmp(frame, this->last_sent_.data(), SHORT_FRAME_SIZE) == 0;
+  return echo ? BUS_OWN_ECHO : BUS_OTHER_CONTROLLER;
+}
 
-  // Handle Heater Control based on internal state
-//   if (heater_requested_on_) {
-//         // Send short frame once per second with current heater level
-//         static uint32_t last_send_time = 0;
-//         uint32_t now = millis();
-//         if (now - last_send_time >= 1000) { // 1 second interval
-//         last_send_time = now;
-//         std::vector<uint8_t> short_frame;
-
-//         // TODO: Populate with appropriate short frame data based on heater_level_percentage_
-//         // Example short frame structure (replace with actual frame format)
-//         short_frame.push_back(0xAA); 
-//         short_frame.push_back(0x66); 
-//         short_frame.push_back(0x02); 
-//         short_frame.push_back(0x0B);
-//         short_frame.push_back(0x00);
-//         short_frame.push_back(0x00);
-//         short_frame.push_back(0x00);
-//         short_frame.push_back(0x00);
-//         short_frame.push_back(this->heater_level_percentage_/10);
-//         short_frame.push_back(0x08);
-//         short_frame.push_back(0x00);
-//         short_frame.push_back(0x00);
-//         short_frame.push_back(0x00);
-//         uint8_t checksum = calculateChecksum(short_frame);
-//         short_frame.push_back(checksum);
-
-//         this->uart_->write_array(short_frame.data(), short_frame.size());
-//         ESP_LOGD(TAG, "Sent short frame to turn heater ON with level %u%%", this->heater_level_percentage_);
-// }
-//   } else {
-//     // Heater is requested to be off, but continue sending frames until main unit confirms off
-//     // Check the state_sensor_ to determine if heater is still on
-//     if (this->state_sensor_ && this->state_sensor_->state != 0) { // Assuming 0 is OFF
-//       std::vector<uint8_t> short_frame;
-
-//       short_frame.push_back(0xAA); 
-//       short_frame.push_back(0x66); 
-//       short_frame.push_back(0x02); 
-//       short_frame.push_back(0x0B);
-//       short_frame.push_back(0x00);
-//       short_frame.push_back(0x00);
-//       short_frame.push_back(0x00);
-//       short_frame.push_back(0x00);
-//       short_frame.push_back(this->heater_level_percentage_/10);
-//       short_frame.push_back(0x02);
-//       short_frame.push_back(0x00);
-//       short_frame.push_back(0x00);
-//       short_frame.push_back(0x00);
-//       uint8_t checksum = calculateChecksum(short_frame);
-//       short_frame.push_back(checksum);
-
-//       this->uart_->write_array(short_frame.data(), short_frame.size());
-//       ESP_LOGD(TAG, "Sent short frame to turn heater OFF");
-//     }
-//   }
+void VevorHeater::publish_diagnostics_() {
+  this->publish_error_counters_();
+  this->publish_transmit_counters_();
+  if (this->frame_latency_sensor_ && this->period_max_latency_us_ > 0) {
+    this->frame_latency_sensor_->publish_state(this->period_max_latency_us_ / 1000.0f);
+    this->period_max_latency_us_ = 0;
+  }
 }
 
-void VevorHeater::process_frame(const std::vector<uint8_t> &frame) {
-  if (frame.empty()) {
+void VevorHeater::transmit_() {
+  uint32_t now = micros();
+  if (!this->scheduler_.poll(now, this->uart_->available() > 0)) {
+    return;
+  }
+
+  // Only send frames if heater is not already off and stable
+  // This allows continued communication during cooldown phase
+  if (!heater_requested_on_ && this->state_ == VevorHeaterState::OFF) {
+    this->scheduler_.skip(now);
+    return;
+  }
+
+  ControllerFrameKind kind;
+  if (!heater_requested_on_) {
+    // Turn heater OFF, then keep it shutting off while it cools down
+    kind = this->state_ == VevorHeaterState::STOPPING_COOLING ? FRAME_KEEP_COOLING : FRAME_SET_OFF;
+  } else {
+    // Turn heater ON, then keep it running
+    kind = this->state_ == VevorHeaterState::OFF ? FRAME_SET_ON : FRAME_RUNNING;
+  }
+  const ControllerFrame &short_frame = this->controller_frames_.get(kind);
+  // The line has been idle for longer than bytes of one frame are apart
+  this->decoder_.discard_partial();
+  this->last_sent_ = short_frame;
+  this->sent_any_ = true;
+  this->uart_->write_array(short_frame.data(), short_frame.size());
+  this->scheduler_.on_sent(now);
+  ESP_LOGD(TAG, "Sent short frame %u with level %u%%", static_cast<unsigned>(kind), this->heater_level_percentage_);
+}
+
+void LatencyHistogram::record(uint32_t latency_us) {
+  size_t bucket = 0;
+  for (uint32_t limit_ms = 1; bucket < BUCKETS - 1 && latency_us >= limit_ms * 1000; limit_ms <<= 1) {
+    bucket++;
+  }
+  this->counts[bucket]++;
+  if (latency_us > this->max_us) {
+    this->max_us = latency_us;
+  }
+}
+
+void VevorHeater::log_latency_histogram_() {
+  const uint32_t *c = this->latency_.counts;
+  const char *separator = this->name_prefix_.empty() ? "" : ": ";
+  ESP_LOGD(TAG,
+           "%s%sFrame latency [ms] <1:%" PRIu32 " <2:%" PRIu32 " <4:%" PRIu32 " <8:%" PRIu32 " <16:%" PRIu32
+           " <32:%" PRIu32 " <64:%" PRIu32 " <128:%" PRIu32 " <256:%" PRIu32 " >=256:%" PRIu32 " max:%.1f",
+           this->name_prefix_.c_str(), separator, c[0], c[1], c[2], c[3], c[4], c[5], c[6], c[7], c[8], c[9],
+           this->latency_.max_us / 1000.0f);
+}
+
+void VevorHeater::log_transmit_stats_() {
+  const TransmitStats &s = this->scheduler_.stats();
+  const char *separator = this->name_prefix_.empty() ? "" : ": ";
+  float rtt_mean_ms = s.replies > 0 ? s.rtt_sum_us / 1000.0f / s.replies : 0.0f;
+  ESP_LOGD(TAG,
+           "%s%sTransmit sent:%" PRIu32 " replies:%" PRIu32 " echoes:%" PRIu32 " collisions:%" PRIu32
+           " timeouts:%" PRIu32 " retries:%" PRIu32 " backoffs:%" PRIu32 " rtt [ms] min:%.1f mean:%.1f max:%.1f",
+           this->name_prefix_.c_str(), separator, s.sent, s.replies, s.echoes, s.collisions, s.timeouts, s.retries,
+           s.busy_backoffs, s.replies > 0 ? s.rtt_min_us / 1000.0f : 0.0f, rtt_mean_ms, s.rtt_max_us / 1000.0f);
+}
+
+void VevorHeater::process_frame(const uint8_t *frame, size_t size) {
+  if (size == 0) {
     ESP_LOGW(TAG, "Empty frame received.");
     return;
   }
@@ -245,226 +261,389 @@ void VevorHeater::process_frame(const std::vector<uint8_t> &frame) {
   // Check for frame start byte
   if (frame[0] != 0xAA) {
     ESP_LOGW(TAG, "Invalid frame start byte: 0x%02X", frame[0]);
+    this->bad_frames_++;
     return;
   }
 
   // Silently ignore controller frame echoes (our own transmissions)
-  if (frame.size() > 1 && frame[1] == 0x66) {
+  if (size > 1 && frame[1] == 0x66) {
     ESP_LOGVV(TAG, "Ignoring controller frame echo");
     return;
   }
 
   // Check for heater ID
-  if (frame.size() > 1 && frame[1] != 0x77) {
+  if (size > 1 && frame[1] != 0x77) {
     ESP_LOGW(TAG, "Invalid device ID: 0x%02X", frame[1]);
+    this->bad_frames_++;
     return;
   }
 
   // Determine frame type based on length field (byte 3)
   uint8_t length_field = 0;
-  if (frame.size() > 3) {
+  if (size > 3) {
     length_field = frame[3];
   } else {
     ESP_LOGW(TAG, "Frame too short to determine type.");
+    this->bad_frames_++;
     return;
   }
 
-  if (length_field == 0x0B && frame.size() >= 15) {
+  // Diagnostics, at most one frame of each type per log interval
+  bool long_frame = length_field == LONG_LENGTH_FIELD;
+  bool log_due = this->log_mode_ != LOG_MODE_NONE && this->log_due_(long_frame);
+  bool log_fields = log_due && this->log_mode_ == LOG_MODE_FIELDS;
+#if ESPHOME_LOG_LEVEL >= ESPHOME_LOG_LEVEL_DEBUG
+  if (log_due && this->log_mode_ == LOG_MODE_HEX) {
+    ESP_LOGD(TAG, "Frame %s", format_hex_pretty(frame, size).c_str());
+  }
+#endif
+
+  if (length_field == 0x0B && size >= SHORT_FRAME_SIZE) {
     // Short Frame: controller -> main unit
-    ESP_LOGD(TAG, "Processing Short Frame");
-    
+    VEVOR_LOG_FIELD(log_fields, "Processing Short Frame");
+
+    // Byte 15: Checksum (1-255)
+    uint8_t checksum = read_uint8(frame, size, SHORT_FRAME_SIZE - 1);
+    if (checksum != calculateChecksum(frame, SHORT_FRAME_SIZE)) {
+      ESP_LOGW(TAG, "Short Frame - Checksum mismatch: 0x%02X", checksum);
+      this->bad_frames_++;
+      return;
+    }
+
     // Byte 8: Power Level (1-10)
-    uint8_t power_level = read_uint8(frame, 8)*10;
+    uint8_t power_level = read_uint8(frame, size, 8)*10;
     if (this->short_power_level_sensor_) {
-      this->short_power_level_sensor_->publish_state(power_level);
-      ESP_LOGD(TAG, "Short Frame - Power Level: %u%%", power_level);
+      this->publish_(this->short_power_level_sensor_, power_level);
+      VEVOR_LOG_FIELD(log_fields, "Short Frame - Power Level: %u%%", power_level);
     }
 
     // Byte 9: Requested State (0x02: off, 0x06: start, 0x08: running)
-    uint8_t requested_state = read_uint8(frame, 9);
+    uint8_t requested_state = read_uint8(frame, size, 9);
     if (this->short_state_sensor_) {
-      this->short_state_sensor_->publish_state(requested_state);
-      ESP_LOGD(TAG, "Short Frame - Requested State: 0x%02X", requested_state);
+      this->publish_(this->short_state_sensor_, requested_state);
+      VEVOR_LOG_FIELD(log_fields, "Short Frame - Requested State: 0x%02X", requested_state);
     }
     if (this->short_frame_state_text_sensor_) {
       if (requested_state == 0x02) {
-        this->short_frame_state_text_sensor_->publish_state("Off");
+        this->publish_text_(this->short_frame_state_text_sensor_, "Off");
       } else if (requested_state == 0x05) {
-        this->short_frame_state_text_sensor_->publish_state("Set Off");
+        this->publish_text_(this->short_frame_state_text_sensor_, "Set Off");
       } else if (requested_state == 0x06) {
-        this->short_frame_state_text_sensor_->publish_state("Set On");
+        this->publish_text_(this->short_frame_state_text_sensor_, "Set On");
       } else if (requested_state == 0x08) {
-        this->short_frame_state_text_sensor_->publish_state("Running");
+        this->publish_text_(this->short_frame_state_text_sensor_, "Running");
       } else {
-        this->short_frame_state_text_sensor_->publish_state("Unknown");
+        this->publish_text_(this->short_frame_state_text_sensor_, "Unknown");
       }
     }
-
-    // Byte 14: Checksum (1-255)
-    uint8_t checksum = read_uint8(frame, 14);
-    // Optionally, implement checksum verification here
-
   }
-  else if (length_field == 0x33 && frame.size() >= 56) {
+  else if (length_field == 0x33 && size >= LONG_FRAME_SIZE) {
     // Long Frame: main unit -> controller
-    ESP_LOGD(TAG, "Processing Long Frame");
+    VEVOR_LOG_FIELD(log_fields, "Processing Long Frame");
 
-    // Existing Long Frame processing logic...
-    // [Keep all existing code here without changes]
+    // Byte 55: Checksum (1-254)
+    uint8_t checksum = read_uint8(frame, size, LONG_FRAME_SIZE - 1);
+    if (checksum != calculateChecksum(frame, LONG_FRAME_SIZE)) {
+      ESP_LOGW(TAG, "Long Frame - Checksum mismatch: 0x%02X", checksum);
+      this->bad_frames_++;
+      return;
+    }
 
-    // Byte 4: Heater Enabled? (0-1)
-    uint8_t heater_enabled = read_uint8(frame, 4);
-    if (this->voltage_sensor_) { // Example: Use heater_enabled to influence voltage sensor
-      // Implement logic if needed
-      ESP_LOGD(TAG, "Long Frame - Heater Enabled: %u", heater_enabled);
+    // Fields published as sensors, laid out in long_frame_fields.py
+    for (const auto &field_sensor : this->field_sensors_) {
+      const LongFrameField &field = *field_sensor.field;
+      float value = field.decode(frame);
+      this->publish_(field_sensor.sensor, value);
+      VEVOR_LOG_FIELD(log_fields, "Long Frame - %s: %.*f %s", field.name, field.decimals, value, field.unit);
     }
 
     // Byte 5: State (0x00: off, 0x01: glow plug pre heat, 0x02: ignited, 0x03: stable combustion, 0x04: stoping, cooling) [state]
-    uint8_t state = read_uint8(frame, 5);
+    uint8_t state = read_uint8(frame, size, 5);
     this->state_ = static_cast<VevorHeaterState>(state);
-    if (this->state_sensor_) {
-      this->state_sensor_->publish_state(state);
-      ESP_LOGD(TAG, "Long Frame - State: %u", state);
-    }
     if (this->state_text_sensor_) {
       if (state == 0x00) {
-        this->state_text_sensor_->publish_state("Off");
+        this->publish_text_(this->state_text_sensor_, "Off");
       } else if (state == 0x01) {
-        this->state_text_sensor_->publish_state("Glow Plug Pre Heat");
+        this->publish_text_(this->state_text_sensor_, "Glow Plug Pre Heat");
       } else if (state == 0x02) {
-        this->state_text_sensor_->publish_state("Ignited");
+        this->publish_text_(this->state_text_sensor_, "Ignited");
       } else if (state == 0x03) {
-        this->state_text_sensor_->publish_state("Stable Combustion");
+        this->publish_text_(this->state_text_sensor_, "Stable Combustion");
       } else if (state == 0x04) {
-        this->state_text_sensor_->publish_state("Stopping, Cooling");
+        this->publish_text_(this->state_text_sensor_, "Stopping, Cooling");
       } else {
-        this->state_text_sensor_->publish_state("Unknown");
+        this->publish_text_(this->state_text_sensor_, "Unknown");
       }
     }
 
-    // Byte 6: Power Level (0x01-0x0A)
-    uint8_t power_level = read_uint8(frame, 6)*10;
-    if (this->power_level_sensor_) {
-      this->power_level_sensor_->publish_state(power_level);
-      ESP_LOGD(TAG, "Long Frame - Power Level: %u%%", power_level);
+    // Raw values for the summary log and the telemetry buffer
+    uint8_t level = read_uint8(frame, size, 6);
+    uint8_t input_voltage_raw = read_uint8(frame, size, 11);
+    int16_t heat_exchanger_temp_raw = read_uint16(frame, size, 16);
+    uint8_t pump_freq_raw = read_uint8(frame, size, 23);
+    uint16_t fan_speed_raw = read_uint16(frame, size, 28);
+
+#if ESPHOME_LOG_LEVEL >= ESPHOME_LOG_LEVEL_DEBUG
+    if (log_due && this->log_mode_ == LOG_MODE_SUMMARY) {
+      ESP_LOGD(TAG, "State %u, level %u%%, heat exchanger %.1f °C, input %.1f V, pump %.1f Hz, fan %u rpm", state,
+               level * 10, heat_exchanger_temp_raw / 10.0f, input_voltage_raw / 10.0f, pump_freq_raw / 10.0f,
+               fan_speed_raw);
     }
-
-    // Byte 11: Input Voltage [V * 10] (153-158)
-    uint8_t input_voltage_raw = read_uint8(frame, 11);
-    float input_voltage = input_voltage_raw / 10.0;
-    if (this->input_voltage_sensor_) {
-      this->input_voltage_sensor_->publish_state(input_voltage);
-      ESP_LOGD(TAG, "Long Frame - Input Voltage: %.1f V", input_voltage);
+#endif
+
+    if (this->telemetry_capacity_ > 0) {
+      TelemetrySample sample;
+      sample.state = state;
+      sample.level = level;
+      sample.heat_exchanger_temp = heat_exchanger_temp_raw;
+      sample.input_voltage = input_voltage_raw;
+      sample.pump_frequency = pump_freq_raw;
+      sample.fan_speed = fan_speed_raw;
+      this->record_telemetry_(sample);
     }
 
-    // Byte 13: Glow Plug Current [A] (0-12)
-    uint8_t glow_plug_current = read_uint8(frame, 13);
-    if (this->glow_plug_current_sensor_) {
-      this->glow_plug_current_sensor_->publish_state(glow_plug_current);
-      ESP_LOGD(TAG, "Long Frame - Glow Plug Current: %u A", glow_plug_current);
-    }
+  }
+  else {
+    ESP_LOGW(TAG, "Unknown frame type or incorrect frame length. Length field: 0x%02X, Frame size: %u", length_field, static_cast<unsigned>(size));
+    this->bad_frames_++;
+  }
+}
 
-    // Byte 14: Cooling Down [0/1]
-    uint8_t cooling_down = read_uint8(frame, 14);
-    if (this->cooling_down_sensor_) {
-      this->cooling_down_sensor_->publish_state(cooling_down);
-      ESP_LOGD(TAG, "Long Frame - Cooling Down: %u", cooling_down);
-    }
+void VevorHeater::dump_config() { 
+  if (!this->name_prefix_.empty()) {
+    ESP_LOGCONFIG(TAG, "Vevor Heater '%s'", this->name_prefix_.c_str());
+  }
+  LOG_SENSOR("", "Vevor Heater Voltage", this->voltage_sensor_);
+  LOG_SENSOR("", "Vevor Heater Temperature", this->temperature_sensor_);
+  for (const auto &field_sensor : this->field_sensors_) {
+    const LongFrameField &field = *field_sensor.field;
+    ESP_LOGCONFIG(TAG, "  Long frame field %s: byte %u, %u byte(s), scale %g", field.name, field.offset, field.width,
+                  field.scale);
+    LOG_SENSOR("  ", "Sensor", field_sensor.sensor);
+  }
 
-    // Byte 15: Fan Voltage? Some temperature? [V] (0-16)
-    uint8_t fan_voltage_raw = read_uint8(frame, 15);
-    float fan_voltage = fan_voltage_raw / 1.0; // Assuming V
-    if (this->fan_voltage_sensor_) {
-      this->fan_voltage_sensor_->publish_state(fan_voltage);
-      ESP_LOGD(TAG, "Long Frame - Fan Voltage: %.1f V", fan_voltage);
-    }
+  LOG_SENSOR("", "Vevor Heater Short Frame Power Level", this->short_power_level_sensor_);
+  LOG_SENSOR("", "Vevor Heater Short Frame State", this->short_state_sensor_);
 
-    // Bytes 16-17: Heat Exchanger Temperature [°C * 100] (480-1630)
-    int16_t heat_exchanger_temp_raw = read_uint16(frame, 16);
-    float heat_exchanger_temp = heat_exchanger_temp_raw / 10.0;
-    if (this->heat_exchanger_temp_sensor_) {
-      this->heat_exchanger_temp_sensor_->publish_state(heat_exchanger_temp);
-      ESP_LOGD(TAG, "Long Frame - Heat Exchanger Temperature: %.2f °C", heat_exchanger_temp);
-    }
+  LOG_SENSOR("", "Vevor Heater Bad Frames", this->bad_frames_sensor_);
+  LOG_SENSOR("", "Vevor Heater Resyncs", this->resyncs_sensor_);
+  LOG_SENSOR("", "Vevor Heater Dropped Bytes", this->dropped_bytes_sensor_);
 
-    // Bytes 20-21: State Duration [s] (0-325)
-    uint16_t state_duration_raw = read_uint16(frame, 20);
-    if (this->state_duration_sensor_) {
-      this->state_duration_sensor_->publish_state(state_duration_raw);
-      ESP_LOGD(TAG, "Long Frame - State Duration: %us", state_duration_raw);
-    }
+  LOG_SENSOR("", "Vevor Heater Frame Latency", this->frame_latency_sensor_);
 
-    // Byte 23: Pump Frequency [Hz * 10] (0-51)
-    uint8_t pump_freq_raw = read_uint8(frame, 23);
-    float pump_frequency = pump_freq_raw / 10.0;
-    if (this->pump_frequency_sensor_) {
-      this->pump_frequency_sensor_->publish_state(pump_frequency);
-      ESP_LOGD(TAG, "Long Frame - Pump Frequency: %.1f Hz", pump_frequency);
-    }
+  ESP_LOGCONFIG(TAG, "  Transmit interval: %" PRIu32 " ms", this->scheduler_.interval_us() / 1000);
+  LOG_SENSOR("", "Vevor Heater Collisions", this->collisions_sensor_);
+  LOG_SENSOR("", "Vevor Heater Echoes", this->echoes_sensor_);
+  LOG_SENSOR("", "Vevor Heater Retries", this->retries_sensor_);
+  LOG_SENSOR("", "Vevor Heater Round Trip Time", this->round_trip_time_sensor_);
 
-    // Bytes 24-27: Glow Plug Voltage/Current/Temperature (0-66, 0-86, 0-56, 0-12)
-    uint8_t glow_plug_voltage = read_uint8(frame, 24);
-    uint8_t glow_plug_current_2 = read_uint8(frame, 25);
-    uint8_t glow_plug_temperature = read_uint8(frame, 26);
-    uint8_t glow_plug_misc = read_uint8(frame, 27);
+  if (this->telemetry_capacity_ > 0) {
+    ESP_LOGCONFIG(TAG, "  Telemetry: %u records, %u flash batches", static_cast<unsigned>(this->telemetry_capacity_),
+                  this->telemetry_flash_batches_);
+#ifdef USE_VEVORHEATER_WEB
+    ESP_LOGCONFIG(TAG, "  Telemetry download: %s", this->telemetry_path_.c_str());
+#endif
+  }
+  if (this->capture_capacity_ > 0) {
+    ESP_LOGCONFIG(TAG, "  Capture: %u frames, %" PRIu32 " captured, %" PRIu32 " dropped",
+                  static_cast<unsigned>(this->capture_capacity_), this->capture_.total(),
+                  this->capture_.total_dropped());
+#ifdef USE_VEVORHEATER_WEB
+    ESP_LOGCONFIG(TAG, "  Capture download: %s", this->capture_path_.c_str());
+#endif
+  }
 
-    if (this->glow_plug_voltage_sensor_) {
-      this->glow_plug_voltage_sensor_->publish_state(glow_plug_voltage);
-      ESP_LOGD(TAG, "Long Frame - Glow Plug Voltage: %u V", glow_plug_voltage);
-    }
+  static const char *const LOG_MODES[] = {"none", "summary", "hex", "fields"};
+  ESP_LOGCONFIG(TAG, "  Log mode: %s, every %" PRIu32 " ms", LOG_MODES[this->log_mode_], this->log_interval_ms_);
+  ESP_LOGCONFIG(TAG, "  Receive mode: %s", this->receive_mode_ == RECEIVE_LOOP ? "loop" : "polling");
+  ESP_LOGCONFIG(TAG, "  Sensors with publish policy: %u", static_cast<unsigned>(this->publish_states_.size()));
+  
+  // No switch and number to dump
+}
 
-    if (this->glow_plug_current_2_sensor_) {
-      this->glow_plug_current_2_sensor_->publish_state(glow_plug_current_2);
-      ESP_LOGD(TAG, "Long Frame - Glow Plug Current 2: %u A", glow_plug_current_2);
-    }
+bool VevorHeater::log_due_(bool long_frame) {
+  uint32_t now = millis();
+  uint32_t &last = this->last_log_ms_[long_frame ? 1 : 0];
+  if (this->logged_once_[long_frame ? 1 : 0] && now - last < this->log_interval_ms_) {
+    return false;
+  }
+  this->logged_once_[long_frame ? 1 : 0] = true;
+  last = now;
+  return true;
+}
 
-    if (this->glow_plug_temperature_sensor_) {
-      this->glow_plug_temperature_sensor_->publish_state(glow_plug_temperature);
-      ESP_LOGD(TAG, "Long Frame - Glow Plug Temperature: %u °C", glow_plug_temperature);
+void VevorHeater::setup_telemetry_() {
+  if (this->telemetry_capacity_ == 0) {
+    return;
+  }
+  this->telemetry_.init(this->telemetry_capacity_);
+
+  // Reload the batches saved before the last reboot, oldest first
+  uint32_t hash = fnv1_hash("vevorheater_telemetry" + this->name_prefix_);
+  std::vector<TelemetryBatch> batches;
+  for (uint8_t i = 0; i < this->telemetry_flash_batches_; i++) {
+    this->telemetry_prefs_.push_back(global_preferences->make_preference<TelemetryBatch>(hash + i, true));
+    TelemetryBatch batch;
+    if (this->telemetry_prefs_.back().load(&batch) && batch.sequence != 0) {
+      batches.push_back(batch);
     }
+  }
+  std::sort(batches.begin(), batches.end(),
+            [](const TelemetryBatch &a, const TelemetryBatch &b) { return a.sequence < b.sequence; });
+  for (const auto &batch : batches) {
+    this->telemetry_.restore(batch.records, TELEMETRY_KEYFRAME_INTERVAL);
+    this->telemetry_sequence_ = batch.sequence;
+  }
+  ESP_LOGD(TAG, "Telemetry buffer of %u records, %u restored from flash",
+           static_cast<unsigned>(this->telemetry_capacity_), static_cast<unsigned>(this->telemetry_.size()));
+}
 
-    // Bytes 28-29: Fan Speed [rpm] (0-3939)
-    uint16_t fan_speed_raw = read_uint16(frame, 28);
-    if (this->fan_speed_sensor_) {
-      this->fan_speed_sensor_->publish_state(fan_speed_raw);
-      ESP_LOGD(TAG, "Long Frame - Fan Speed: %u RPM", fan_speed_raw);
-    }
+void VevorHeater::record_telemetry_(const TelemetrySample &sample) {
+  this->telemetry_.add(millis(), sample);
+  if (this->telemetry_prefs_.empty() || this->telemetry_.since_keyframe() != 0) {
+    return;
+  }
+  // A keyframe interval just completed: save it to the next flash slot
+  TelemetryBatch batch;
+  batch.sequence = ++this->telemetry_sequence_;
+  size_t first = this->telemetry_.size() - TELEMETRY_KEYFRAME_INTERVAL;
+  for (size_t i = 0; i < TELEMETRY_KEYFRAME_INTERVAL; i++) {
+    batch.records[i] = this->telemetry_.at(first + i);
+  }
+  this->telemetry_prefs_[batch.sequence % this->telemetry_prefs_.size()].save(&batch);
+}
 
-    // Bytes 52-53: Something glow plug related (0-420)
-    uint16_t glow_plug_related = read_uint16(frame, 52);
-    // Implement if needed
+void VevorHeater::write_telemetry_dump(std::vector<uint8_t> &out) const {
+  TelemetryDumpHeader header;
+  this->telemetry_.dump_header(&header);
+  out.resize(sizeof(header) + this->telemetry_.size() * sizeof(TelemetryRecord));
+  std::memcpy(out.data(), &header, sizeof(header));
+  uint8_t *dst = out.data() + sizeof(header);
+  for (size_t i = 0; i < this->telemetry_.size(); i++, dst += sizeof(TelemetryRecord)) {
+    std::memcpy(dst, &this->telemetry_.at(i), sizeof(TelemetryRecord));
+  }
+}
 
-    // Byte 55: Checksum (1-254)
-    uint8_t checksum = read_uint8(frame, 55);
-    // Optionally, implement checksum verification here
+#ifdef USE_VEVORHEATER_WEB
+void VevorHeater::setup_web_() {
+  if (!this->web_base_) {
+    return;
+  }
+  this->web_base_->init();
+  if (this->telemetry_capacity_ > 0 && !this->telemetry_path_.empty()) {
+    this->telemetry_handler_ = new SnapshotWebHandler(this->telemetry_path_);
+    this->web_base_->add_handler(this->telemetry_handler_);
+  }
+  if (this->capture_capacity_ > 0 && !this->capture_path_.empty()) {
+    // Runs in the web server's task: only the finished batch is swapped out,
+    // for storage allocated before taking the lock
+    this->web_base_->add_handler(new BinaryWebHandler(this->capture_path_, [this](std::vector<uint8_t> &out) {
+      out.reserve(this->capture_.max_batch_bytes());
+      LockGuard guard(this->capture_lock_);
+      this->capture_.take(out);
+    }));
+  }
+}
 
+void VevorHeater::serve_web_() {
+  // The telemetry ring is only read here, in the main loop that adds to it
+  if (this->telemetry_handler_ && this->telemetry_handler_->requested()) {
+    this->telemetry_handler_->publish([this](std::vector<uint8_t> &out) { this->write_telemetry_dump(out); });
   }
-  else {
-    ESP_LOGW(TAG, "Unknown frame type or incorrect frame length. Length field: 0x%02X, Frame size: %d", length_field, frame.size());
+}
+#endif
+
+void VevorHeater::publish_error_counters_() {
+  uint32_t bad_frames = this->bad_frames_ + this->decoder_.checksum_errors();
+  if (this->bad_frames_sensor_ && bad_frames != this->published_bad_frames_) {
+    this->bad_frames_sensor_->publish_state(bad_frames);
+    this->published_bad_frames_ = bad_frames;
+  }
+  uint32_t resyncs = this->decoder_.resyncs();
+  if (this->resyncs_sensor_ && resyncs != this->published_resyncs_) {
+    this->resyncs_sensor_->publish_state(resyncs);
+    this->published_resyncs_ = resyncs;
+  }
+  uint32_t dropped_bytes = this->decoder_.dropped_bytes();
+  if (this->dropped_bytes_sensor_ && dropped_bytes != this->published_dropped_bytes_) {
+    this->dropped_bytes_sensor_->publish_state(dropped_bytes);
+    this->published_dropped_bytes_ = dropped_bytes;
   }
 }
 
-void VevorHeater::dump_config() { 
-  LOG_SENSOR("", "Vevor Heater Voltage", this->voltage_sensor_);
-  LOG_SENSOR("", "Vevor Heater Temperature", this->temperature_sensor_);
-  LOG_SENSOR("", "Vevor Heater State", this->state_sensor_);
-  LOG_SENSOR("", "Vevor Heater Power Level", this->power_level_sensor_);
-  LOG_SENSOR("", "Vevor Heater Fan Speed", this->fan_speed_sensor_);
-  LOG_SENSOR("", "Vevor Heater Pump Frequency", this->pump_frequency_sensor_);
-  LOG_SENSOR("", "Vevor Heater Input Voltage", this->input_voltage_sensor_);
-  LOG_SENSOR("", "Vevor Heater Glow Plug Current", this->glow_plug_current_sensor_);
-  LOG_SENSOR("", "Vevor Heater Cooling Down", this->cooling_down_sensor_);
-  LOG_SENSOR("", "Vevor Heater Fan Voltage", this->fan_voltage_sensor_);
-  LOG_SENSOR("", "Vevor Heater Heat Exchanger Temperature", this->heat_exchanger_temp_sensor_);
-  LOG_SENSOR("", "Vevor Heater State Duration", this->state_duration_sensor_);
-  LOG_SENSOR("", "Vevor Heater Glow Plug Voltage", this->glow_plug_voltage_sensor_);
-  LOG_SENSOR("", "Vevor Heater Glow Plug Current 2", this->glow_plug_current_2_sensor_);
-  LOG_SENSOR("", "Vevor Heater Glow Plug Temperature", this->glow_plug_temperature_sensor_);
+void VevorHeater::publish_transmit_counters_() {
+  const TransmitStats &s = this->scheduler_.stats();
+  if (this->collisions_sensor_ && s.collisions != this->published_collisions_) {
+    this->collisions_sensor_->publish_state(s.collisions);
+    this->published_collisions_ = s.collisions;
+  }
+  if (this->echoes_sensor_ && s.echoes != this->published_echoes_) {
+    this->echoes_sensor_->publish_state(s.echoes);
+    this->published_echoes_ = s.echoes;
+  }
+  if (this->retries_sensor_ && s.retries != this->published_retries_) {
+    this->retries_sensor_->publish_state(s.retries);
+    this->published_retries_ = s.retries;
+  }
+  // Mean round trip of the replies since the last publish
+  if (this->round_trip_time_sensor_ && s.replies != this->published_replies_) {
+    uint32_t replies = s.replies - this->published_replies_;
+    this->round_trip_time_sensor_->publish_state((s.rtt_sum_us - this->published_rtt_sum_us_) / 1000.0f / replies);
+    this->published_replies_ = s.replies;
+    this->published_rtt_sum_us_ = s.rtt_sum_us;
+  }
+}
 
-  LOG_SENSOR("", "Vevor Heater Short Frame Power Level", this->short_power_level_sensor_);
-  LOG_SENSOR("", "Vevor Heater Short Frame State", this->short_state_sensor_);
-  
-  // No switch and number to dump
+void VevorHeater::set_sensor_publish_policy(sensor::Sensor *sensor, bool only_on_change, float deadband,
+                                            float relative_deadband, uint32_t heartbeat_ms) {
+  SensorPublishState entry;
+  entry.sensor = sensor;
+  entry.policy.only_on_change = only_on_change;
+  entry.policy.deadband = deadband;
+  entry.policy.relative_deadband = relative_deadband;
+  entry.policy.heartbeat_ms = heartbeat_ms;
+  this->publish_states_.push_back(entry);
+}
+
+bool PublishPolicy::should_publish(float value, float last_value, uint32_t since_last_ms) const {
+  if (this->heartbeat_ms > 0 && since_last_ms >= this->heartbeat_ms) {
+    return true;
+  }
+  if (!this->only_on_change && this->deadband <= 0 && this->relative_deadband <= 0) {
+    return true;
+  }
+  // The value must move past both the absolute and the relative deadband
+  float diff = std::fabs(value - last_value);
+  return diff > this->deadband && diff > this->relative_deadband * std::fabs(last_value);
+}
+
+void VevorHeater::publish_(sensor::Sensor *sensor, float value) {
+  for (auto &entry : this->publish_states_) {
+    if (entry.sensor != sensor) {
+      continue;
+    }
+    uint32_t now = millis();
+    if (entry.published && !entry.policy.should_publish(value, entry.last_value, now - entry.last_publish_ms)) {
+      this->suppressed_count_++;
+      return;
+    }
+    entry.published = true;
+    entry.last_value = value;
+    entry.last_publish_ms = now;
+    break;
+  }
+  this->published_count_++;
+  sensor->publish_state(value);
+}
+
+void VevorHeater::publish_text_(text_sensor::TextSensor *sensor, const char *value) {
+  // Text sensors mirror the state bytes and are only sent when they change
+  if (this->text_only_on_change_ && sensor->state == value) {
+    this->suppressed_count_++;
+    return;
+  }
+  this->published_count_++;
+  sensor->publish_state(value);
 }
 
 float VevorHeater::get_setup_priority() const { return setup_priority::DATA; }
@@ -487,18 +666,19 @@ void VevorHeater::set_heater_level(float level) {
     return; // No change
   }
   this->heater_level_percentage_ = new_level;
+  this->controller_frames_.set_level(new_level / 10);
   ESP_LOGD(TAG, "Heater level set to %u%%", this->heater_level_percentage_);
 }
 
-uint16_t VevorHeater::read_uint16(const std::vector<uint8_t> &frame, size_t index) {
-  if (index + 1 >= frame.size()) {
+uint16_t VevorHeater::read_uint16(const uint8_t *frame, size_t size, size_t index) {
+  if (index + 1 >= size) {
     return 0;
   }
   return (static_cast<uint16_t>(frame[index]) << 8) | frame[index + 1];
 }
 
-uint8_t VevorHeater::read_uint8(const std::vector<uint8_t> &frame, size_t index) {
-  if (index >= frame.size()) {
+uint8_t VevorHeater::read_uint8(const uint8_t *frame, size_t size, size_t index) {
+  if (index >= size) {
     return 0;
   }
   return frame[index];
@@ -3,12 +3,22 @@
 #pragma once
 
 #include "esphome/core/component.h"
+#include "esphome/core/defines.h"
+#include "esphome/core/helpers.h"
 #include "esphome/core/automation.h"
 #include "esphome/core/preferences.h"
 #include "esphome/components/sensor/sensor.h"
 #include "esphome/components/text_sensor/text_sensor.h"
 #include "esphome/components/uart/uart.h"
+#include "capture_buffer.h"
+#include "controller_frames.h"
+#include "frame_decoder.h"
+#include "long_frame_fields.h"
+#include "telemetry_buffer.h"
+#include "transmit_scheduler.h"
+#include "web_handlers.h"
 
+#include <string>
 #include <vector>
 
 namespace esphome {
@@ -29,81 +39,249 @@ enum VevorHeaterShortFrameState {
   SHORT_RUNNING = 0x08,
 };
 
+// When a sensor value is worth sending to Home Assistant
+struct PublishPolicy {
+  bool only_on_change{false};
+  float deadband{0.0f};           // absolute change needed to publish
+  float relative_deadband{0.0f};  // change relative to the last published value
+  uint32_t heartbeat_ms{0};       // republish at least this often, 0 = never
+
+  bool should_publish(float value, float last_value, uint32_t since_last_ms) const;
+};
+
+// Where received bytes are drained from the UART
+enum ReceiveMode {
+  RECEIVE_POLLING = 0,  // in update(), every update_interval
+  RECEIVE_LOOP = 1,     // in loop(), on every main loop iteration
+};
+
+// What process_frame logs at DEBUG level
+enum LogMode {
+  LOG_MODE_NONE = 0,
+  LOG_MODE_SUMMARY = 1,  // one line per long frame
+  LOG_MODE_HEX = 2,      // the raw bytes of every frame
+  LOG_MODE_FIELDS = 3,   // one line per decoded field
+};
+
+// Worst-case time from the last byte of a frame arriving to its state being
+// published. Bucket 0 counts frames under 1 ms, bucket i frames under 2^i ms,
+// the last bucket everything slower.
+struct LatencyHistogram {
+  static const size_t BUCKETS = 10;
+  uint32_t counts[BUCKETS]{};
+  uint32_t max_us{0};
+
+  void record(uint32_t latency_us);
+};
+
+// Telemetry records mirrored to flash together, one keyframe interval
+struct TelemetryBatch {
+  uint32_t sequence;  // 0 for a slot never written
+  TelemetryRecord records[TELEMETRY_KEYFRAME_INTERVAL];
+};
+
+// A long frame field and the sensor it is published to
+struct FieldSensor {
+  const LongFrameField *field;
+  sensor::Sensor *sensor;
+};
+
+struct SensorPublishState {
+  sensor::Sensor *sensor{nullptr};
+  PublishPolicy policy;
+  float last_value{0.0f};
+  uint32_t last_publish_ms{0};
+  bool published{false};
+};
+
 class VevorHeater : public PollingComponent {
  public:
+  VevorHeater() { heaters_.push_back(this); }
+
   void set_uart_bus(uart::UARTComponent *uart) { uart_ = uart; }
+  void set_name_prefix(const std::string &name_prefix) { name_prefix_ = name_prefix; }
 
   // Setters for Long Frame Sensors
   void set_voltage_sensor(sensor::Sensor *sensor) { voltage_sensor_ = sensor; }
   void set_temperature_sensor(sensor::Sensor *sensor) { temperature_sensor_ = sensor; }
-  void set_state_sensor(sensor::Sensor *sensor) { state_sensor_ = sensor; }
   void set_state_text_sensor(text_sensor::TextSensor *sensor) { state_text_sensor_ = sensor; }
-  void set_power_level_sensor(sensor::Sensor *sensor) { power_level_sensor_ = sensor; }
-  void set_fan_speed_sensor(sensor::Sensor *sensor) { fan_speed_sensor_ = sensor; }
-  void set_pump_frequency_sensor(sensor::Sensor *sensor) { pump_frequency_sensor_ = sensor; }
-  void set_input_voltage_sensor(sensor::Sensor *sensor) { input_voltage_sensor_ = sensor; }
-  void set_glow_plug_current_sensor(sensor::Sensor *sensor) { glow_plug_current_sensor_ = sensor; }
-  void set_cooling_down_sensor(sensor::Sensor *sensor) { cooling_down_sensor_ = sensor; }
-  void set_fan_voltage_sensor(sensor::Sensor *sensor) { fan_voltage_sensor_ = sensor; }
-  void set_heat_exchanger_temp_sensor(sensor::Sensor *sensor) { heat_exchanger_temp_sensor_ = sensor; }
-  void set_state_duration_sensor(sensor::Sensor *sensor) { state_duration_sensor_ = sensor; }
-  void set_glow_plug_voltage_sensor(sensor::Sensor *sensor) { glow_plug_voltage_sensor_ = sensor; }
-  void set_glow_plug_current_2_sensor(sensor::Sensor *sensor) { glow_plug_current_2_sensor_ = sensor; }
-  void set_glow_plug_temperature_sensor(sensor::Sensor *sensor) { glow_plug_temperature_sensor_ = sensor; }
+  // field points into the table generated from long_frame_fields.py
+  void add_field_sensor(const LongFrameField *field, sensor::Sensor *sensor) { field_sensors_.push_back({field, sensor}); }
 
   // Setters for Short Frame Sensors
   void set_short_power_level_sensor(sensor::Sensor *sensor) { short_power_level_sensor_ = sensor; }
   void set_short_state_sensor(sensor::Sensor *sensor) { short_state_sensor_ = sensor; }
   void set_short_state_text_sensor(text_sensor::TextSensor *sensor) { short_frame_state_text_sensor_ = sensor; }
 
+  // Setters for Bus Error Counters
+  void set_bad_frames_sensor(sensor::Sensor *sensor) { bad_frames_sensor_ = sensor; }
+  void set_resyncs_sensor(sensor::Sensor *sensor) { resyncs_sensor_ = sensor; }
+  void set_dropped_bytes_sensor(sensor::Sensor *sensor) { dropped_bytes_sensor_ = sensor; }
+
+  // Diagnostics, written at most once per interval for each frame type
+  void set_log_mode(LogMode mode) { log_mode_ = mode; }
+  void set_log_interval(uint32_t interval_ms) { log_interval_ms_ = interval_ms; }
+
+  // Reception
+  void set_receive_mode(ReceiveMode mode) { receive_mode_ = mode; }
+  void set_frame_latency_sensor(sensor::Sensor *sensor) { frame_latency_sensor_ = sensor; }
+  const LatencyHistogram &get_latency_histogram() const { return latency_; }
+
+  // Transmission, slotted into the idle gaps of the bus
+  void set_transmit_interval(uint32_t interval_ms) { scheduler_.set_interval_us(interval_ms * 1000); }
+  void set_collisions_sensor(sensor::Sensor *sensor) { collisions_sensor_ = sensor; }
+  void set_echoes_sensor(sensor::Sensor *sensor) { echoes_sensor_ = sensor; }
+  void set_retries_sensor(sensor::Sensor *sensor) { retries_sensor_ = sensor; }
+  void set_round_trip_time_sensor(sensor::Sensor *sensor) { round_trip_time_sensor_ = sensor; }
+  const TransmitStats &get_transmit_stats() const { return scheduler_.stats(); }
+
+  // Telemetry ring buffer of decoded long frames
+  void set_telemetry(size_t capacity, uint8_t flash_batches) {
+    telemetry_capacity_ = capacity;
+    telemetry_flash_batches_ = flash_batches;
+  }
+  const TelemetryBuffer &get_telemetry() const { return telemetry_; }
+  // Header and records, oldest first, in the format read by software/telemetry_dump.py
+  void write_telemetry_dump(std::vector<uint8_t> &out) const;
+
+  // Raw frame capture, downloaded in batches
+  void set_capture(size_t capacity) { capture_capacity_ = capacity; }
+  const CaptureBuffer &get_capture() const { return capture_; }
+
+#ifdef USE_VEVORHEATER_WEB
+  // Downloads served from the web server, an empty path disables one
+  void set_web_server_base(web_server_base::WebServerBase *base) { web_base_ = base; }
+  void set_telemetry_path(const std::string &path) { telemetry_path_ = path; }
+  void set_capture_path(const std::string &path) { capture_path_ = path; }
+#endif
+
+  // Publish policies, one per configured sensor
+  void set_sensor_publish_policy(sensor::Sensor *sensor, bool only_on_change, float deadband,
+                                 float relative_deadband, uint32_t heartbeat_ms);
+  void set_text_only_on_change(bool only_on_change) { text_only_on_change_ = only_on_change; }
+  uint32_t get_published_count() const { return published_count_; }
+  uint32_t get_suppressed_count() const { return suppressed_count_; }
+
   // Public methods to control heater externally
   void set_heater_on(void);
   void set_heater_off(void);
   void set_heater_level(float level);
 
   void setup() override;
+  void loop() override;
   void update() override;
   void dump_config() override;
   float get_setup_priority() const override;
 
  protected:
   uart::UARTComponent *uart_{nullptr};
-  std::vector<uint8_t> frame_buffer_;
-  uint32_t last_received_time_ = 0;
-  void process_frame(const std::vector<uint8_t> &frame);
+  std::string name_prefix_;
+  FrameDecoder decoder_;
+  void process_frame(const uint8_t *frame, size_t size);
+
+  // Every heater on this node, in construction order. Their transmit slots
+  // are spread evenly over the transmit interval.
+  static std::vector<VevorHeater *> heaters_;
+
+  // Frame diagnostics, index 0 for short and 1 for long frames
+  LogMode log_mode_{LOG_MODE_SUMMARY};
+  uint32_t log_interval_ms_{0};
+  uint32_t last_log_ms_[2]{};
+  bool logged_once_[2]{};
+  bool log_due_(bool long_frame);
+
+  // Reception and the controller transmit scheduler
+  ReceiveMode receive_mode_{RECEIVE_POLLING};
+  uint32_t rx_empty_us_{0};
+  uint32_t rx_bytes_since_empty_{0};
+  LatencyHistogram latency_;
+  uint32_t period_max_latency_us_{0};
+  sensor::Sensor *frame_latency_sensor_{nullptr};
+  TransmitScheduler scheduler_;
+  ControllerFrame last_sent_{};
+  bool sent_any_{false};
+  void receive_();
+  BusFrameKind classify_frame_(const uint8_t *frame, size_t size) const;
+  void transmit_();
+  void publish_diagnostics_();
+  void log_latency_histogram_();
+  void log_transmit_stats_();
+
+  // Transmit counters and round trip time, published only when changed
+  uint32_t published_collisions_{UINT32_MAX};
+  uint32_t published_echoes_{UINT32_MAX};
+  uint32_t published_retries_{UINT32_MAX};
+  uint32_t published_replies_{0};
+  uint64_t published_rtt_sum_us_{0};
+  sensor::Sensor *collisions_sensor_{nullptr};
+  sensor::Sensor *echoes_sensor_{nullptr};
+  sensor::Sensor *retries_sensor_{nullptr};
+  sensor::Sensor *round_trip_time_sensor_{nullptr};
+  void publish_transmit_counters_();
 
   // Internal State Variables
   VevorHeaterState state_ = VevorHeaterState::OFF;
   bool heater_requested_on_ = false;
   uint8_t heater_level_percentage_ = 0;
-  uint32_t last_send_time = 0;
+  ControllerFrames controller_frames_;
 
   // Sensor pointers for Long Frame
   sensor::Sensor *voltage_sensor_{nullptr};
   sensor::Sensor *temperature_sensor_{nullptr};
-  sensor::Sensor *state_sensor_{nullptr};
   text_sensor::TextSensor *state_text_sensor_{nullptr};
-  sensor::Sensor *power_level_sensor_{nullptr};
-  sensor::Sensor *fan_speed_sensor_{nullptr};
-  sensor::Sensor *pump_frequency_sensor_{nullptr};
-  sensor::Sensor *input_voltage_sensor_{nullptr};
-  sensor::Sensor *glow_plug_current_sensor_{nullptr};
-  sensor::Sensor *cooling_down_sensor_{nullptr};
-  sensor::Sensor *fan_voltage_sensor_{nullptr};
-  sensor::Sensor *heat_exchanger_temp_sensor_{nullptr};
-  sensor::Sensor *state_duration_sensor_{nullptr};
-  sensor::Sensor *glow_plug_voltage_sensor_{nullptr};
-  sensor::Sensor *glow_plug_current_2_sensor_{nullptr};
-  sensor::Sensor *glow_plug_temperature_sensor_{nullptr};
+  std::vector<FieldSensor> field_sensors_;
 
   // Sensor pointers for Short Frame
   sensor::Sensor *short_power_level_sensor_{nullptr};
   sensor::Sensor *short_state_sensor_{nullptr};
   text_sensor::TextSensor *short_frame_state_text_sensor_{nullptr};
 
+  // Bus error counters: frames rejected by process_frame (the decoder's
+  // checksum errors are added on publish), published only when changed
+  uint32_t bad_frames_{0};
+  uint32_t published_bad_frames_{UINT32_MAX};
+  uint32_t published_resyncs_{UINT32_MAX};
+  uint32_t published_dropped_bytes_{UINT32_MAX};
+  sensor::Sensor *bad_frames_sensor_{nullptr};
+  sensor::Sensor *resyncs_sensor_{nullptr};
+  sensor::Sensor *dropped_bytes_sensor_{nullptr};
+  void publish_error_counters_();
+
+  // Telemetry ring buffer, optionally mirrored to flash in batches
+  TelemetryBuffer telemetry_;
+  size_t telemetry_capacity_{0};
+  uint8_t telemetry_flash_batches_{0};
+  uint32_t telemetry_sequence_{0};
+  std::vector<ESPPreferenceObject> telemetry_prefs_;
+  void setup_telemetry_();
+  void record_telemetry_(const TelemetrySample &sample);
+
+  // Raw frames captured for download
+  CaptureBuffer capture_;
+  size_t capture_capacity_{0};
+  // add() in the main loop against take() in the web server's task
+  Mutex capture_lock_;
+
+#ifdef USE_VEVORHEATER_WEB
+  web_server_base::WebServerBase *web_base_{nullptr};
+  std::string telemetry_path_;
+  std::string capture_path_;
+  SnapshotWebHandler *telemetry_handler_{nullptr};
+  void setup_web_();
+  void serve_web_();
+#endif
+
+  // Central publishing applying the per-sensor publish policy
+  std::vector<SensorPublishState> publish_states_;
+  bool text_only_on_change_{false};
+  uint32_t published_count_{0};
+  uint32_t suppressed_count_{0};
+  void publish_(sensor::Sensor *sensor, float value);
+  void publish_text_(text_sensor::TextSensor *sensor, const char *value);
+
   // Utility functions
-  uint16_t read_uint16(const std::vector<uint8_t> &frame, size_t index);
-  uint8_t read_uint8(const std::vector<uint8_t> &frame, size_t index);
+  uint16_t read_uint16(const uint8_t *frame, size_t size, size_t index);
+  uint8_t read_uint8(const uint8_t *frame, size_t size, size_t index);
 };
 
 }  // namespace vevorheater
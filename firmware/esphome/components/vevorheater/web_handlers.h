@@ -0,0 +1,137 @@
+// web_handlers.h
+
+#pragma once
+
+#include "esphome/core/defines.h"
+
+#ifdef USE_VEVORHEATER_WEB
+
+#include "esphome/components/web_server_base/web_server_base.h"
+#include "esphome/core/hal.h"
+#include "esphome/core/helpers.h"
+
+#include <algorithm>
+#include <atomic>
+#include <cstring>
+#include <functional>
+#include <memory>
+#include <string>
+#include <vector>
+
+namespace esphome {
+namespace vevorheater {
+
+// The handlers run in the web server's task, concurrently with the main loop.
+// They never read the component's buffers: the main loop hands the bytes over
+// and the handler only swaps vectors under a lock.
+
+// Sends data as a binary download. Every response owns its bytes, so two
+// downloads in flight at once never share storage.
+inline void send_binary(AsyncWebServerRequest *request, std::vector<uint8_t> &&data) {
+#ifdef USE_ARDUINO
+  // ESPAsyncWebServer sends after handleRequest returns, in pieces as the
+  // client acknowledges them: the filler keeps the bytes alive until the
+  // response is done with them
+  auto bytes = std::make_shared<std::vector<uint8_t>>(std::move(data));
+  request->send(request->beginResponse("application/octet-stream", bytes->size(),
+                                       [bytes](uint8_t *buffer, size_t max_len, size_t index) -> size_t {
+                                         size_t len = std::min(max_len, bytes->size() - index);
+                                         std::memcpy(buffer, bytes->data() + index, len);
+                                         return len;
+                                       }));
+#else
+  // web_server_idf sends the whole response before send() returns
+  request->send(request->beginResponse_P(200, "application/octet-stream", data.data(), data.size()));
+#endif
+}
+
+// Serves a binary download on every GET of one path. The callback runs in the
+// web server's task with an empty vector; it must only swap it with data kept
+// ready under a lock (see CaptureBuffer::take).
+class BinaryWebHandler : public AsyncWebHandler {
+ public:
+  using FillCallback = std::function<void(std::vector<uint8_t> &)>;
+
+  BinaryWebHandler(const std::string &path, FillCallback fill) : path_(path), fill_(std::move(fill)) {}
+
+  bool canHandle(AsyncWebServerRequest *request) const override {
+    return request->method() == HTTP_GET && request->url() == this->path_.c_str();
+  }
+
+  void handleRequest(AsyncWebServerRequest *request) override {
+    std::vector<uint8_t> data;
+    this->fill_(data);
+    send_binary(request, std::move(data));
+  }
+
+ protected:
+  std::string path_;
+  FillCallback fill_;
+};
+
+// Serves a snapshot the main loop builds on request. A GET without a fresh
+// snapshot flags the request and is answered 503 with Retry-After; the main
+// loop sees requested(), builds the snapshot with publish() and the retried
+// GET gets it. A snapshot is served once, and not at all once older than
+// SNAPSHOT_MAX_AGE_MS.
+class SnapshotWebHandler : public AsyncWebHandler {
+ public:
+  using FillCallback = std::function<void(std::vector<uint8_t> &)>;
+
+  static const uint32_t SNAPSHOT_MAX_AGE_MS = 5000;
+
+  explicit SnapshotWebHandler(const std::string &path) : path_(path) {}
+
+  bool canHandle(AsyncWebServerRequest *request) const override {
+    return request->method() == HTTP_GET && request->url() == this->path_.c_str();
+  }
+
+  void handleRequest(AsyncWebServerRequest *request) override {
+    std::vector<uint8_t> data;
+    bool ready;
+    {
+      LockGuard guard(this->lock_);
+      ready = this->ready_ && millis() - this->published_ms_ < SNAPSHOT_MAX_AGE_MS;
+      if (ready) {
+        // The response takes the snapshot, publish() builds the next one in fresh storage
+        data.swap(this->snapshot_);
+      } else {
+        this->requested_ = true;
+      }
+      this->ready_ = false;
+    }
+    if (!ready) {
+      AsyncWebServerResponse *response = request->beginResponse(503, "text/plain", "Snapshot pending, retry");
+      response->addHeader("Retry-After", "1");
+      request->send(response);
+      return;
+    }
+    send_binary(request, std::move(data));
+  }
+
+  // Main loop: a download waits for a snapshot
+  bool requested() const { return this->requested_; }
+
+  // Main loop: build the snapshot for the waiting download
+  void publish(const FillCallback &fill) {
+    LockGuard guard(this->lock_);
+    fill(this->snapshot_);
+    this->published_ms_ = millis();
+    this->ready_ = true;
+    this->requested_ = false;
+  }
+
+ protected:
+  std::string path_;
+  Mutex lock_;
+  std::atomic<bool> requested_{false};
+  // Guarded by lock_
+  bool ready_{false};
+  uint32_t published_ms_{0};
+  std::vector<uint8_t> snapshot_;
+};
+
+}  // namespace vevorheater
+}  // namespace esphome
+
+#endif  // USE_VEVORHEATER_WEB
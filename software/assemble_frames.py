@@ -1,11 +1,26 @@
 """
-OBSOLETE: This script is no longer used in the project. 
-It was used to merge frames based on a time difference of less than 10ms and split them into two categories based on the length field (byte[3]).
+Merge logic-analyzer bytes into frames based on a time difference of less than 10ms
+and split them into two categories based on the length field (byte[3]).
 
+Input files are Saleae CSV exports, by default those in input_csv_files/,
+processed in parallel.
+
+Usage:
+    python software/assemble_frames.py
+    python software/assemble_frames.py export1.csv export2.csv -d frames/
 """
 
+import argparse
+import os
 import pandas as pd
+import numpy as np
 import glob
+from concurrent.futures import ProcessPoolExecutor
+
+from vevor_protocol import LENGTH_OFFSET, LONG_LENGTH, SHORT_FRAME_LEN, SHORT_LENGTH, frame_length
+
+# Bytes closer together than this belong to the same frame
+FRAME_GAP_S = 0.01
 
 def merge_frames_by_time(data):
     """
@@ -15,75 +30,83 @@ def merge_frames_by_time(data):
     Returns:
         pd.DataFrame: DataFrame with merged frames.
     """
+    if data.empty:
+        return pd.DataFrame(columns=['Start Time (s)', 'Data'])
+
     # Sort data by Start Time for proper grouping
     data = data.sort_values(by="Start Time (s)").reset_index(drop=True)
 
-    # Initialize variables
-    merged_frames = []
-    current_group = []
-    current_start_time = data.loc[0, 'Start Time (s)']
-    last_byte_time = current_start_time
-
-    # Iterate through the sorted data to group frames
-    for _, row in data.iterrows():
-        if current_group and (row['Start Time (s)'] - last_byte_time) < 0.01:
-            # Add the current row to the group
-            current_group.append(row)
-            last_byte_time = row['Start Time (s)']
-        else:
-            if current_group:
-                # Finalize the current group
-                merged_data = ''.join([item['Data'] for item in current_group])
-                merged_frames.append({'Start Time (s)': current_start_time, 'Data': merged_data})
-            # Reset the group
-            current_group = [row]
-            current_start_time = row['Start Time (s)']
-            last_byte_time = row['Start Time (s)']
-
-    # Add the last group
-    if current_group:
-        merged_data = ''.join([item['Data'] for item in current_group])
-        merged_frames.append({'Start Time (s)': current_start_time, 'Data': merged_data})
-
-    # Convert the merged frames into a DataFrame
-    return pd.DataFrame(merged_frames)
-
-# Example usage
-# Process multiple input files
-input_files = glob.glob('input_csv_files/*.csv')
-all_frames_length_0x0B = []
-all_frames_other = []
-
-for file in input_files:
+    # A new frame starts wherever the gap to the previous byte reaches 10ms
+    times = data['Start Time (s)'].to_numpy()
+    frame_start = np.empty(len(times), dtype=bool)
+    frame_start[0] = True
+    frame_start[1:] = np.diff(times) >= FRAME_GAP_S
+    frame_id = np.cumsum(frame_start)
+
+    # Join the bytes of every frame in one grouped pass
+    merged = data.groupby(frame_id, sort=False).agg({'Start Time (s)': 'first', 'Data': ''.join})
+    return merged.reset_index(drop=True)
+
+def split_frames_by_length(merged_frames_df):
+    """
+    Splits merged frames on the length field (byte[3]) and spaces out their bytes.
+    Args:
+        merged_frames_df (pd.DataFrame): DataFrame returned by merge_frames_by_time.
+    Returns:
+        tuple: (frames with length 0x0B, all other frames) as DataFrames.
+    """
+    data = merged_frames_df['Data']
+    spaced = merged_frames_df.assign(Data=data.str.replace(r'(..)(?!$)', r'\1 ', regex=True))
+    # Data holds two hex digits per byte; unknown length fields map to NaN
+    length_field = data.str[2 * LENGTH_OFFSET:2 * LENGTH_OFFSET + 2]
+    sizes = length_field.map({f'{field:02X}': frame_length(field) for field in (SHORT_LENGTH, LONG_LENGTH)})
+    # Fragments ending at the length field are not frames
+    is_0x0B = (data.str.len() > 2 * (LENGTH_OFFSET + 1)) & (sizes == SHORT_FRAME_LEN)
+    return spaced[is_0x0B].reset_index(drop=True), spaced[~is_0x0B].reset_index(drop=True)
+
+def process_file(file):
+    """
+    Reads one CSV export and returns its frames split by length field.
+    """
     print(f"Processing file: {file}")
     data = pd.read_csv(file, delimiter=';')
     data['Start Time (s)'] = data['Start Time (s)'].str.replace(',', '.').astype(float)
 
-    # Call the function to merge frames
     merged_frames_df = merge_frames_by_time(data)
+    return split_frames_by_length(merged_frames_df)
 
-    # Split frames into two categories based on the length field (byte[3])
-    frames_length_0x0B = []
-    frames_other = []
-
-    for _, row in merged_frames_df.iterrows():
-        data_bytes = ' '.join([row['Data'][i:i+2] for i in range(0, len(row['Data']), 2)])
-        if len(data_bytes.split()) > 4 and data_bytes.split()[3] == '0B':
-            frames_length_0x0B.append({'Start Time (s)': row['Start Time (s)'], 'Data': data_bytes})
-        else:
-            frames_other.append({'Start Time (s)': row['Start Time (s)'], 'Data': data_bytes})
-
-    # Append results to global lists
-    all_frames_length_0x0B.extend(frames_length_0x0B)
-    all_frames_other.extend(frames_other)
-
-# Convert lists to DataFrames
-frames_length_0x0B_df = pd.DataFrame(all_frames_length_0x0B)
-frames_other_df = pd.DataFrame(all_frames_other)
-
-# Save the results to separate files
-frames_length_0x0B_df.to_csv('frames_length_0x0B.csv', index=False)
-frames_other_df.to_csv('frames_other.csv', index=False)
-
-print("Frames with length 0x0B saved to frames_length_0x0B.csv")
-print("Other frames saved to frames_other.csv")
+def assemble(input_files, output_dir="."):
+    """
+    Assembles the frames of all input files and writes them to
+    frames_length_0x0B.csv and frames_other.csv in output_dir.
+    """
+    with ProcessPoolExecutor() as pool:
+        results = list(pool.map(process_file, input_files))
+
+    columns = ['Start Time (s)', 'Data']
+    frames_length_0x0B_df = pd.concat([r[0] for r in results] or [pd.DataFrame(columns=columns)], ignore_index=True)
+    frames_other_df = pd.concat([r[1] for r in results] or [pd.DataFrame(columns=columns)], ignore_index=True)
+
+    # Save the results to separate files
+    short_path = os.path.join(output_dir, 'frames_length_0x0B.csv')
+    other_path = os.path.join(output_dir, 'frames_other.csv')
+    frames_length_0x0B_df.to_csv(short_path, index=False)
+    frames_other_df.to_csv(other_path, index=False)
+
+    print(f"Frames with length 0x0B saved to {short_path}")
+    print(f"Other frames saved to {other_path}")
+
+def add_arguments(parser):
+    parser.add_argument("inputs", nargs="*",
+                        help="Saleae CSV exports (default: input_csv_files/*.csv)")
+    parser.add_argument("-d", "--output-dir", default=".",
+                        help="directory for frames_length_0x0B.csv and frames_other.csv (default: .)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Assemble logic-analyzer bytes into frames.")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    assemble(args.inputs or sorted(glob.glob('input_csv_files/*.csv')), args.output_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Analyse every capture in a directory tree with a process pool.
+
+Each capture is decoded once by a worker, which computes its per-offset
+statistics (the single bytes and 16-bit pairs plot_frame.py prints, here of
+the long frames) and its heater runs, and writes the run index run_index.py
+reads. Per-file results are cached in --cache: a file whose size and mtime
+are unchanged is not opened again, and one whose content hash matches an
+earlier result (copied, touched or renamed) is only hashed. Re-running after
+new uploads therefore decodes only the new files.
+
+The statistics of all files are merged with RunningStats.merge, which is
+associative, so cached and fresh results combine in any order.
+
+Usage:
+    python software/batch_analyze.py captures/
+    python software/batch_analyze.py captures/ -j 8 --csv offsets.csv
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from capture_file import CAPTURE_SUFFIX, FRAME_STREAM_SUFFIX
+from plot_frame import RunningStats, compute_stats, pairs_16_matrix
+from run_index import RUN_DTYPE, failed_ignitions, iter_timed_chunks, summarize_runs, write_index
+from vevor_protocol import LONG_FRAME_LEN, DecoderStats
+from vevor_protocol.bulk import checksums_ok
+from vevor_protocol.fields import FIELDS_BY_OFFSET, field_label
+
+################################################################################
+# Constants
+################################################################################
+
+CAPTURE_SUFFIXES = (".txt", ".txt.gz", CAPTURE_SUFFIX, FRAME_STREAM_SUFFIX)
+DEFAULT_CACHE = ".vevor_cache"
+MANIFEST = "manifest.json"
+# Bump when cached results change meaning
+CACHE_VERSION = 1
+HASH_BLOCK = 1 << 20
+
+################################################################################
+# Data Structures
+################################################################################
+
+@dataclass
+class FileResult:
+    """
+    Everything the batch keeps of one capture.
+    """
+    digest: str
+    bytes_stats: RunningStats
+    pairs_stats: RunningStats
+    errors: DecoderStats
+    runs: np.ndarray  # RUN_DTYPE
+
+def _stats_arrays(prefix: str, stats: RunningStats) -> Dict[str, np.ndarray]:
+    return {f"{prefix}_count": np.array(stats.count), f"{prefix}_mean": stats.mean, f"{prefix}_m2": stats.m2,
+            f"{prefix}_min": stats.min, f"{prefix}_max": stats.max}
+
+def _stats_from_arrays(prefix: str, arrays) -> RunningStats:
+    stats = RunningStats(len(arrays[f"{prefix}_mean"]))
+    stats.count = int(arrays[f"{prefix}_count"])
+    stats.mean = arrays[f"{prefix}_mean"]
+    stats.m2 = arrays[f"{prefix}_m2"]
+    stats.min = arrays[f"{prefix}_min"].copy()
+    stats.max = arrays[f"{prefix}_max"].copy()
+    return stats
+
+def save_result(path: str, result: FileResult) -> None:
+    errors = result.errors
+    np.savez(path, runs=result.runs,
+             errors=np.array([errors.frames, errors.checksum_errors, errors.resyncs, errors.dropped_bytes]),
+             **_stats_arrays("bytes", result.bytes_stats), **_stats_arrays("pairs", result.pairs_stats))
+
+def load_result(path: str, digest: str) -> FileResult:
+    with np.load(path) as arrays:
+        frames, checksum_errors, resyncs, dropped_bytes = (int(v) for v in arrays["errors"])
+        errors = DecoderStats(frames=frames, checksum_errors=checksum_errors, resyncs=resyncs,
+                              dropped_bytes=dropped_bytes)
+        return FileResult(digest, _stats_from_arrays("bytes", arrays), _stats_from_arrays("pairs", arrays),
+                          errors, arrays["runs"].astype(RUN_DTYPE))
+
+################################################################################
+# Workers
+################################################################################
+
+def file_digest(path: str) -> str:
+    """
+    BLAKE2b hash of a file's content, read in blocks.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while block := f.read(HASH_BLOCK):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _observed(chunks: Iterator[Tuple[np.ndarray, np.ndarray]], bytes_stats: RunningStats,
+              pairs_stats: RunningStats, errors: DecoderStats) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    # Passes chunks on to summarize_runs, folding them into the statistics on the way
+    for timestamps, response in chunks:
+        ok = checksums_ok(response)
+        errors.frames += len(ok)
+        errors.checksum_errors += int(len(ok) - ok.sum())
+        # Like plot_frame.py, leave out cycles with an all-zero response
+        analysed = response[ok & response.any(axis=1)]
+        bytes_stats.update(analysed)
+        pairs_stats.update(pairs_16_matrix(analysed))
+        yield timestamps, response
+
+def analyse_file(path: str, cache_dir: str, period: float, write_run_index: bool) -> FileResult:
+    """
+    Hash a capture and take its result from the cache, or decode it and
+    cache the result. Runs in a worker process.
+    """
+    digest = file_digest(path)
+    entry = os.path.join(cache_dir, digest + ".npz")
+    if os.path.exists(entry):
+        result = load_result(entry, digest)
+    else:
+        bytes_stats = RunningStats(LONG_FRAME_LEN)
+        pairs_stats = RunningStats(LONG_FRAME_LEN - 1)
+        errors = DecoderStats()
+        runs = summarize_runs(_observed(iter_timed_chunks(path, period, errors), bytes_stats, pairs_stats, errors))
+        result = FileResult(digest, bytes_stats, pairs_stats, errors, runs)
+        # Written under a temporary name so other workers never see a partial entry
+        partial = entry + f".{os.getpid()}.tmp.npz"
+        save_result(partial, result)
+        os.replace(partial, entry)
+    if write_run_index:
+        write_index(path, result.runs)
+    return result
+
+################################################################################
+# Batch
+################################################################################
+
+def find_captures(root: str, cache_dir: str) -> List[str]:
+    """
+    All captures below root, sorted, skipping the cache directory.
+    """
+    found = []
+    cache_dir = os.path.abspath(cache_dir)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) != cache_dir)
+        found.extend(os.path.join(dirpath, name) for name in filenames if name.endswith(CAPTURE_SUFFIXES))
+    return sorted(found)
+
+def load_manifest(cache_dir: str) -> Dict[str, dict]:
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get("version") != CACHE_VERSION:
+        return {}
+    return manifest.get("files", {})
+
+def save_manifest(cache_dir: str, files: Dict[str, dict]) -> None:
+    path = os.path.join(cache_dir, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"version": CACHE_VERSION, "files": files}, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def run_batch(paths: List[str], cache_dir: str, jobs: Optional[int] = None, period: float = 1.0,
+              write_run_index: bool = True) -> Tuple[Dict[str, FileResult], int]:
+    """
+    Results of all captures, decoding only those not in the cache.
+    Returns the results by path and the number of files decoded or hashed.
+    Files that cannot be read are reported and left out.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = load_manifest(cache_dir)
+    results: Dict[str, FileResult] = {}
+    pending = []
+    for path in paths:
+        st = os.stat(path)
+        known = manifest.get(os.path.abspath(path))
+        entry = known and os.path.join(cache_dir, known["digest"] + ".npz")
+        if known and (known["size"], known["mtime_ns"]) == (st.st_size, st.st_mtime_ns) and os.path.exists(entry):
+            results[path] = load_result(entry, known["digest"])
+        else:
+            pending.append(path)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(analyse_file, path, cache_dir, period, write_run_index): path
+                       for path in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except (OSError, ValueError) as e:
+                    print(f"Skipping {path}: {e}", file=sys.stderr)
+                    continue
+                print(f"[{done}/{len(pending)}] {path}", file=sys.stderr)
+                st = os.stat(path)
+                manifest[os.path.abspath(path)] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                                   "digest": results[path].digest}
+        save_manifest(cache_dir, manifest)
+    return results, len(pending)
+
+def merge_results(results: List[FileResult]) -> FileResult:
+    """
+    Combine the results of several captures into one.
+    """
+    merged = FileResult("", RunningStats(LONG_FRAME_LEN), RunningStats(LONG_FRAME_LEN - 1), DecoderStats(),
+                        np.concatenate([r.runs for r in results]) if results else np.empty(0, dtype=RUN_DTYPE))
+    for result in results:
+        merged.bytes_stats.merge(result.bytes_stats)
+        merged.pairs_stats.merge(result.pairs_stats)
+        for name in ("frames", "checksum_errors", "resyncs", "dropped_bytes"):
+            setattr(merged.errors, name, getattr(merged.errors, name) + getattr(result.errors, name))
+    return merged
+
+################################################################################
+# Main Script
+################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse all captures in a directory tree in parallel.")
+    parser.add_argument("directory", help="directory searched recursively for captures")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--cache", help=f"cache directory (default: DIRECTORY/{DEFAULT_CACHE})")
+    parser.add_argument("--period", type=float, default=1.0,
+                        help="seconds between cycles of text captures (default 1.0)")
+    parser.add_argument("--no-run-index", action="store_true",
+                        help="do not write the .runs index next to each capture")
+    parser.add_argument("--csv", help="write the merged per-offset statistics to this CSV file")
+    args = parser.parse_args(argv)
+
+    cache_dir = args.cache or os.path.join(args.directory, DEFAULT_CACHE)
+    paths = find_captures(args.directory, cache_dir)
+    if not paths:
+        print(f"No captures found in {args.directory}")
+        return
+
+    start = time.perf_counter()
+    results, processed = run_batch(paths, cache_dir, args.jobs, args.period, not args.no_run_index)
+    merged = merge_results([results[path] for path in paths if path in results])
+    elapsed = time.perf_counter() - start
+
+    errors = merged.errors
+    print(f"{len(results)} captures, {processed} processed, {len(results) - processed} from cache "
+          f"in {elapsed:.1f} s")
+    print(f"{merged.bytes_stats.count} cycles analysed, {errors.frames} long frames, "
+          f"bad_frames={errors.checksum_errors}, resyncs={errors.resyncs}, dropped_bytes={errors.dropped_bytes}")
+    print(f"{len(merged.runs)} runs, {int(failed_ignitions(merged.runs).sum())} failed ignitions")
+
+    rows = []
+    for kind, stats in (("byte", compute_stats(merged.bytes_stats)), ("pair", compute_stats(merged.pairs_stats))):
+        width = 1 if kind == "byte" else 2
+        for offset, st in enumerate(stats):
+            field = FIELDS_BY_OFFSET.get(offset)
+            label = field_label(offset) if field is not None and field.width == width else ""
+            rows.append((kind, offset, label, st.count, st.min, st.max, st.mean, st.stdev))
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("kind", "offset", "field", "count", "min", "max", "mean", "stdev"))
+            writer.writerows(rows)
+
+    print("\n======== Long Frame Offsets Stats ========")
+    for kind, offset, label, count, mn, mx, mean, stdev in rows:
+        if count and mn != mx:
+            name = f"Offset {offset}" if kind == "byte" else f"Offset {offset}-{offset + 1}"
+            print(f"{name}: range=({mn},{mx}), mean={mean:.1f}, stdev={stdev:.1f}"
+                  + (f"  {label}" if label else ""))
+
+if __name__ == "__main__":
+    main()
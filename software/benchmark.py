@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Benchmark the analysis tools on synthetic captures of growing length.
+
+For every size, synth_capture.py writes a hex text log, a binary capture and
+(up to ASSEMBLY_MAX_CYCLES) a Saleae CSV export, with noise and corrupted
+frames. Each stage then runs in a fresh process, so its peak RSS (which
+includes the pages of memory-mapped captures) is its own:
+
+    hex_parse       plot_frame.iter_frame_chunks over the text log
+    frame_assembly  assemble_frames.process_file over the CSV export
+    offset_stats    per-offset RunningStats as plot_frame.py keeps them
+    plot_prep       plot_frame.build_panels and the min/max pyramids and
+                    envelopes plot_decimated draws from
+    startup         vevor_analyze.py stats over the text log in a fresh
+                    interpreter, imports included; fails if it imported
+                    Matplotlib or pandas. Its peak RSS is that of the
+                    benchmark process, not of the interpreter it starts
+
+Results are written as JSON with the commit, Python and NumPy versions.
+--compare reads an earlier result file and fails on stages that got more
+than REGRESSION_FACTOR slower or hungrier, so regressions show up between
+commits.
+
+Usage:
+    python software/benchmark.py -o bench.json
+    python software/benchmark.py --sizes 1e3 1e5 1e7 --stages hex_parse offset_stats
+    python software/benchmark.py --sizes 1e3 --stages startup --repeat 5
+    python software/benchmark.py -o new.json --compare bench.json
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from capture_file import CaptureFile
+from plot_decimated import REPORT_COLUMNS
+from plot_frame import RunningStats, build_panels, drop_bad_checksums, iter_frame_chunks, open_capture, pairs_16_matrix
+from synth_capture import write_synthetic
+from vevor_protocol import SHORT_FRAME_LEN, DecoderStats
+
+################################################################################
+# Constants
+################################################################################
+
+DEFAULT_SIZES = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)
+# pandas keeps one row per bus byte, 72 per cycle
+ASSEMBLY_MAX_CYCLES = 10 ** 5
+RESULT_VERSION = 1
+# Slower or larger than this times the compared result is a regression
+REGRESSION_FACTOR = 1.2
+# Sizes below this are too quick to compare reliably
+COMPARE_MIN_SECONDS = 0.05
+ANALYZE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vevor_analyze.py")
+# Only the plot and assemble subcommands may import these
+HEAVY_MODULES = ("matplotlib", "pandas")
+
+################################################################################
+# Stages
+################################################################################
+
+def stage_hex_parse(files: Dict[str, str]) -> int:
+    errors = DecoderStats()
+    cycles = 0
+    with open_capture(files["txt"]) as f:
+        for chunk in iter_frame_chunks(f, errors=errors):
+            cycles += len(chunk.request)
+    return cycles
+
+def stage_frame_assembly(files: Dict[str, str]) -> int:
+    from assemble_frames import process_file
+
+    short_frames, _ = process_file(files["csv"])
+    return len(short_frames)
+
+def stage_offset_stats(files: Dict[str, str]) -> int:
+    single_bytes = RunningStats(SHORT_FRAME_LEN)
+    pairs_16 = RunningStats(SHORT_FRAME_LEN - 1)
+    errors = DecoderStats()
+    for chunk in CaptureFile(files["vcap"]).iter_chunks():
+        chunk = drop_bad_checksums(chunk, errors)
+        analysed = chunk.request[chunk.response.any(axis=1)]
+        single_bytes.update(analysed)
+        pairs_16.update(pairs_16_matrix(analysed))
+    return single_bytes.count
+
+def stage_plot_prep(files: Dict[str, str]) -> int:
+    errors = DecoderStats()
+    analysed = []
+    for chunk in CaptureFile(files["vcap"]).iter_chunks():
+        chunk = drop_bad_checksums(chunk, errors)
+        analysed.append(chunk.request[chunk.response.any(axis=1)])
+    single_bytes = np.concatenate(analysed)
+    for panel in build_panels(single_bytes):
+        for pyramid in panel.pyramids:
+            pyramid.envelope(0, len(pyramid), REPORT_COLUMNS)
+    return len(single_bytes)
+
+def stage_startup(files: Dict[str, str]) -> int:
+    run = subprocess.run([sys.executable, "-X", "importtime", ANALYZE_SCRIPT, "stats", files["txt"]],
+                         capture_output=True, text=True, check=True)
+    # -X importtime lines end in the module name, indented by nesting depth
+    imported = {line.rsplit("|", 1)[-1].strip().split(".")[0]
+                for line in run.stderr.splitlines() if line.startswith("import time:")}
+    heavy = sorted(imported.intersection(HEAVY_MODULES))
+    if heavy:
+        raise RuntimeError(f"vevor_analyze.py stats imported {', '.join(heavy)}")
+    return int(re.search(r"^Offset 0: count=(\d+)", run.stdout, re.MULTILINE).group(1))
+
+STAGES = {
+    "hex_parse": stage_hex_parse,
+    "frame_assembly": stage_frame_assembly,
+    "offset_stats": stage_offset_stats,
+    "plot_prep": stage_plot_prep,
+    "startup": stage_startup,
+}
+
+def _peak_rss_mb() -> float:
+    # Linux keeps ru_maxrss across fork and exec, so the stage process would
+    # report the peak of the process that generated the captures; VmHWM is
+    # the high-water mark of this process alone
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def _run_stage(stage: str, files: Dict[str, str]) -> dict:
+    # Entry point of the stage process
+    baseline = _peak_rss_mb()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        cycles = STAGES[stage](files)
+        seconds = time.perf_counter() - start
+    peak = _peak_rss_mb()
+    return {"seconds": seconds, "output_cycles": cycles, "peak_rss_mb": peak, "rss_growth_mb": peak - baseline}
+
+################################################################################
+# Suite
+################################################################################
+
+def run_suite(sizes: List[int], stages: List[str], workdir: str, seed: int = 0,
+              repeat: int = 1) -> List[dict]:
+    """
+    Generate the captures of every size and time every stage on them.
+    Returns one result dict per size and stage.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for cycles in sizes:
+        files = {"txt": os.path.join(workdir, f"synth_{cycles}.txt"),
+                 "vcap": os.path.join(workdir, f"synth_{cycles}.vcap"),
+                 "csv": os.path.join(workdir, f"synth_{cycles}.csv")}
+        needed = {"txt"} if {"hex_parse", "startup"} & set(stages) else set()
+        if {"offset_stats", "plot_prep"} & set(stages):
+            needed.add("vcap")
+        if "frame_assembly" in stages and cycles <= ASSEMBLY_MAX_CYCLES:
+            needed.add("csv")
+        start = time.perf_counter()
+        for kind in sorted(needed):
+            write_synthetic(files[kind], cycles, seed=seed)
+        print(f"{cycles} cycles generated in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+        for stage in stages:
+            result = {"stage": stage, "cycles": cycles}
+            if stage == "frame_assembly" and cycles > ASSEMBLY_MAX_CYCLES:
+                result["skipped"] = f"more than {ASSEMBLY_MAX_CYCLES} cycles"
+                results.append(result)
+                continue
+            runs = []
+            for _ in range(repeat):
+                with context.Pool(1) as pool:
+                    runs.append(pool.apply(_run_stage, (stage, files)))
+            best = min(runs, key=lambda run: run["seconds"])
+            result.update(best)
+            result["peak_rss_mb"] = max(run["peak_rss_mb"] for run in runs)
+            result["cycles_per_s"] = cycles / best["seconds"] if best["seconds"] > 0 else None
+            results.append(result)
+            print(format_result(result), file=sys.stderr)
+
+        for path in files.values():
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+    return results
+
+def format_result(result: dict) -> str:
+    head = f"{result['stage']:>15} {result['cycles']:>10}"
+    if "skipped" in result:
+        return f"{head}  skipped: {result['skipped']}"
+    rate = result["cycles_per_s"]
+    return (f"{head} {result['seconds']:10.3f} s {rate or 0:14.0f} cycles/s "
+            f"{result['peak_rss_mb']:9.1f} MB peak {result['rss_growth_mb']:+9.1f} MB")
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: List[dict], baseline: dict) -> List[str]:
+    """
+    Stages at least REGRESSION_FACTOR slower or larger than in baseline.
+    """
+    old = {(r["stage"], r["cycles"]): r for r in baseline.get("results", []) if "skipped" not in r}
+    regressions = []
+    for result in results:
+        before = old.get((result["stage"], result["cycles"]))
+        if before is None or "skipped" in result:
+            continue
+        name = f"{result['stage']} at {result['cycles']} cycles"
+        if result["seconds"] > COMPARE_MIN_SECONDS and result["seconds"] > REGRESSION_FACTOR * before["seconds"]:
+            regressions.append(f"{name}: {before['seconds']:.3f} s -> {result['seconds']:.3f} s")
+        if result["rss_growth_mb"] > max(REGRESSION_FACTOR * before["rss_growth_mb"], before["rss_growth_mb"] + 10):
+            regressions.append(f"{name}: {before['rss_growth_mb']:.1f} MB -> {result['rss_growth_mb']:.1f} MB")
+    return regressions
+
+################################################################################
+# Main Script
+################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis tools on synthetic captures.")
+    parser.add_argument("--sizes", nargs="+", type=lambda text: int(float(text)), default=list(DEFAULT_SIZES),
+                        help="capture lengths in cycles (default 1e3 1e4 1e5 1e6)")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=1, help="runs per stage, the fastest counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="directory for the generated captures (default: a temporary one)")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="earlier JSON results; exit with status 1 on regressions")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        results = run_suite(args.sizes, args.stages, workdir, args.seed, args.repeat)
+
+    report = {
+        "version": RESULT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+
+    print(f"{'stage':>15} {'cycles':>10} {'time':>12} {'throughput':>23} {'peak RSS':>17} {'growth':>12}")
+    for result in results:
+        print(format_result(result))
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f))
+        for line in regressions:
+            print(f"Regression: {line}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
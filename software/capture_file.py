@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Compact binary capture format with memory-mapped random access.
+
+A capture file (".vcap") holds one fixed-stride record per request/response
+cycle, so any time window can be sliced straight out of a numpy.memmap
+without parsing or copying:
+
+    header  HEADER_SIZE bytes, see HEADER_STRUCT
+    records record_count * RECORD_DTYPE.itemsize bytes
+              timestamp  float64 seconds
+              request    SHORT_FRAME_LEN bytes (controller -> main unit)
+              response   LONG_FRAME_LEN bytes (main unit -> controller)
+    index   float64 timestamp of every INDEX_STRIDE-th record
+
+Text captures carry no timestamps, so conversion assigns one controller
+period (1 s) per cycle unless told otherwise.
+
+Frame streams (".vfrm") are what the firmware's capture mode serves: batches
+of raw, timestamped frames, appended to each other by capture_pull.py. They
+are paired into cycles on reading and keep the device timestamps.
+
+Usage:
+    python software/capture_file.py capture.txt capture.vcap
+    python software/capture_file.py capture.txt capture.vcap --start-time 2026-10-01T18:00
+    python software/capture_file.py heater.vfrm heater.vcap
+"""
+
+import argparse
+import struct
+import numpy as np
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from vevor_protocol import SHORT_FRAME_LEN, LONG_FRAME_LEN
+from plot_frame import (
+    CHUNK_CYCLES,
+    FrameMatrices,
+    open_capture,
+    iter_frame_chunks,
+)
+
+################################################################################
+# Constants
+################################################################################
+
+CAPTURE_SUFFIX = ".vcap"
+MAGIC = b"VHCAP\0"
+VERSION = 1
+
+# magic, version, record size, record count, index stride, index offset
+HEADER_STRUCT = struct.Struct("<6sHHQIQ")
+HEADER_SIZE = 64
+
+RECORD_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("request", "u1", (SHORT_FRAME_LEN,)),
+    ("response", "u1", (LONG_FRAME_LEN,)),
+])
+
+# One index entry per this many records
+INDEX_STRIDE = 4096
+
+FRAME_STREAM_SUFFIX = ".vfrm"
+BATCH_MAGIC = b"VHFR"
+BATCH_VERSION = 1
+
+# magic, version, reserved, frame count, frames dropped before the batch
+BATCH_HEADER = struct.Struct("<4sBBHI")
+# device time [ms], frame size
+FRAME_PREFIX = struct.Struct("<IB")
+
+################################################################################
+# Data Structures
+################################################################################
+
+@dataclass
+class CaptureHeader:
+    record_size: int
+    record_count: int
+    index_stride: int
+    index_offset: int
+
+@dataclass
+class FrameStream:
+    timestamps: np.ndarray  # seconds of device uptime, one per cycle
+    frames: FrameMatrices
+    dropped: int = 0        # frames lost to a full buffer on the device
+    unpaired: int = 0       # frames without a matching request or response
+
+################################################################################
+# Writer
+################################################################################
+
+def write_capture(path: str, chunks: Iterable[FrameMatrices], period: float = 1.0,
+                  start_time: float = 0.0, timestamps: Optional[np.ndarray] = None) -> int:
+    """
+    Write decoded chunks to a capture file, one record per cycle.
+    Cycles are timestamped start_time + n * period, or taken from timestamps
+    (one per cycle, ascending) when given. Returns the record count.
+    """
+    count = 0
+    index = []
+    with open(path, "wb") as f:
+        f.write(bytes(HEADER_SIZE))  # patched once the record count is known
+        for chunk in chunks:
+            n = len(chunk.request)
+            records = np.empty(n, dtype=RECORD_DTYPE)
+            if timestamps is None:
+                records["timestamp"] = start_time + (count + np.arange(n)) * period
+            else:
+                records["timestamp"] = timestamps[count:count + n]
+            records["request"] = chunk.request
+            records["response"] = chunk.response
+            first = -count % INDEX_STRIDE
+            index.extend(records["timestamp"][first::INDEX_STRIDE].tolist())
+            f.write(records.tobytes())
+            count += n
+
+        index_offset = f.tell()
+        f.write(np.asarray(index, dtype="<f8").tobytes())
+        f.seek(0)
+        f.write(HEADER_STRUCT.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, count,
+                                   INDEX_STRIDE, index_offset))
+    return count
+
+################################################################################
+# Reader
+################################################################################
+
+def read_header(path: str) -> CaptureHeader:
+    """
+    Read and validate the header of a capture file.
+    """
+    with open(path, "rb") as f:
+        raw = f.read(HEADER_STRUCT.size)
+    if len(raw) < HEADER_STRUCT.size:
+        raise ValueError(f"{path}: truncated capture header")
+    magic, version, record_size, record_count, index_stride, index_offset = HEADER_STRUCT.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a capture file")
+    if version != VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path}: unsupported capture version {version}")
+    return CaptureHeader(record_size, record_count, index_stride, index_offset)
+
+class CaptureFile:
+    """
+    Memory-mapped view of a capture file.
+    All returned arrays are views into the mapping; nothing is copied.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header = read_header(path)
+        count = self.header.record_count
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r",
+                                 offset=HEADER_SIZE, shape=(count,)) if count else \
+            np.empty(0, dtype=RECORD_DTYPE)
+        index_len = -(-count // self.header.index_stride)
+        self.index = np.memmap(path, dtype="<f8", mode="r", offset=self.header.index_offset,
+                               shape=(index_len,)) if index_len else np.empty(0, dtype="<f8")
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _bisect(self, t: float) -> int:
+        # The sparse index narrows the search to one stride of records,
+        # so only a few pages of the mapping are touched.
+        stride = self.header.index_stride
+        block = max(int(np.searchsorted(self.index, t, side="left")) - 1, 0)
+        lo = block * stride
+        hi = min(lo + 2 * stride, len(self.records))
+        return lo + int(np.searchsorted(self.records["timestamp"][lo:hi], t, side="left"))
+
+    def window(self, start: float = None, end: float = None) -> np.ndarray:
+        """
+        Records with start <= timestamp < end, as a zero-copy slice.
+        """
+        lo = 0 if start is None else self._bisect(start)
+        hi = len(self.records) if end is None else self._bisect(end)
+        return self.records[lo:max(lo, hi)]
+
+    def iter_chunks(self, start: float = None, end: float = None,
+                    chunk_size: int = CHUNK_CYCLES) -> Iterator[FrameMatrices]:
+        """
+        Yield the records of a time window as FrameMatrices views.
+        """
+        records = self.window(start, end)
+        for i in range(0, len(records), chunk_size):
+            part = records[i:i + chunk_size]
+            yield FrameMatrices(request=part["request"], response=part["response"])
+
+################################################################################
+# Frame Stream
+################################################################################
+
+def read_frame_stream(path: str) -> FrameStream:
+    """
+    Read a frame stream and pair every controller frame with the heater
+    frame that answers it. Timestamps are those of the requests.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    times, requests, responses = [], bytearray(), bytearray()
+    dropped = unpaired = 0
+    pending = None  # (time, request) waiting for its response
+    wraps = 0
+    last_ms = 0
+    pos = 0
+    while pos + BATCH_HEADER.size <= len(data):
+        magic, version, _, frame_count, batch_dropped = BATCH_HEADER.unpack_from(data, pos)
+        if magic != BATCH_MAGIC or version != BATCH_VERSION:
+            raise ValueError(f"{path}: bad frame stream batch at byte {pos}")
+        pos += BATCH_HEADER.size
+        dropped += batch_dropped
+        if batch_dropped and pending is not None:
+            pending = None  # its response may have been dropped
+            unpaired += 1
+        for _ in range(frame_count):
+            time_ms, size = FRAME_PREFIX.unpack_from(data, pos)
+            pos += FRAME_PREFIX.size
+            frame = data[pos:pos + size]
+            pos += size
+            # millis() wraps after about 49.7 days
+            if time_ms < last_ms:
+                wraps += 1
+            last_ms = time_ms
+            t = (wraps * 2 ** 32 + time_ms) / 1000.0
+            if size == SHORT_FRAME_LEN:
+                if pending is not None:
+                    unpaired += 1
+                pending = (t, frame)
+            elif size == LONG_FRAME_LEN and pending is not None:
+                times.append(pending[0])
+                requests += pending[1]
+                responses += frame
+                pending = None
+            else:
+                unpaired += 1
+    if pending is not None:
+        unpaired += 1
+
+    frames = FrameMatrices(
+        request=np.frombuffer(bytes(requests), dtype=np.uint8).reshape(-1, SHORT_FRAME_LEN),
+        response=np.frombuffer(bytes(responses), dtype=np.uint8).reshape(-1, LONG_FRAME_LEN),
+    )
+    return FrameStream(np.asarray(times, dtype="<f8"), frames, dropped, unpaired)
+
+def parse_time(text: str) -> float:
+    """
+    Seconds, or an ISO 8601 date/time (local time unless it has an offset)
+    as seconds since the epoch.
+    """
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not seconds or an ISO date/time: {text!r}") from None
+
+def convert(capture: str, output: str, period: float = 1.0, start_time: float = 0.0) -> int:
+    """
+    Convert a hex text capture or frame stream to a binary capture.
+    Returns the number of cycles written.
+    """
+    if capture.endswith(FRAME_STREAM_SUFFIX):
+        stream = read_frame_stream(capture)
+        count = write_capture(output, [stream.frames], timestamps=stream.timestamps)
+        print(f"Frame stream: {stream.dropped} frames dropped on the device, {stream.unpaired} unpaired")
+    else:
+        with open_capture(capture) as f:
+            count = write_capture(output, iter_frame_chunks(f), period=period, start_time=start_time)
+    print(f"Wrote {count} cycles to {output}")
+    return count
+
+################################################################################
+# Main Script
+################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert a hex text capture or frame stream to the binary capture format.")
+    parser.add_argument("capture", help=f"hex text capture, optionally .gz, - for stdin, or a {FRAME_STREAM_SUFFIX} frame stream")
+    parser.add_argument("output", help=f"binary capture file to write ({CAPTURE_SUFFIX})")
+    parser.add_argument("--period", type=float, default=1.0,
+                        help="seconds between cycles used as timestamps (default 1.0)")
+    parser.add_argument("--start-time", type=parse_time, default=0.0,
+                        help="timestamp of the first cycle of a text capture, seconds or an ISO date/time "
+                             "(default 0); wall-clock timestamps let run_index.py select runs by date")
+    args = parser.parse_args(argv)
+    convert(args.capture, args.output, args.period, args.start_time)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Collect raw bus frames from the VevorHeater capture mode.
+
+The firmware buffers every decoded frame with its arrival time and hands the
+buffer out, and clears it, on each GET of /vevorheater/<id>/capture. This
+tool polls that path and appends every batch to a frame stream file
+(".vfrm"), which plot_frame.py and capture_file.py read directly.
+
+Usage:
+    python software/capture_pull.py http://heater.local/vevorheater/vevor_heater/capture heater.vfrm
+    python software/plot_frame.py heater.vfrm
+"""
+
+import argparse
+import time
+import urllib.error
+import urllib.request
+
+from capture_file import BATCH_HEADER, BATCH_MAGIC
+
+def fetch_batch(url: str, timeout: float) -> bytes:
+    """
+    Download one batch and check its header.
+    """
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        batch = response.read()
+    if len(batch) < BATCH_HEADER.size or batch[:len(BATCH_MAGIC)] != BATCH_MAGIC:
+        raise ValueError(f"{url}: not a capture batch")
+    return batch
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append capture batches from a heater to a frame stream file.")
+    parser.add_argument("url", help="capture download URL of the heater")
+    parser.add_argument("output", help="frame stream file to append to (.vfrm)")
+    parser.add_argument("--interval", type=float, default=5.0,
+                        help="seconds between downloads (default 5); keep it below the time "
+                             "the device buffer takes to fill, about capacity / 2 seconds")
+    parser.add_argument("--count", type=int, default=0, help="stop after this many batches, 0 = never")
+    parser.add_argument("--timeout", type=float, default=10.0, help="HTTP timeout [s]")
+    args = parser.parse_args(argv)
+
+    batches = frames = dropped = 0
+    try:
+        with open(args.output, "ab") as out:
+            while args.count == 0 or batches < args.count:
+                started = time.monotonic()
+                try:
+                    batch = fetch_batch(args.url, args.timeout)
+                except (urllib.error.URLError, OSError) as e:
+                    print(f"Download failed: {e}")
+                else:
+                    _, _, _, frame_count, batch_dropped = BATCH_HEADER.unpack_from(batch)
+                    out.write(batch)
+                    out.flush()
+                    batches += 1
+                    frames += frame_count
+                    dropped += batch_dropped
+                    print(f"Batch {batches}: {frame_count} frames, {batch_dropped} dropped "
+                          f"(total {frames} frames, {dropped} dropped)")
+                time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        pass
+    print(f"Appended {batches} batches, {frames} frames to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Rank long frame bytes and 16-bit words by how likely they carry a field.
+
+Every payload byte, every big-endian and every little-endian 16-bit word of
+the heater's long frames is a candidate. Each candidate is scored over the
+whole capture, one batch of columns at a time:
+
+    entropy      Shannon entropy of its values [bits]; 0 means constant
+    monotonic    net share of small increments among its changes, 1 for a
+                 counter or timer (steps across state transitions ignored,
+                 fewer than MIN_COUNTER_STEPS increments score 0)
+    correlation  strongest Pearson correlation with a known field from
+                 vevor_protocol.fields, and that field, after removing the
+                 mean of every heater state: most fields are 0 while the
+                 heater is off, which would otherwise correlate everything
+    state        F1 score of its level shifts against the heater state
+                 transitions: a shift within --window frames of a transition
+                 counts for precision, a transition with a shift for recall
+
+The ranking score is the strongest of monotonic, |correlation| and state.
+Constant candidates and words with a constant byte, which carry no more than
+the byte alone, are listed but not ranked.
+
+Usage:
+    python software/field_discovery.py docs/communication/log_start_running_stop.txt
+    python software/field_discovery.py capture.vcap --unknown-only -o report.txt --csv report.csv
+"""
+
+import argparse
+import csv
+import sys
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from plot_frame import drop_bad_checksums, iter_capture_chunks
+from vevor_protocol import LONG_FRAME_LEN, DecoderStats
+from vevor_protocol.fields import LONG_FRAME_FIELDS, LongFrameField
+
+################################################################################
+# Constants
+################################################################################
+
+FIRST_PAYLOAD = 4
+CHECKSUM_OFFSET = LONG_FRAME_LEN - 1
+STATE_OFFSET = 5
+
+# Largest step that still counts as a counter increment
+MAX_COUNTER_STEP = 16
+# Increments needed before a candidate can score as a counter
+MIN_COUNTER_STEPS = 16
+
+# A level shift is this many noise sigmas between the windows before and after
+SHIFT_THRESHOLD = 4.0
+
+# Floor of the noise estimate, half a raw unit
+MIN_NOISE = 0.5
+
+# Frames sampled for the noise estimate of a candidate
+NOISE_SAMPLE = 1 << 16
+
+# Candidates scored together; bounds memory to about frames * 40 B * BATCH
+BATCH = 8
+
+################################################################################
+# Data Structures
+################################################################################
+
+@dataclass
+class Candidate:
+    kind: str        # u8, be16 or le16
+    offset: int      # first byte
+    known: str = ""  # name of the known field at these bytes
+    entropy: float = 0.0
+    distinct: int = 0
+    minimum: int = 0
+    maximum: int = 0
+    change_rate: float = 0.0
+    monotonic: float = 0.0
+    correlation: float = 0.0
+    correlated_with: str = ""
+    state: float = 0.0
+    redundant: bool = False
+
+    @property
+    def width(self) -> int:
+        return 1 if self.kind == "u8" else 2
+
+    @property
+    def label(self) -> str:
+        if self.width == 1:
+            return f"{self.kind} {self.offset}"
+        return f"{self.kind} {self.offset}-{self.offset + 1}"
+
+    @property
+    def score(self) -> float:
+        if self.redundant or self.distinct <= 1:
+            return 0.0
+        return max(self.monotonic, abs(self.correlation), self.state)
+
+    @property
+    def evidence(self) -> str:
+        if self.score == 0:
+            return "constant" if self.distinct <= 1 else "redundant"
+        scores = {"counter": self.monotonic, "correlation": abs(self.correlation), "state": self.state}
+        return max(scores, key=scores.get)
+
+################################################################################
+# Candidates
+################################################################################
+
+def candidate_list() -> List[Candidate]:
+    """
+    Every payload byte and every 16-bit word in both byte orders.
+    """
+    candidates = [Candidate("u8", offset) for offset in range(FIRST_PAYLOAD, CHECKSUM_OFFSET)]
+    for kind in ("be16", "le16"):
+        candidates += [Candidate(kind, offset) for offset in range(FIRST_PAYLOAD, CHECKSUM_OFFSET - 1)]
+    for candidate in candidates:
+        for field in LONG_FRAME_FIELDS:
+            same_order = field.width == 1 or candidate.kind == "be16"
+            if field.offset == candidate.offset and field.width == candidate.width and same_order:
+                candidate.known = field.name
+    return candidates
+
+def candidate_values(columns: np.ndarray, candidates: List[Candidate]) -> np.ndarray:
+    """
+    (len(candidates), frames) int32 matrix of the candidates' raw values,
+    from the byte columns of the frames (one row per frame offset).
+    """
+    values = np.empty((len(candidates), columns.shape[1]), dtype=np.int32)
+    for i, candidate in enumerate(candidates):
+        first = columns[candidate.offset]
+        if candidate.kind == "u8":
+            values[i] = first
+            continue
+        second = columns[candidate.offset + 1]
+        high, low = (first, second) if candidate.kind == "be16" else (second, first)
+        np.left_shift(high, 8, out=values[i], dtype=np.int32)
+        values[i] |= low
+    return values
+
+def known_values(columns: np.ndarray, fields: Tuple[LongFrameField, ...]) -> np.ndarray:
+    """
+    (len(fields), frames) matrix of the known fields, raw units.
+    """
+    values = np.empty((len(fields), columns.shape[1]), dtype=np.int32)
+    for i, field in enumerate(fields):
+        if field.width == 1:
+            values[i] = columns[field.offset]
+            continue
+        word = (columns[field.offset].astype(np.uint16) << 8) | columns[field.offset + 1]
+        values[i] = word.view(np.int16) if field.signed else word
+    return values
+
+def overlaps(candidate: Candidate, field: LongFrameField) -> bool:
+    return candidate.offset < field.offset + field.width and field.offset < candidate.offset + candidate.width
+
+################################################################################
+# Scores
+################################################################################
+
+# All score functions take candidates as rows and frames as columns, so every
+# candidate's values are contiguous in memory.
+
+def standardize(values: np.ndarray, segments: np.ndarray) -> np.ndarray:
+    """
+    Rows minus their mean in each heater state, scaled to unit variance;
+    rows fully explained by the state become 0. values are sorted by state,
+    segments holds the first frame of every state.
+    """
+    means = np.add.reduceat(values, segments, axis=1, dtype=np.int64) / np.diff(np.append(segments, values.shape[1]))
+    residual = values.astype(np.float32)
+    bounds = np.append(segments, values.shape[1])
+    for i in range(len(segments)):
+        residual[:, bounds[i]:bounds[i + 1]] -= means[:, i:i + 1].astype(np.float32)
+    std = residual.std(axis=1, keepdims=True)
+    std[std < 1e-6] = np.inf
+    residual /= std
+    return residual
+
+def entropy_scores(values: np.ndarray, candidates: List[Candidate]) -> None:
+    for row, candidate in zip(values, candidates):
+        counts = np.bincount(row, minlength=1 << (8 * candidate.width))
+        present = np.flatnonzero(counts)
+        p = counts[present] / len(row)
+        candidate.entropy = float(-(p * np.log2(p)).sum())
+        candidate.distinct = len(present)
+        candidate.minimum = int(present[0])
+        candidate.maximum = int(present[-1])
+
+def monotonic_scores(values: np.ndarray, candidates: List[Candidate], steady: np.ndarray) -> None:
+    """
+    Net share of small increments among the changes between frames of the same state.
+    """
+    masks = np.array([[(1 << (8 * c.width)) - 1] for c in candidates], dtype=np.int32)
+    step = np.diff(values, axis=1)
+    step &= masks
+    changed = (step != 0) & steady
+    increments = (changed & (step <= MAX_COUNTER_STEP)).sum(axis=1)
+    decrements = (changed & (step > masks - MAX_COUNTER_STEP)).sum(axis=1)
+    changes = changed.sum(axis=1)
+    rate = changes / max(int(steady.sum()), 1)
+    net = (increments - decrements) / np.maximum(changes, 1)
+    net[increments < MIN_COUNTER_STEPS] = 0.0
+    for i, candidate in enumerate(candidates):
+        candidate.change_rate = float(rate[i])
+        candidate.monotonic = float(max(net[i], 0.0))
+
+def correlation_scores(z_values: np.ndarray, z_known: np.ndarray, candidates: List[Candidate]) -> None:
+    """
+    Strongest correlation with a known field not sharing bytes with the candidate.
+    """
+    r = z_values @ z_known.T / z_values.shape[1]
+    for i, candidate in enumerate(candidates):
+        for j, field in enumerate(LONG_FRAME_FIELDS):
+            if overlaps(candidate, field) or field.offset == STATE_OFFSET:
+                r[i, j] = 0.0
+        j = int(np.argmax(np.abs(r[i])))
+        candidate.correlation = float(r[i, j])
+        candidate.correlated_with = LONG_FRAME_FIELDS[j].name if r[i, j] != 0 else ""
+
+def level_shifts(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Candidate rows and frames of the level shifts: local maxima of the
+    difference between the sums of the windows after and before a frame, at
+    least SHIFT_THRESHOLD times the candidate's frame-to-frame noise. Frames
+    are tested every window / 2, well inside the alignment tolerance.
+    """
+    frames = values.shape[1]
+    if frames <= 2 * window:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    total = np.zeros((len(values), frames + 1), dtype=np.int64)
+    np.cumsum(values, axis=1, out=total[:, 1:])
+    stride = max(1, window // 2)
+    tested = len(range(window, frames - window + 1, stride))
+    moved = (total[:, 2 * window::stride][:, :tested] - 2 * total[:, window::stride][:, :tested]
+             + total[:, :-2 * window or None:stride][:, :tested])
+    np.abs(moved, out=moved)
+    # Noise from the median step, estimated on a sample of the frames
+    sample = max(1, frames // NOISE_SAMPLE)
+    noise = 1.4826 * np.median(np.abs(np.diff(values[:, ::sample], axis=1)), axis=1, keepdims=True) / np.sqrt(2)
+    peak = moved >= SHIFT_THRESHOLD * window * np.maximum(noise, MIN_NOISE)
+    peak[:, 1:] &= moved[:, 1:] >= moved[:, :-1]
+    peak[:, :-1] &= moved[:, :-1] > moved[:, 1:]
+    rows, tests = np.nonzero(peak)
+    return rows, window + tests * stride
+
+def state_scores(values: np.ndarray, candidates: List[Candidate], transitions: np.ndarray, window: int) -> None:
+    """
+    F1 score of the level shifts of every candidate against the state transitions.
+    """
+    if len(transitions) == 0:
+        return
+    rows, frames = level_shifts(values, window)
+    # Nearest transition of every shift
+    right = np.clip(np.searchsorted(transitions, frames), 0, len(transitions) - 1)
+    left = np.clip(right - 1, 0, len(transitions) - 1)
+    nearest = np.where(np.abs(transitions[left] - frames) <= np.abs(transitions[right] - frames), left, right)
+    aligned = np.abs(transitions[nearest] - frames) <= window
+    found = np.bincount(rows, minlength=len(candidates))
+    hits = np.bincount(rows[aligned], minlength=len(candidates))
+    # Transitions with at least one aligned shift of the candidate
+    pairs = np.unique(rows[aligned] * len(transitions) + nearest[aligned])
+    covered = np.bincount(pairs // len(transitions), minlength=len(candidates))
+    precision = hits / np.maximum(found, 1)
+    recall = covered / len(transitions)
+    f1 = 2 * precision * recall / np.maximum(precision + recall, 1e-12)
+    for i, candidate in enumerate(candidates):
+        candidate.state = float(f1[i])
+
+def score_candidates(frames: np.ndarray, window: int, batch: int = BATCH) -> List[Candidate]:
+    """
+    Score every candidate over all frames, batch candidates at a time.
+    Bytes are scored first; words with a constant byte are marked redundant
+    and skipped.
+    """
+    columns = np.ascontiguousarray(frames.T)
+    changed = columns[STATE_OFFSET, 1:] != columns[STATE_OFFSET, :-1]
+    transitions = np.flatnonzero(changed) + 1
+    steady = ~changed
+    # Correlations do not depend on the frame order, they are computed on the
+    # frames sorted by state so the state means are contiguous
+    by_state = np.ascontiguousarray(columns[:, np.argsort(columns[STATE_OFFSET], kind="stable")])
+    sorted_state = by_state[STATE_OFFSET]
+    segments = np.flatnonzero(np.r_[True, sorted_state[1:] != sorted_state[:-1]])
+    z_known = standardize(known_values(by_state, LONG_FRAME_FIELDS), segments)
+
+    candidates = candidate_list()
+    constant = set()
+    for width in (1, 2):
+        todo = [c for c in candidates if c.width == width]
+        if width == 2:
+            # A word with a constant byte carries no more than its other byte
+            for c in todo:
+                c.redundant = not c.known and (c.offset in constant or c.offset + 1 in constant)
+            todo = [c for c in todo if not c.redundant]
+        for start in range(0, len(todo), batch):
+            group = todo[start:start + batch]
+            values = candidate_values(columns, group)
+            entropy_scores(values, group)
+            monotonic_scores(values, group, steady)
+            correlation_scores(standardize(candidate_values(by_state, group), segments), z_known, group)
+            state_scores(values, group, transitions, window)
+        if width == 1:
+            constant = {c.offset for c in todo if c.distinct <= 1}
+
+    # The state byte itself trivially shifts at every transition
+    for candidate in candidates:
+        if candidate.offset <= STATE_OFFSET < candidate.offset + candidate.width:
+            candidate.state = 0.0
+    return candidates
+
+################################################################################
+# Report
+################################################################################
+
+def load_responses(path: str, start: Optional[float], end: Optional[float]) -> Tuple[np.ndarray, DecoderStats]:
+    """
+    All long frames of a capture with a valid checksum, one per row.
+    """
+    errors = DecoderStats()
+    chunks = []
+    with iter_capture_chunks(path, start, end, errors) as capture:
+        for chunk in capture:
+            chunks.append(drop_bad_checksums(chunk, errors).response)
+    if not chunks:
+        return np.empty((0, LONG_FRAME_LEN), dtype=np.uint8), errors
+    return np.concatenate(chunks), errors
+
+def format_report(candidates: List[Candidate], frames: int, transitions: int, top: int) -> str:
+    ranked = sorted((c for c in candidates if c.score > 0), key=lambda c: c.score, reverse=True)
+    lines = [
+        f"{frames} long frames, {transitions} state transitions",
+        "",
+        f"{'rank':>4} {'candidate':<11} {'score':>5} {'evidence':<11} {'entropy':>7} {'distinct':>8} "
+        f"{'range':>13} {'changes':>7} {'counter':>7} {'corr':>6} {'with':<26} {'state':>5} known",
+    ]
+    for rank, c in enumerate(ranked[:top] if top else ranked, 1):
+        lines.append(
+            f"{rank:>4} {c.label:<11} {c.score:>5.2f} {c.evidence:<11} {c.entropy:>7.2f} {c.distinct:>8} "
+            f"{f'{c.minimum}-{c.maximum}':>13} {c.change_rate:>7.1%} {c.monotonic:>7.2f} {c.correlation:>6.2f} "
+            f"{c.correlated_with:<26} {c.state:>5.2f} {c.known}"
+        )
+    constant = [c for c in candidates if c.kind == "u8" and c.distinct <= 1]
+    if constant:
+        lines += ["", "Constant bytes: " + ", ".join(f"{c.offset}=0x{c.minimum:02X}" for c in constant)]
+    return "\n".join(lines)
+
+def write_csv(path: str, candidates: List[Candidate]) -> None:
+    columns = ["kind", "offset", "known", "score", "evidence", "entropy", "distinct", "minimum", "maximum",
+               "change_rate", "monotonic", "correlation", "correlated_with", "state"]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for c in sorted(candidates, key=lambda c: c.score, reverse=True):
+            writer.writerow([getattr(c, column) for column in columns])
+
+################################################################################
+# Main Script
+################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank long frame bytes and words as field candidates.")
+    parser.add_argument("capture", help="hex text capture (.txt, .gz, - for stdin), .vcap or .vfrm")
+    parser.add_argument("--start", type=float, help="first timestamp [s] to analyse (binary captures only)")
+    parser.add_argument("--end", type=float, help="end timestamp [s] (binary captures only)")
+    parser.add_argument("--window", type=int, default=8,
+                        help="frames on each side for level shifts and state alignment (default 8)")
+    parser.add_argument("--unknown-only", action="store_true",
+                        help="leave out candidates overlapping a known field")
+    parser.add_argument("--top", type=int, default=40, help="ranked candidates to report, 0 for all")
+    parser.add_argument("-o", "--output", help="also write the report to this file")
+    parser.add_argument("--csv", help="write the scores of all candidates as CSV")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    frames, errors = load_responses(args.capture, args.start, args.end)
+    if len(frames) < 2:
+        print("Not enough valid long frames to analyse")
+        return
+    loaded = time.perf_counter()
+
+    candidates = score_candidates(frames, args.window)
+    if args.unknown_only:
+        candidates = [c for c in candidates if not any(overlaps(c, field) for field in LONG_FRAME_FIELDS)]
+    transitions = int(np.count_nonzero(np.diff(frames[:, STATE_OFFSET].astype(np.int16))))
+    report = format_report(candidates, len(frames), transitions, args.top)
+    print(report)
+    print(f"\nLoaded in {loaded - started:.2f} s, scored in {time.perf_counter() - loaded:.2f} s "
+          f"({errors.checksum_errors} bad frames skipped)", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    if args.csv:
+        write_csv(args.csv, candidates)
+
+if __name__ == "__main__":
+    main()
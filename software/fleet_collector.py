@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Collect the telemetry of a whole fleet of heaters into one database.
+
+Nodes connect over TCP and send the frame stream batches their capture mode
+produces (see capture_file.py), each prefixed with its length, after a hello
+carrying the node name:
+
+    hello   HELLO_STRUCT (magic, version, name length), then the name in UTF-8
+    batch   BATCH_LENGTH (uint32 byte count), then one capture batch
+
+Firmware that only serves batches over HTTP is polled with --pull NAME=URL
+instead. A node's device timestamps (milliseconds of uptime) are mapped to
+wall-clock time (Unix seconds) with the smallest arrival delay seen so far,
+so bucket_start is a Unix timestamp.
+
+Connections only split batches into frames. Every --flush seconds the long
+frames from all nodes are checked and decoded together, vectorized, and
+reduced to one aggregate per heater, heater state and --bucket seconds: the
+frame count and the mean, minimum and maximum of every long frame field. A
+bucket is written once the heater has sent a frame in a later one, or when
+it disconnects, to SQLite (.sqlite, .db; rows of a bucket split across
+reconnects are merged) or as Parquet parts to a directory (needs pandas and
+pyarrow).
+
+--simulate N replays a capture from N stand-in nodes in a separate process,
+--time-factor times faster than real time. The collector reports its
+throughput in frames per CPU second, its own process only.
+
+Usage:
+    python software/fleet_collector.py fleet.sqlite --port 7420
+    python software/fleet_collector.py fleet.sqlite --pull garage=http://garage.local/vevorheater/vevor_heater/capture
+    python software/fleet_collector.py fleet.sqlite --simulate 1000 --time-factor 10 --duration 60
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sqlite3
+import struct
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from capture_file import BATCH_HEADER, BATCH_MAGIC, BATCH_VERSION, FRAME_PREFIX
+from capture_pull import fetch_batch
+from plot_frame import SAMPLE_CAPTURE, load_frame_matrices, open_capture
+from vevor_protocol import HEATER_ID, LONG_FRAME_LEN, SHORT_FRAME_LEN
+from vevor_protocol.bulk import checksums_ok, field_column
+from vevor_protocol.fields import LONG_FRAME_FIELDS
+
+################################################################################
+# Constants
+################################################################################
+
+DEFAULT_PORT = 7420
+HELLO_MAGIC = b"VHNO"
+HELLO_VERSION = 1
+# magic, version, name length
+HELLO_STRUCT = struct.Struct("<4sBB")
+BATCH_LENGTH = struct.Struct("<I")
+# Larger batches than the firmware buffer could ever hold are a broken stream
+MAX_BATCH_BYTES = 1 << 20
+
+STATE_OFFSET = 5
+# Aggregated fields, all but the state (a grouping key) and its duration
+AGGREGATE_FIELDS = [field for field in LONG_FRAME_FIELDS if field.key not in ("state", "state_duration")]
+COLUMNS = (["heater", "bucket_start", "state", "frames"]
+           + [f"{field.key}_{stat}" for field in AGGREGATE_FIELDS for stat in ("mean", "min", "max")])
+
+# Device clock: millis() wraps after about 49.7 days, any other step back is a reboot
+MILLIS_WRAP = 1 << 32
+
+# Stand-in nodes: cycles per batch (the firmware is pulled every 5 s) and
+# the controller period
+SIM_BATCH_CYCLES = 5
+SIM_PERIOD_S = 1.0
+SIM_REPLY_MS = 100
+
+################################################################################
+# Data Structures
+################################################################################
+
+@dataclass
+class Node:
+    """
+    One heater, by the name it connects with.
+    """
+    name: str
+    index: int
+    connected: bool = True
+    last_ms: int = 0
+    base_ms: int = 0            # added to device times for wraps and reboots
+    clock_offset: float = float("inf")  # collector time - device time [s]
+    latest_bucket: int = -1
+    dropped: int = 0
+
+@dataclass
+class IngestStats:
+    batches: int = 0
+    frames: int = 0
+    long_frames: int = 0
+    bad_frames: int = 0
+    rows: int = 0
+
+################################################################################
+# Aggregation
+################################################################################
+
+class Ingestor:
+    """
+    Splits batches into frames as they arrive and aggregates the long frames
+    of all nodes together on flush.
+    """
+
+    def __init__(self, bucket_s: float):
+        self.bucket_s = bucket_s
+        self.nodes: Dict[str, Node] = {}
+        self.by_index: List[Node] = []
+        self.stats = IngestStats()
+        # (node index, batch, long frame offsets, collector times)
+        self.pending: List[Tuple[int, bytes, np.ndarray, np.ndarray]] = []
+        # (node index, bucket, state) -> [count, sums..., minimums..., maximums...]
+        self.open: Dict[Tuple[int, int, int], np.ndarray] = {}
+
+    def node(self, name: str) -> Node:
+        node = self.nodes.get(name)
+        if node is None:
+            node = Node(name, len(self.by_index))
+            self.nodes[name] = node
+            self.by_index.append(node)
+        node.connected = True
+        return node
+
+    def add_batch(self, node: Node, batch: bytes, received: float) -> None:
+        """
+        Find the long frames of a capture batch and timestamp them.
+        received is the arrival time of the batch, time.time().
+        Raises ValueError if the batch is malformed.
+        """
+        if len(batch) < BATCH_HEADER.size:
+            raise ValueError("short batch")
+        magic, version, _, frame_count, dropped = BATCH_HEADER.unpack_from(batch)
+        if magic != BATCH_MAGIC or version != BATCH_VERSION:
+            raise ValueError("not a capture batch")
+        starts, times = [], []
+        pos = BATCH_HEADER.size
+        for _ in range(frame_count):
+            time_ms, size = FRAME_PREFIX.unpack_from(batch, pos)
+            pos += FRAME_PREFIX.size
+            if size == LONG_FRAME_LEN:
+                starts.append(pos)
+                times.append(time_ms)
+            pos += size
+        if pos > len(batch):
+            raise ValueError("truncated batch")
+        node.dropped += dropped
+        self.stats.batches += 1
+        self.stats.frames += frame_count
+        if starts:
+            device_s = self._device_seconds(node, times)
+            node.clock_offset = min(node.clock_offset, received - device_s[-1])
+            self.pending.append((node.index, batch, np.array(starts, dtype=np.int64), device_s + node.clock_offset))
+
+    def _device_seconds(self, node: Node, times: List[int]) -> np.ndarray:
+        times_ms = np.array(times, dtype=np.int64)
+        if node.last_ms <= times[0] and times == sorted(times):
+            # No wrap or reboot, as nearly always
+            node.last_ms = times[-1]
+            return (times_ms + node.base_ms) / 1000.0
+        previous = np.concatenate([[node.last_ms], times_ms[:-1]])
+        back = times_ms < previous
+        wrapped = back & (previous >= MILLIS_WRAP // 2)
+        rebooted = back & ~wrapped
+        if rebooted.any():
+            # The uptime restarted: keep device time running and measure the offset anew
+            node.clock_offset = float("inf")
+        steps = np.where(wrapped, MILLIS_WRAP, np.where(rebooted, previous, 0))
+        base = node.base_ms + np.cumsum(steps)
+        node.base_ms = int(base[-1])
+        node.last_ms = int(times_ms[-1])
+        return (base + times_ms) / 1000.0
+
+    def flush(self, final: bool = False) -> List[tuple]:
+        """
+        Aggregate the pending frames. Returns the rows of the buckets that
+        are complete, or of all buckets if final.
+        """
+        if self.pending:
+            self._aggregate_pending()
+        done = [key for key in self.open
+                if final or not self.by_index[key[0]].connected or key[1] < self.by_index[key[0]].latest_bucket]
+        rows = [self._row(key, self.open.pop(key)) for key in sorted(done)]
+        self.stats.rows += len(rows)
+        return rows
+
+    def _aggregate_pending(self) -> None:
+        # Gather the long frames of all pending batches into one matrix
+        lengths = np.array([len(batch) for _, batch, _, _ in self.pending], dtype=np.int64)
+        bases = np.cumsum(lengths) - lengths
+        data = np.frombuffer(b"".join(batch for _, batch, _, _ in self.pending), dtype=np.uint8)
+        starts = np.concatenate([starts + base for (_, _, starts, _), base in zip(self.pending, bases)])
+        node = np.concatenate([np.full(len(starts), index, dtype=np.int64) for index, _, starts, _ in self.pending])
+        times = np.concatenate([times for _, _, _, times in self.pending])
+        self.pending = []
+        matrix = data[starts[:, np.newaxis] + np.arange(LONG_FRAME_LEN)]
+
+        ok = checksums_ok(matrix) & (matrix[:, 1] == HEATER_ID)
+        self.stats.long_frames += len(ok)
+        self.stats.bad_frames += int(len(ok) - ok.sum())
+        matrix, node, times = matrix[ok], node[ok], times[ok]
+        if not len(matrix):
+            return
+        state = matrix[:, STATE_OFFSET].astype(np.int64)
+        bucket = np.floor(times / self.bucket_s).astype(np.int64)
+        values = np.column_stack([field_column(matrix, field.key) * field.scale for field in AGGREGATE_FIELDS])
+
+        # One group per node, bucket and state, reduced over sorted rows
+        order = np.lexsort((state, bucket, node))
+        node, bucket, state, values = node[order], bucket[order], state[order], values[order]
+        new_group = np.ones(len(node), dtype=bool)
+        new_group[1:] = (node[1:] != node[:-1]) | (bucket[1:] != bucket[:-1]) | (state[1:] != state[:-1])
+        first = np.flatnonzero(new_group)
+        counts = np.diff(np.append(first, len(node)))
+        sums = np.add.reduceat(values, first)
+        minimums = np.minimum.reduceat(values, first)
+        maximums = np.maximum.reduceat(values, first)
+
+        fields = len(AGGREGATE_FIELDS)
+        for i, row in enumerate(first):
+            key = (int(node[row]), int(bucket[row]), int(state[row]))
+            aggregate = self.open.get(key)
+            if aggregate is None:
+                self.open[key] = np.concatenate([[counts[i]], sums[i], minimums[i], maximums[i]])
+                continue
+            aggregate[0] += counts[i]
+            aggregate[1:1 + fields] += sums[i]
+            np.minimum(aggregate[1 + fields:1 + 2 * fields], minimums[i], out=aggregate[1 + fields:1 + 2 * fields])
+            np.maximum(aggregate[1 + 2 * fields:], maximums[i], out=aggregate[1 + 2 * fields:])
+        for index in np.unique(node):
+            latest = int(bucket[node == index].max())
+            heater = self.by_index[index]
+            heater.latest_bucket = max(heater.latest_bucket, latest)
+
+    def _row(self, key: Tuple[int, int, int], aggregate: np.ndarray) -> tuple:
+        index, bucket, state = key
+        fields = len(AGGREGATE_FIELDS)
+        count = aggregate[0]
+        means = aggregate[1:1 + fields] / count
+        stats = np.column_stack([means, aggregate[1 + fields:1 + 2 * fields], aggregate[1 + 2 * fields:]])
+        return (self.by_index[index].name, bucket * self.bucket_s, state, int(count), *stats.ravel().tolist())
+
+################################################################################
+# Storage
+################################################################################
+
+class SqliteWriter:
+    """
+    Aggregates in an SQLite table, one row per heater, bucket and state.
+    """
+
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        value_columns = ", ".join(f"{name} REAL" for name in COLUMNS[4:])
+        self.db.execute(f"CREATE TABLE IF NOT EXISTS telemetry (heater TEXT, bucket_start REAL, state INTEGER, "
+                        f"frames INTEGER, {value_columns}, PRIMARY KEY (heater, bucket_start, state))")
+        # A bucket written before a reconnect is merged with the rest of it
+        merged = []
+        for field in AGGREGATE_FIELDS:
+            mean, low, high = (f"{field.key}_{stat}" for stat in ("mean", "min", "max"))
+            merged += [f"{mean} = ({mean} * frames + excluded.{mean} * excluded.frames) / (frames + excluded.frames)",
+                       f"{low} = min({low}, excluded.{low})", f"{high} = max({high}, excluded.{high})"]
+        merged.append("frames = frames + excluded.frames")
+        self.insert = (f"INSERT INTO telemetry ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+                       f"ON CONFLICT (heater, bucket_start, state) DO UPDATE SET {', '.join(merged)}")
+
+    def write(self, rows: List[tuple]) -> None:
+        with self.db:
+            self.db.executemany(self.insert, rows)
+
+    def close(self) -> None:
+        self.db.close()
+
+class ParquetWriter:
+    """
+    Aggregates as Parquet files in a directory, one per write.
+    """
+
+    def __init__(self, directory: str):
+        import pandas as pd
+
+        # Fails with an ImportError naming the missing packages before any node connects
+        pd.io.parquet.get_engine("auto")
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.parts = 0
+
+    def write(self, rows: List[tuple]) -> None:
+        import pandas as pd
+
+        path = os.path.join(self.directory, f"telemetry-{time.time_ns()}-{self.parts:06d}.parquet")
+        pd.DataFrame(rows, columns=COLUMNS).to_parquet(path, index=False)
+        self.parts += 1
+
+    def close(self) -> None:
+        pass
+
+def open_writer(path: str):
+    if path.endswith((".sqlite", ".db")):
+        return SqliteWriter(path)
+    return ParquetWriter(path)
+
+################################################################################
+# Network
+################################################################################
+
+class Collector:
+    """
+    The TCP server, HTTP pollers and the flush loop around one Ingestor.
+    """
+
+    def __init__(self, ingestor: Ingestor, writer, flush_s: float):
+        self.ingestor = ingestor
+        self.writer = writer
+        self.flush_s = flush_s
+        self.handlers = set()
+
+    async def handle_node(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = writer.get_extra_info("peername")
+        node = None
+        self.handlers.add(asyncio.current_task())
+        try:
+            magic, version, name_length = HELLO_STRUCT.unpack(await reader.readexactly(HELLO_STRUCT.size))
+            if magic != HELLO_MAGIC or version != HELLO_VERSION:
+                raise ValueError("bad hello")
+            node = self.ingestor.node((await reader.readexactly(name_length)).decode())
+            while True:
+                try:
+                    (length,) = BATCH_LENGTH.unpack(await reader.readexactly(BATCH_LENGTH.size))
+                except asyncio.IncompleteReadError as e:
+                    if e.partial:
+                        raise
+                    break  # closed between batches
+                if length > MAX_BATCH_BYTES:
+                    raise ValueError(f"batch of {length} bytes")
+                self.ingestor.add_batch(node, await reader.readexactly(length), time.time())
+        except (ValueError, UnicodeDecodeError, asyncio.IncompleteReadError, ConnectionError) as e:
+            print(f"{node.name if node else peer}: {e}, disconnected", file=sys.stderr)
+        except asyncio.CancelledError:
+            pass  # shutting down
+        finally:
+            if node is not None:
+                node.connected = False
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def close_connections(self) -> None:
+        for task in self.handlers:
+            task.cancel()
+        await asyncio.gather(*self.handlers)
+
+    async def pull(self, name: str, url: str, interval: float, timeout: float) -> None:
+        node = self.ingestor.node(name)
+        while True:
+            try:
+                batch = await asyncio.to_thread(fetch_batch, url, timeout)
+                self.ingestor.add_batch(node, batch, time.time())
+            except (OSError, ValueError) as e:
+                print(f"{name}: {e}", file=sys.stderr)
+            await asyncio.sleep(interval)
+
+    async def flush(self, final: bool = False) -> None:
+        rows = self.ingestor.flush(final)
+        if rows:
+            await asyncio.to_thread(self.writer.write, rows)
+
+    async def flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_s)
+            try:
+                await self.flush()
+            except (sqlite3.Error, OSError) as e:
+                print(f"Writing aggregates failed: {e}", file=sys.stderr)
+
+################################################################################
+# Stand-in Nodes
+################################################################################
+
+def build_sim_batches(path: str) -> List[Tuple[struct.Struct, List[bytes]]]:
+    """
+    The cycles of a capture cut into batches of SIM_BATCH_CYCLES: for each, a
+    Struct packing the batch and its frames in order, device times left open.
+    """
+    with open_capture(path) as f:
+        frames = load_frame_matrices(f)
+    prefix = FRAME_PREFIX.format.lstrip("<")
+    batches = []
+    for start in range(0, len(frames.request), SIM_BATCH_CYCLES):
+        request = frames.request[start:start + SIM_BATCH_CYCLES]
+        response = frames.response[start:start + SIM_BATCH_CYCLES]
+        layout = BATCH_HEADER.format + f"{prefix}{SHORT_FRAME_LEN}s{prefix}{LONG_FRAME_LEN}s" * len(request)
+        payload = [bytes(frame) for pair in zip(request, response) for frame in pair]
+        batches.append((struct.Struct(layout), payload))
+    return batches
+
+async def sim_node(name: str, host: str, port: int, batches, time_factor: float, stop: float) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    encoded = name.encode()
+    writer.write(HELLO_STRUCT.pack(HELLO_MAGIC, HELLO_VERSION, len(encoded)) + encoded)
+    loop = asyncio.get_running_loop()
+    device_ms = random.randrange(10 ** 8)
+    step_ms = int(SIM_PERIOD_S * 1000)
+    i = random.randrange(len(batches))
+    next_send = loop.time()
+    await asyncio.sleep(random.random() * SIM_BATCH_CYCLES * SIM_PERIOD_S / time_factor)
+    while loop.time() < stop:
+        layout, payload = batches[i]
+        values = []
+        for cycle in range(len(payload) // 2):
+            values += [device_ms, SHORT_FRAME_LEN, payload[2 * cycle],
+                       device_ms + SIM_REPLY_MS, LONG_FRAME_LEN, payload[2 * cycle + 1]]
+            device_ms += step_ms
+        batch = layout.pack(BATCH_MAGIC, BATCH_VERSION, 0, len(payload), 0, *values)
+        writer.write(BATCH_LENGTH.pack(len(batch)) + batch)
+        await writer.drain()
+        i = (i + 1) % len(batches)
+        next_send += len(payload) // 2 * SIM_PERIOD_S / time_factor
+        await asyncio.sleep(max(next_send - loop.time(), 0))
+    writer.close()
+
+async def run_sim_nodes(count: int, host: str, port: int, capture: str, time_factor: float,
+                        duration: float) -> None:
+    batches = build_sim_batches(capture)
+    stop = asyncio.get_running_loop().time() + duration
+    await asyncio.gather(*(sim_node(f"sim{i:04d}", host, port, batches, time_factor, stop) for i in range(count)))
+
+def sim_process(count: int, host: str, port: int, capture: str, time_factor: float, duration: float) -> None:
+    # Entry point of the stand-in process
+    asyncio.run(run_sim_nodes(count, host, port, capture, time_factor, duration))
+
+################################################################################
+# Main Script
+################################################################################
+
+def print_summary(collector: Collector, wall: float, cpu: float) -> None:
+    stats = collector.ingestor.stats
+    dropped = sum(node.dropped for node in collector.ingestor.by_index)
+    print(f"{len(collector.ingestor.by_index)} heaters, {stats.batches} batches, {stats.frames} frames "
+          f"({stats.long_frames} long, {stats.bad_frames} bad, {dropped} dropped on the nodes), "
+          f"{stats.rows} rows written")
+    print(f"{wall:.1f} s, {cpu:.1f} s CPU: {stats.frames / wall:.0f} frames/s, "
+          f"{stats.frames / cpu if cpu else 0:.0f} frames per CPU second")
+
+async def run_collector(args) -> None:
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    collector = Collector(Ingestor(args.bucket), open_writer(args.output), args.flush)
+    server = await asyncio.start_server(collector.handle_node, args.host, args.port)
+    port = server.sockets[0].getsockname()[1]
+    print(f"Listening on {args.host}:{port}", file=sys.stderr)
+    tasks = [asyncio.create_task(collector.flush_loop())]
+    for spec in args.pull:
+        name, url = spec.split("=", 1)
+        tasks.append(asyncio.create_task(collector.pull(name, url, args.pull_interval, args.pull_timeout)))
+
+    sim = None
+    if args.simulate:
+        sim = multiprocessing.get_context("spawn").Process(
+            target=sim_process, args=(args.simulate, "127.0.0.1", port, args.replay, args.time_factor, args.duration))
+        sim.start()
+    try:
+        if args.duration:
+            await asyncio.sleep(args.duration)
+            # Let the stand-ins finish their last batch
+            await asyncio.sleep(min(args.flush, 2.0))
+        else:
+            await asyncio.Event().wait()
+    finally:
+        server.close()
+        for task in tasks:
+            task.cancel()
+        await collector.close_connections()
+        await collector.flush(final=True)
+        collector.writer.close()
+        if sim is not None:
+            sim.join(timeout=10)
+        print_summary(collector, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collect fleet telemetry into time-bucketed aggregates.")
+    parser.add_argument("output", help="SQLite database (.sqlite, .db) or directory for Parquet files")
+    parser.add_argument("--host", default="0.0.0.0", help="address to listen on (default all)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"TCP port (default {DEFAULT_PORT}, 0 = any)")
+    parser.add_argument("--bucket", type=float, default=60.0, help="aggregate bucket length [s] (default 60)")
+    parser.add_argument("--flush", type=float, default=1.0, help="seconds between aggregation passes (default 1)")
+    parser.add_argument("--pull", action="append", default=[], metavar="NAME=URL",
+                        help="also poll the capture URL of a node that cannot connect itself")
+    parser.add_argument("--pull-interval", type=float, default=5.0, help="seconds between polls (default 5)")
+    parser.add_argument("--pull-timeout", type=float, default=10.0, help="HTTP timeout [s]")
+    parser.add_argument("--simulate", type=int, default=0, metavar="N", help="replay a capture from N stand-in nodes")
+    parser.add_argument("--replay", default=SAMPLE_CAPTURE, help="capture the stand-in nodes replay")
+    parser.add_argument("--time-factor", type=float, default=1.0, help="stand-in node speed-up (default 1)")
+    parser.add_argument("--duration", type=float, default=0.0, help="stop after this many seconds, 0 = never")
+    args = parser.parse_args(argv)
+    if any("=" not in spec for spec in args.pull):
+        parser.error("--pull takes NAME=URL")
+    if args.simulate and not args.duration:
+        parser.error("--simulate needs --duration")
+
+    try:
+        asyncio.run(run_collector(args))
+    except KeyboardInterrupt:
+        pass
+    except ImportError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Fuzz the incremental frame decoder against a captured log.
+
+The capture is turned back into a byte stream, corrupted at random (flipped
+bits, dropped and inserted bytes), and fed to vevor_protocol.FrameDecoder.
+Every frame left untouched by the corruption must be recovered at its
+position in the stream, including the frames right after a corrupted one.
+Corrupted frames that still pass the 8-bit checksum are reported as
+undetected; only the intact frames such a frame overlaps may be lost.
+
+Usage:
+    python software/fuzz_decoder.py docs/communication/log_start_running_stop.txt --rate 0.001
+"""
+
+import argparse
+import random
+from typing import Dict, Iterator, List, Tuple
+
+import vevor_protocol as vp
+from plot_frame import open_capture, iter_frame_pairs
+
+def corrupt(frames: List[bytes], rate: float, rng: random.Random):
+    """
+    Concatenate frames into a stream with random corruption.
+    Returns the stream and the frames left intact by their offset in it.
+    """
+    stream = bytearray()
+    intact: Dict[int, bytes] = {}
+    for frame in frames:
+        out = bytearray()
+        for byte in frame:
+            r = rng.random()
+            if r < rate:
+                out.append(byte ^ (1 << rng.randrange(8)))  # bit flip
+            elif r < 2 * rate:
+                pass  # dropped byte
+            elif r < 3 * rate:
+                out += bytes((byte, rng.randrange(256)))  # inserted byte
+            else:
+                out.append(byte)
+        if out == frame:
+            intact[len(stream)] = frame
+        stream += out
+    return bytes(stream), intact
+
+def decode_with_offsets(decoder: vp.FrameDecoder, stream: bytes) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yield (offset in the stream, frame) for every frame decoded from stream.
+    """
+    for position, byte in enumerate(stream):
+        frame = decoder.push(byte)
+        while frame is not None:
+            # The frame starts the decoder's buffer, which ends at position
+            yield position + 1 - len(decoder.buf), frame
+            frame = decoder.next()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fuzz the frame decoder with a corrupted capture.")
+    parser.add_argument("capture", help="hex text capture, optionally .gz, or - for stdin")
+    parser.add_argument("--rate", type=float, default=0.001,
+                        help="probability per byte of each corruption kind (default 0.001)")
+    parser.add_argument("--rounds", type=int, default=10, help="corrupted streams to try")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    frames: List[bytes] = []
+    with open_capture(args.capture) as f:
+        for request, response in iter_frame_pairs(f):
+            frames += (request, response)
+    rng = random.Random(args.seed)
+
+    failures = 0
+    for round_no in range(args.rounds):
+        stream, intact = corrupt(frames, args.rate, rng)
+        decoder = vp.FrameDecoder()
+        decoded = dict(decode_with_offsets(decoder, stream))
+        undetected = [(offset, frame) for offset, frame in decoded.items() if intact.get(offset) != frame]
+        # Intact frames an undetected frame overlaps can not be recovered
+        covered = set()
+        for offset, frame in undetected:
+            covered.update(range(offset, offset + len(frame)))
+        lost = [offset for offset, frame in intact.items()
+                if decoded.get(offset) != frame and offset not in covered]
+        st = decoder.stats
+        print(f"Round {round_no}: frames={st.frames}/{len(frames)} intact={len(intact)} "
+              f"checksum_errors={st.checksum_errors} resyncs={st.resyncs} "
+              f"dropped_bytes={st.dropped_bytes} undetected={len(undetected)} lost={len(lost)}")
+        if lost:
+            failures += 1
+
+    print("OK" if failures == 0 else f"{failures} round(s) failed")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
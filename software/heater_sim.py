@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Host-side heater simulator for testing the VevorHeater component and the tools.
+
+Every simulated heater owns a pseudo-terminal. A controller (the firmware on a
+USB-serial bridge, a test script, ...) opens the printed slave device at 4800
+baud and sends short frames; the heater answers each valid one with a long
+frame that follows the VevorHeaterState state machine:
+
+    OFF -> GLOW_PLUG_PRE_HEAT -> IGNITED -> STABLE_COMBUSTION -> STOPPING_COOLING -> OFF
+
+Long frames are synthesized, or replayed from a capture grouped by state.
+Time can be compressed so a full start/stop cycle takes seconds.
+
+Usage:
+    python software/heater_sim.py --heaters 4 --time-factor 20
+    python software/heater_sim.py --replay docs/communication/log_start_running_stop.txt
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import pty
+import termios
+import tty
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import vevor_protocol as vp
+
+################################################################################
+# Constants
+################################################################################
+
+BAUD_RATE = 4800
+BITS_PER_BYTE = 10  # start + 8 data + stop
+
+# Time between the end of a controller frame and the start of the reply [s]
+REPLY_DELAY_S = 0.02
+
+################################################################################
+# Data Structures
+################################################################################
+
+@dataclass
+class Timing:
+    """
+    Simulated seconds spent in each timed state.
+    """
+    pre_heat: float = 30.0
+    ignition: float = 210.0
+    cooling: float = 175.0
+
+@dataclass
+class SimStats:
+    frames_received: int = 0
+    frames_sent: int = 0
+    bad_frames: int = 0
+
+################################################################################
+# Heater Model
+################################################################################
+
+class HeaterModel:
+    """
+    State machine of the main unit, driven by controller frames and a clock.
+    """
+
+    def __init__(self, timing: Timing, clock):
+        self.timing = timing
+        self.clock = clock
+        self.state = vp.HeaterState.OFF
+        self.level = 10
+        self.state_since = clock()
+
+    def _enter(self, state: vp.HeaterState) -> None:
+        self.state = state
+        self.state_since = self.clock()
+
+    def state_duration(self) -> float:
+        return self.clock() - self.state_since
+
+    def advance(self) -> None:
+        """
+        Apply time-based transitions.
+        """
+        elapsed = self.state_duration()
+        if self.state == vp.HeaterState.GLOW_PLUG_PRE_HEAT and elapsed >= self.timing.pre_heat:
+            self._enter(vp.HeaterState.IGNITED)
+        elif self.state == vp.HeaterState.IGNITED and elapsed >= self.timing.ignition:
+            self._enter(vp.HeaterState.STABLE_COMBUSTION)
+        elif self.state == vp.HeaterState.STOPPING_COOLING and elapsed >= self.timing.cooling:
+            self._enter(vp.HeaterState.OFF)
+
+    def handle_request(self, request: vp.ShortFrame) -> None:
+        """
+        Apply a controller frame.
+        """
+        self.advance()
+        if 1 <= request.level <= 10:
+            self.level = request.level
+        requested = request.requested_state
+        if requested in (vp.RequestedState.SET_ON, vp.RequestedState.RUNNING):
+            if self.state in (vp.HeaterState.OFF, vp.HeaterState.STOPPING_COOLING) \
+                    and requested == vp.RequestedState.SET_ON:
+                self._enter(vp.HeaterState.GLOW_PLUG_PRE_HEAT)
+        elif self.state in (vp.HeaterState.GLOW_PLUG_PRE_HEAT, vp.HeaterState.IGNITED,
+                            vp.HeaterState.STABLE_COMBUSTION):
+            self._enter(vp.HeaterState.STOPPING_COOLING)
+
+    def synthesize(self) -> bytes:
+        """
+        Build a plausible long frame for the current state.
+        """
+        state = self.state
+        running = state != vp.HeaterState.OFF
+        duration = min(int(self.state_duration()), 0xFFFF)
+        burning = state in (vp.HeaterState.IGNITED, vp.HeaterState.STABLE_COMBUSTION)
+        if state == vp.HeaterState.IGNITED:
+            ramp = min(duration / max(self.timing.ignition, 1.0), 1.0)
+        elif state == vp.HeaterState.STABLE_COMBUSTION:
+            ramp = 1.0
+        elif state == vp.HeaterState.STOPPING_COOLING:
+            ramp = max(1.0 - duration / max(self.timing.cooling, 1.0), 0.0)
+        else:
+            ramp = 0.0
+        fields = vp.LongFrame(
+            start=vp.START_BYTE,
+            device=vp.HEATER_ID,
+            command=0x02,
+            length=vp.LONG_LENGTH,
+            enabled=1 if running else 0,
+            state=int(state),
+            level=self.level,
+            error=0,
+            byte_8=0x03 if running else 0,
+            byte_9=0xFB if running else 0,
+            input_voltage=154,
+            glow_plug_current=9 if state == vp.HeaterState.GLOW_PLUG_PRE_HEAT else 0,
+            cooling_down=1 if state == vp.HeaterState.STOPPING_COOLING else 0,
+            fan_voltage=int(16 * ramp),
+            heat_exchanger_temp=int(100 + 1300 * ramp),
+            state_duration=duration,
+            pump_frequency=int(4 * self.level + 10) if burning else 0,
+            glow_plug_voltage=0,
+            glow_plug_current_2=0,
+            glow_plug_temperature=0,
+            glow_plug_misc=0,
+            fan_speed=int(1500 + 240 * self.level * ramp) if running else 0,
+            byte_46=35,
+            byte_47=4,
+            byte_48=17,
+            byte_49=35,
+            byte_51=40 if burning else 30,
+            glow_plug_related=0,
+            checksum=0,
+        )
+        frame = bytearray(vp.LONG_STRUCT.pack(*fields))
+        frame[-1] = vp.checksum(frame)
+        return bytes(frame)
+
+class ReplaySource:
+    """
+    Recorded long frames grouped by state, handed out round-robin.
+    State duration and level are patched to match the simulated heater.
+    """
+
+    def __init__(self, capture: str):
+        from plot_frame import open_capture, iter_frame_pairs
+
+        by_state: Dict[int, List[bytes]] = {}
+        with open_capture(capture) as f:
+            for _, response in iter_frame_pairs(f):
+                if vp.verify_checksum(response):
+                    by_state.setdefault(response[5], []).append(response)
+        self.cycles = {state: itertools.cycle(frames) for state, frames in by_state.items()}
+
+    def frame_for(self, model: HeaterModel) -> Optional[bytes]:
+        frames = self.cycles.get(int(model.state))
+        if frames is None:
+            return None
+        frame = bytearray(next(frames))
+        frame[6] = model.level
+        frame[20:22] = min(int(model.state_duration()), 0xFFFF).to_bytes(2, "big")
+        frame[-1] = vp.checksum(frame)
+        return bytes(frame)
+
+################################################################################
+# Serial Side
+################################################################################
+
+class SimulatedHeater:
+    """
+    One heater answering controller frames on its own pseudo-terminal.
+    """
+
+    def __init__(self, name: str, timing: Timing, time_factor: float,
+                 replay: Optional[ReplaySource] = None, echo: bool = False):
+        self.name = name
+        self.time_factor = time_factor
+        self.replay = replay
+        self.echo = echo
+        self.stats = SimStats()
+        loop = asyncio.get_running_loop()
+        self.model = HeaterModel(timing, lambda: loop.time() * time_factor)
+        self.master_fd, slave_fd = pty.openpty()
+        tty.setraw(slave_fd)
+        attrs = termios.tcgetattr(slave_fd)
+        attrs[4] = attrs[5] = termios.B4800
+        termios.tcsetattr(slave_fd, termios.TCSANOW, attrs)
+        self.slave_fd = slave_fd
+        self.port = os.ttyname(slave_fd)
+        self.decoder = vp.FrameDecoder()
+        self.replies: asyncio.Queue = asyncio.Queue()
+
+    def _on_readable(self) -> None:
+        try:
+            data = os.read(self.master_fd, 1024)
+        except OSError:
+            return
+        for frame in self.decoder.feed(data):
+            if frame[1] == vp.CONTROLLER_ID and len(frame) == vp.SHORT_FRAME_LEN:
+                self.stats.frames_received += 1
+                self.replies.put_nowait(frame)
+            else:
+                self.stats.bad_frames += 1
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self.master_fd, self._on_readable)
+        try:
+            while True:
+                request = await self.replies.get()
+                out = bytearray(request) if self.echo else bytearray()
+                self.model.handle_request(vp.decode_short(request))
+                self.model.advance()
+                response = self.replay.frame_for(self.model) if self.replay else None
+                out += response or self.model.synthesize()
+                await asyncio.sleep(REPLY_DELAY_S)
+                os.write(self.master_fd, out)
+                # Hold the line for as long as the frame takes at 4800 baud
+                await asyncio.sleep(len(out) * BITS_PER_BYTE / BAUD_RATE)
+                self.stats.frames_sent += 1
+        finally:
+            loop.remove_reader(self.master_fd)
+
+    def close(self) -> None:
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+################################################################################
+# Main Script
+################################################################################
+
+async def run_heaters(args) -> None:
+    timing = Timing(args.pre_heat, args.ignition, args.cooling)
+    replay = ReplaySource(args.replay) if args.replay else None
+    heaters = [SimulatedHeater(f"heater{i}", timing, args.time_factor, replay, args.echo)
+               for i in range(args.heaters)]
+    for heater in heaters:
+        print(f"{heater.name}: {heater.port}")
+    try:
+        await asyncio.gather(*(heater.run() for heater in heaters))
+    finally:
+        for heater in heaters:
+            st = heater.stats
+            ds = heater.decoder.stats
+            print(f"{heater.name}: received={st.frames_received}, sent={st.frames_sent}, "
+                  f"bad={st.bad_frames + ds.checksum_errors}, resyncs={ds.resyncs}, "
+                  f"state={heater.model.state.name}")
+            heater.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate Vevor heaters on pseudo-terminals.")
+    parser.add_argument("--heaters", type=int, default=1, help="number of simulated heaters")
+    parser.add_argument("--time-factor", type=float, default=1.0,
+                        help="simulated seconds per real second (default 1.0)")
+    parser.add_argument("--replay", metavar="CAPTURE",
+                        help="answer with long frames recorded in this capture")
+    parser.add_argument("--echo", action="store_true",
+                        help="echo controller frames back like the half-duplex bus does")
+    parser.add_argument("--pre-heat", type=float, default=Timing.pre_heat,
+                        help="simulated seconds of glow plug pre heat")
+    parser.add_argument("--ignition", type=float, default=Timing.ignition,
+                        help="simulated seconds from ignition to stable combustion")
+    parser.add_argument("--cooling", type=float, default=Timing.cooling,
+                        help="simulated seconds of cooling down")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(run_heaters(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Watch heater buses live: serial devices, pseudo-terminals or growing files.
+
+Every source is read without blocking and split into frames by
+vevor_protocol.FrameDecoder; growing hex text captures are followed line by
+line. Each long frame is folded into per-offset RunningStats and a ring
+buffer of the last --window frames, a constant amount of work per frame,
+and the offsets whose value differs from the previous frame are reported as
+they change (the state duration and checksum, which change every frame, are
+left out unless asked for).
+
+With --plot, a rolling window of chosen fields is drawn per source and the
+title of a field that just changed turns red. The window is redrawn once per
+--refresh from the ring buffer, independent of how long the stream runs.
+
+Usage:
+    python software/live_tail.py /dev/ttyUSB0
+    python software/live_tail.py /dev/pts/3 /dev/pts/4 --plot
+    python software/live_tail.py capture.txt --from-start --ignore
+"""
+
+import argparse
+import os
+import select
+import sys
+import termios
+import time
+import tty
+from typing import List, Optional
+
+import numpy as np
+
+import vevor_protocol as vp
+from plot_frame import RunningStats, compute_stats, hexstr_to_bytes
+from vevor_protocol.bulk import field_column
+from vevor_protocol.fields import FIELDS_BY_KEY, FIELDS_BY_OFFSET
+
+################################################################################
+# Constants
+################################################################################
+
+BAUD_RATES = {4800: termios.B4800, 9600: termios.B9600, 19200: termios.B19200, 115200: termios.B115200}
+READ_SIZE = 4096
+# Seconds between polls of sources that cannot be waited on (files)
+POLL_S = 0.05
+
+DEFAULT_WINDOW = 600
+# Change every long frame: state duration, checksum
+DEFAULT_IGNORED = (20, 21, vp.LONG_FRAME_LEN - 1)
+DEFAULT_PLOT_FIELDS = ("state", "heat_exchanger_temp", "pump_frequency", "fan_speed", "input_voltage",
+                       "glow_plug_current")
+
+################################################################################
+# Statistics
+################################################################################
+
+class LiveStats:
+    """
+    Statistics of the long frames of one stream, updated frame by frame at
+    constant cost: running per-offset statistics, the last window frames in
+    a ring buffer, and the frame number of every offset's last change.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.running = RunningStats(vp.LONG_FRAME_LEN)
+        self.ring = np.zeros((window, vp.LONG_FRAME_LEN), dtype=np.uint8)
+        self.count = 0
+        self.last: Optional[np.ndarray] = None
+        self.changed_at = np.full(vp.LONG_FRAME_LEN, -1, dtype=np.int64)
+
+    def add(self, frame: bytes) -> np.ndarray:
+        """
+        Fold in one long frame. Returns the offsets whose value changed.
+        """
+        values = np.frombuffer(frame, dtype=np.uint8)
+        self.running.update(values[np.newaxis, :])
+        self.ring[self.count % len(self.ring)] = values
+        changed = np.flatnonzero(values != self.last) if self.last is not None else np.empty(0, dtype=np.intp)
+        self.changed_at[changed] = self.count
+        self.last = values
+        self.count += 1
+        return changed
+
+    def window(self) -> np.ndarray:
+        """
+        The frames in the ring buffer, oldest first.
+        """
+        size = len(self.ring)
+        if self.count <= size:
+            return self.ring[:self.count]
+        split = self.count % size
+        return np.concatenate([self.ring[split:], self.ring[:split]])
+
+################################################################################
+# Sources
+################################################################################
+
+class Source:
+    """
+    One bus to watch. Subclasses read whatever arrived since the last poll
+    without blocking and pass complete frames to handle_frame.
+    """
+
+    fd: Optional[int] = None  # set if select() can wait on the source
+
+    def __init__(self, path: str, window: int, ignored: List[int], quiet: bool):
+        self.name = path
+        self.decoder = vp.FrameDecoder()
+        self.long = LiveStats(window)
+        self.short_frames = 0
+        self.ignored = np.asarray(ignored, dtype=np.intp)
+        self.quiet = quiet
+
+    def poll(self) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def feed_bytes(self, data: bytes) -> None:
+        for frame in self.decoder.feed(data):
+            self.handle_frame(frame)
+
+    def handle_frame(self, frame: bytes) -> None:
+        if len(frame) == vp.SHORT_FRAME_LEN:
+            self.short_frames += 1
+            return
+        if len(frame) != vp.LONG_FRAME_LEN:
+            return
+        previous = self.long.last
+        changed = self.long.add(frame)
+        changed = changed[~np.isin(changed, self.ignored)]
+        if len(changed) and previous is not None and not self.quiet:
+            print(self.describe_changes(frame, previous, changed), flush=True)
+
+    def describe_changes(self, frame: bytes, previous: np.ndarray, changed: np.ndarray) -> str:
+        try:
+            state = vp.HeaterState(frame[5]).name
+        except ValueError:
+            state = f"state {frame[5]}"
+        parts = []
+        for offset in changed:
+            field = FIELDS_BY_OFFSET.get(int(offset))
+            name = f" {field.key}" if field is not None else ""
+            parts.append(f"{offset}{name}: {previous[offset]}->{frame[offset]}")
+        return f"{self.name} #{self.long.count} {state}: " + ", ".join(parts)
+
+class SerialSource(Source):
+    """
+    Serial device or pseudo-terminal, switched to raw mode at the bus baud rate.
+    """
+
+    def __init__(self, path: str, baud: int, *args):
+        super().__init__(path, *args)
+        self.fd = os.open(path, os.O_RDONLY | os.O_NOCTTY | os.O_NONBLOCK)
+        tty.setraw(self.fd)
+        attrs = termios.tcgetattr(self.fd)
+        attrs[4] = attrs[5] = BAUD_RATES[baud]
+        termios.tcsetattr(self.fd, termios.TCSANOW, attrs)
+
+    def poll(self) -> None:
+        if self.fd is None:
+            return
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            data, reason = b"", e.strerror
+        else:
+            reason = "hung up"
+        if not data:
+            # Unplugged adapter or closed pseudo-terminal: stop watching it
+            print(f"{self.name}: {reason}, no longer read", file=sys.stderr)
+            self.close()
+            return
+        self.feed_bytes(data)
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+class FileSource(Source):
+    """
+    Growing file, followed like tail -f: hex text captures (.txt) one frame
+    per line, anything else as raw bus bytes.
+    """
+
+    def __init__(self, path: str, from_start: bool, *args):
+        super().__init__(path, *args)
+        self.text = path.endswith(".txt")
+        self.file = open(path, "rb")
+        if not from_start:
+            self.file.seek(0, os.SEEK_END)
+        self.partial = b""
+
+    def poll(self) -> None:
+        data = self.file.read()
+        if not data:
+            return
+        if not self.text:
+            self.feed_bytes(data)
+            return
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()  # incomplete until its newline arrives
+        for line in lines:
+            try:
+                frame = hexstr_to_bytes(line.decode("ascii"))
+            except (UnicodeDecodeError, ValueError):
+                self.decoder.stats.dropped_bytes += len(line)
+                continue
+            if not frame:
+                continue
+            if vp.verify_checksum(frame):
+                self.decoder.stats.frames += 1
+                self.handle_frame(frame)
+            else:
+                self.decoder.stats.checksum_errors += 1
+
+    def close(self) -> None:
+        self.file.close()
+
+def open_source(path: str, args) -> Source:
+    common = (args.window, args.ignore, args.quiet)
+    if os.path.exists(path) and not os.path.isfile(path):
+        return SerialSource(path, args.baud, *common)
+    return FileSource(path, args.from_start, *common)
+
+def pump(sources: List[Source], timeout: float) -> None:
+    """
+    Wait up to timeout for data and process whatever arrived on any source.
+    """
+    fds = [source.fd for source in sources if source.fd is not None]
+    waits_on_files = any(isinstance(source, FileSource) for source in sources)
+    if fds:
+        select.select(fds, [], [], min(timeout, POLL_S) if waits_on_files else timeout)
+    else:
+        time.sleep(min(timeout, POLL_S))
+    for source in sources:
+        source.poll()
+
+################################################################################
+# Display
+################################################################################
+
+class LivePlot:
+    """
+    Rolling window of some fields, one column of axes per source.
+    """
+
+    def __init__(self, sources: List[Source], keys: List[str]):
+        import matplotlib.pyplot as plt
+
+        self.plt = plt
+        self.sources = sources
+        self.keys = keys
+        self.fig, axes = plt.subplots(nrows=len(keys), ncols=len(sources), sharex="col", squeeze=False,
+                                      figsize=(6 * len(sources), 1.8 * len(keys)))
+        self.axes = axes
+        self.lines = [[ax.plot([], [])[0] for ax in row] for row in axes]
+        for col, source in enumerate(sources):
+            axes[0][col].set_title(source.name)
+            axes[-1][col].set_xlabel("Frame")
+        for row, key in enumerate(keys):
+            axes[row][0].set_ylabel(FIELDS_BY_KEY[key].unit or "", fontsize=8)
+            for ax in axes[row]:
+                ax.grid(True)
+        self.fig.tight_layout()
+
+    def update(self) -> None:
+        for col, source in enumerate(self.sources):
+            stats = source.long
+            frames = stats.window()
+            if not len(frames):
+                continue
+            x = np.arange(stats.count - len(frames), stats.count)
+            for row, key in enumerate(self.keys):
+                field = FIELDS_BY_KEY[key]
+                ax = self.axes[row][col]
+                self.lines[row][col].set_data(x, field_column(frames, key) * field.scale)
+                ax.relim()
+                ax.autoscale_view()
+                just_changed = stats.changed_at[field.offset:field.offset + field.width].max() == stats.count - 1
+                ax.set_title(field.name, fontsize=8, color="red" if just_changed else "black", loc="right")
+        self.fig.canvas.draw_idle()
+
+    def run(self, sources: List[Source], refresh: float) -> None:
+        # The GUI timer drives the sources, so reading never waits on the plot
+        timer = self.fig.canvas.new_timer(interval=int(POLL_S * 1000))
+        last_draw = [0.0]
+
+        def tick():
+            pump(sources, 0.0)
+            now = time.monotonic()
+            if now - last_draw[0] >= refresh:
+                last_draw[0] = now
+                self.update()
+
+        timer.add_callback(tick)
+        timer.start()
+        self.plt.show()
+
+def print_stats(source: Source) -> None:
+    ds = source.decoder.stats
+    print(f"\n======== {source.name}: {source.long.count} long frames, {source.short_frames} short frames, "
+          f"bad_frames={ds.checksum_errors}, resyncs={ds.resyncs}, dropped_bytes={ds.dropped_bytes} ========")
+    for offset, st in enumerate(compute_stats(source.long.running)):
+        if not st.count or st.min == st.max:
+            continue
+        field = FIELDS_BY_OFFSET.get(offset)
+        name = f"  {field.name}" if field is not None else ""
+        print(f"Offset {offset}: range=({st.min},{st.max}), mean={st.mean:.1f}, stdev={st.stdev:.1f}{name}")
+
+################################################################################
+# Main Script
+################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Follow heater buses live and report changing offsets.")
+    parser.add_argument("sources", nargs="+",
+                        help="serial devices, pseudo-terminals, or growing files (.txt hex text, else raw bytes)")
+    parser.add_argument("--baud", type=int, choices=sorted(BAUD_RATES), default=4800,
+                        help="serial baud rate (default 4800)")
+    parser.add_argument("--from-start", action="store_true", help="read files from the beginning, not the end")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW,
+                        help=f"frames kept for the plot (default {DEFAULT_WINDOW})")
+    parser.add_argument("--ignore", type=int, nargs="*", default=list(DEFAULT_IGNORED),
+                        help="offsets not reported when they change (default: state duration and checksum); "
+                             "give no value to report all")
+    parser.add_argument("--quiet", action="store_true", help="do not print changes")
+    parser.add_argument("--plot", action="store_true", help="show a rolling plot")
+    parser.add_argument("--fields", nargs="+", choices=list(FIELDS_BY_KEY), default=list(DEFAULT_PLOT_FIELDS),
+                        metavar="FIELD", help=f"long frame fields to plot: {', '.join(FIELDS_BY_KEY)}")
+    parser.add_argument("--refresh", type=float, default=1.0, help="seconds between plot redraws (default 1)")
+    args = parser.parse_args(argv)
+
+    sources = []
+    try:
+        for path in args.sources:
+            sources.append(open_source(path, args))
+    except OSError as e:
+        print(f"Cannot open {e.filename}: {e.strerror}", file=sys.stderr)
+        for source in sources:
+            source.close()
+        sys.exit(1)
+
+    try:
+        if args.plot:
+            LivePlot(sources, args.fields).run(sources, args.refresh)
+        else:
+            while True:
+                pump(sources, 1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for source in sources:
+            print_stats(source)
+            source.close()
+
+if __name__ == "__main__":
+    main()
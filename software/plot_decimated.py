@@ -0,0 +1,317 @@
+"""
+Min/max decimated plots of long captures, used by plot_frame.py.
+
+Handing Matplotlib every frame makes a day of data at one frame per second
+take minutes to draw. Here each line is reduced to the minimum and maximum
+of the frames behind every pixel column before it is drawn, so spikes stay
+visible at any zoom. The bins come from a min/max pyramid (BASE_BIN * 2**k
+frames per bin) built once per line: a redraw, after zooming, panning or
+choosing another field, reads only the bins in view, so its cost follows
+the plot width and not the capture length.
+
+FieldBrowser shows one PlotPanel at a time in a single figure with a field
+selector. save_report renders all panels headlessly to PNG or to a
+self-contained HTML page, for CI reports.
+
+Usage:
+    python software/plot_frame.py capture.vcap
+    python software/plot_frame.py capture.vcap -o report.png
+    python software/plot_frame.py capture.vcap -o report.html
+"""
+
+import base64
+import html
+import io
+import math
+from dataclasses import dataclass
+from functools import cached_property
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import numpy as np
+
+# Matplotlib is imported where a plot is drawn: importing it takes longer
+# than most statistics-only runs of the tools
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+################################################################################
+# Constants
+################################################################################
+
+# Frames per bin of the finest pyramid level; below this, frames are drawn as they are
+BASE_BIN = 8
+# Pyramid levels stop at this many bins
+MIN_LEVEL_BINS = 256
+# Pixel columns of an exported panel
+REPORT_COLUMNS = 1500
+REPORT_DPI = 100
+REPORT_SUFFIXES = (".png", ".html")
+
+################################################################################
+# Data Structures
+################################################################################
+
+class MinMaxPyramid:
+    """
+    Per-bin minimum and maximum of one series, at bin sizes of
+    BASE_BIN * 2**k frames. Takes about half the memory of the series for
+    uint8 values, as much for wider types.
+    """
+
+    def __init__(self, values: np.ndarray):
+        self.values = np.ascontiguousarray(values)
+        # (frames per bin, minimums, maximums), finest first
+        self.levels: List[Tuple[int, np.ndarray, np.ndarray]] = []
+        size = BASE_BIN
+        mins = maxs = self.values
+        step = BASE_BIN
+        while len(mins) > 1:
+            starts = np.arange(0, len(mins), step)
+            mins = np.minimum.reduceat(mins, starts)
+            maxs = np.maximum.reduceat(maxs, starts)
+            self.levels.append((size, mins, maxs))
+            if len(mins) <= MIN_LEVEL_BINS:
+                break
+            size *= 2
+            step = 2
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def range(self) -> Tuple[int, int]:
+        """
+        Smallest and largest value of the whole series.
+        """
+        if not self.levels:
+            return (int(self.values.min()), int(self.values.max())) if len(self.values) else (0, 0)
+        _, mins, maxs = self.levels[-1]
+        return int(mins.min()), int(maxs.max())
+
+    def envelope(self, start: float, stop: float, columns: int) -> Tuple[np.ndarray, np.ndarray, bool]:
+        """
+        Points to draw frames [start, stop] on a plot columns pixels wide:
+        x (frame ID) and y arrays of at most 4 * columns points, and whether
+        they are the frames themselves rather than alternating bin minimums
+        and maximums.
+        """
+        first = max(0, int(math.floor(start)))
+        last = min(len(self.values), int(math.ceil(stop)) + 1)
+        if last <= first:
+            return np.empty(0), np.empty(0), True
+        frames_per_column = (last - first) / max(columns, 1)
+        if frames_per_column < BASE_BIN or not self.levels:
+            return np.arange(first, last), self.values[first:last], True
+
+        # Coarsest level with at least one bin per column
+        size, mins, maxs = self.levels[0]
+        for level in self.levels[1:]:
+            if level[0] > frames_per_column:
+                break
+            size, mins, maxs = level
+        bins = slice(first // size, -(-last // size))
+        centers = np.arange(bins.start, bins.stop) * size + (size - 1) / 2
+        x = np.repeat(np.minimum(centers, len(self.values) - 1), 2)
+        y = np.empty(len(x), dtype=mins.dtype)
+        y[0::2] = mins[bins]
+        y[1::2] = maxs[bins]
+        return x, y, False
+
+@dataclass
+class PlotPanel:
+    """
+    One selectable plot: a title, a y axis label and one or more lines of
+    equal length, (label, values) with one value per frame.
+    """
+    title: str
+    ylabel: str
+    lines: List[Tuple[str, np.ndarray]]
+
+    @cached_property
+    def pyramids(self) -> List[MinMaxPyramid]:
+        return [MinMaxPyramid(values) for _, values in self.lines]
+
+    @property
+    def frames(self) -> int:
+        return len(self.lines[0][1]) if self.lines else 0
+
+    @property
+    def range(self) -> Tuple[int, int]:
+        ranges = [pyramid.range for pyramid in self.pyramids]
+        return min(lo for lo, _ in ranges), max(hi for _, hi in ranges)
+
+################################################################################
+# Drawing
+################################################################################
+
+def draw_panel(ax, panel: PlotPanel, columns: int):
+    """
+    Draw a panel over its whole frame range into an empty axes.
+    Returns the Line2D of every panel line, for update_lines.
+    """
+    artists = [ax.plot([], [], label=label)[0] for label, _ in panel.lines]
+    lo, hi = panel.range
+    margin = max((hi - lo) * 0.05, 0.5)
+    ax.set_xlim(0, max(panel.frames - 1, 1))
+    ax.set_ylim(lo - margin, hi + margin)
+    ax.set_ylabel(f"{panel.ylabel}\nRange: {lo}-{hi}")
+    ax.grid(True)
+    ax.legend(loc="upper right")
+    update_lines(ax, panel, artists, columns)
+    return artists
+
+def update_lines(ax, panel: PlotPanel, artists, columns: int) -> None:
+    """
+    Re-decimate the panel lines to the x range currently in view.
+    """
+    start, stop = ax.get_xlim()
+    for artist, pyramid in zip(artists, panel.pyramids):
+        x, y, raw = pyramid.envelope(start, stop, columns)
+        artist.set_data(x, y)
+        artist.set_marker("." if raw else "None")
+
+class FieldBrowser:
+    """
+    Interactive figure showing one PlotPanel at a time. The field is chosen
+    with the selector on the left or the up/down keys; zooming and panning
+    re-decimate the lines to the range in view.
+    """
+
+    def __init__(self, panels: List[PlotPanel], title: str):
+        import matplotlib.pyplot as plt
+        from matplotlib.widgets import RadioButtons
+
+        self.panels = panels
+        self.index = 0
+        self.artists = []
+        self.fig = plt.figure(figsize=(15, 7))
+        self.fig.suptitle(title, fontsize=16)
+        self.ax = self.fig.add_axes([0.27, 0.1, 0.7, 0.8])
+        self.ax.set_xlabel("Frame ID")
+        selector_ax = self.fig.add_axes([0.01, 0.05, 0.17, 0.9], frameon=False)
+        self.selector = RadioButtons(selector_ax, [panel.title for panel in panels])
+        for text in self.selector.labels:
+            text.set_fontsize(8)
+        self.selector.on_clicked(self._on_select)
+        self.ax.callbacks.connect("xlim_changed", self._on_xlim_changed)
+        self.fig.canvas.mpl_connect("resize_event", self._on_xlim_changed)
+        self.fig.canvas.mpl_connect("key_press_event", self._on_key)
+        self.show_panel(0)
+
+    def columns(self) -> int:
+        return max(int(self.ax.get_window_extent().width), 1)
+
+    def show_panel(self, index: int) -> None:
+        self.index = index
+        for artist in self.artists:
+            artist.remove()
+        legend = self.ax.get_legend()
+        if legend is not None:
+            legend.remove()
+        panel = self.panels[index]
+        self.ax.set_title(panel.title)
+        self.artists = draw_panel(self.ax, panel, self.columns())
+        self.fig.canvas.draw_idle()
+
+    def _on_select(self, label: str) -> None:
+        self.show_panel([panel.title for panel in self.panels].index(label))
+
+    def _on_key(self, event) -> None:
+        step = {"up": -1, "down": 1}.get(event.key)
+        if step is not None:
+            # Updates the radio buttons, whose callback shows the panel
+            self.selector.set_active((self.index + step) % len(self.panels))
+
+    def _on_xlim_changed(self, _event) -> None:
+        if self.artists:
+            update_lines(self.ax, self.panels[self.index], self.artists, self.columns())
+            self.fig.canvas.draw_idle()
+
+################################################################################
+# Headless Reports
+################################################################################
+
+def render_panel_png(panel: PlotPanel, columns: int = REPORT_COLUMNS, title: Optional[str] = None) -> bytes:
+    """
+    PNG of a single panel, columns pixels wide.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(columns / REPORT_DPI, 3), dpi=REPORT_DPI)
+    ax = fig.add_subplot()
+    ax.set_title(title or panel.title)
+    ax.set_xlabel("Frame ID")
+    draw_panel(ax, panel, _plot_columns(fig, ax))
+    fig.tight_layout()
+    out = io.BytesIO()
+    fig.savefig(out, format="png")
+    return out.getvalue()
+
+def render_png(panels: List[PlotPanel], title: str, columns: int = REPORT_COLUMNS) -> bytes:
+    """
+    PNG with all panels stacked, sharing the frame axis.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(columns / REPORT_DPI, 3 * len(panels)), dpi=REPORT_DPI)
+    axes = fig.subplots(nrows=len(panels), ncols=1, sharex=True, squeeze=False)[:, 0]
+    fig.suptitle(title, fontsize=16)
+    axes[-1].set_xlabel("Frame ID")
+    for ax, panel in zip(axes, panels):
+        ax.set_title(panel.title)
+        draw_panel(ax, panel, _plot_columns(fig, ax))
+    fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+    out = io.BytesIO()
+    fig.savefig(out, format="png")
+    return out.getvalue()
+
+def render_html(panels: List[PlotPanel], title: str, columns: int = REPORT_COLUMNS) -> str:
+    """
+    Self-contained HTML page with one embedded PNG per panel and a field
+    selector; without JavaScript all panels are shown.
+    """
+    options = []
+    images = []
+    for i, panel in enumerate(panels):
+        png = base64.b64encode(render_panel_png(panel, columns)).decode("ascii")
+        name = html.escape(panel.title)
+        options.append(f'<option value="panel-{i}">{name}</option>')
+        images.append(f'<figure id="panel-{i}" class="panel"><img alt="{name}" '
+                      f'src="data:image/png;base64,{png}"></figure>')
+    return "\n".join([
+        "<!DOCTYPE html>",
+        '<html><head><meta charset="utf-8">',
+        f"<title>{html.escape(title)}</title>",
+        "<style>body{font-family:sans-serif} img{max-width:100%} figure{margin:0}</style>",
+        "</head><body>",
+        f"<h1>{html.escape(title)}</h1>",
+        '<label>Field <select id="field"><option value="">all</option>',
+        *options,
+        "</select></label>",
+        *images,
+        "<script>",
+        "document.getElementById('field').addEventListener('change', function (e) {",
+        "  document.querySelectorAll('.panel').forEach(function (p) {",
+        "    p.style.display = !e.target.value || p.id === e.target.value ? '' : 'none';",
+        "  });",
+        "});",
+        "</script>",
+        "</body></html>",
+        "",
+    ])
+
+def save_report(panels: List[PlotPanel], path: str, title: str) -> None:
+    """
+    Write all panels to a .png or .html file, without a display.
+    """
+    if path.endswith(".html"):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(render_html(panels, title))
+    elif path.endswith(".png"):
+        with open(path, "wb") as f:
+            f.write(render_png(panels, title))
+    else:
+        raise ValueError(f"unsupported report format {path!r}, expected one of {', '.join(REPORT_SUFFIXES)}")
+
+def _plot_columns(fig: "Figure", ax) -> int:
+    return max(int(ax.get_position().width * fig.get_figwidth() * fig.dpi), 1)
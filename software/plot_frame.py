@@ -1,23 +1,41 @@
 #!/usr/bin/env python3
 
+import argparse
+import gzip
 import math
-import matplotlib.pyplot as plt
-from statistics import mean, stdev
+import os
+import sys
+import numpy as np
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import List
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from vevor_protocol import SHORT_FRAME_LEN, LONG_FRAME_LEN, DecoderStats
+from vevor_protocol.bulk import checksums_ok
+from vevor_protocol.fields import LONG_FRAME_FIELDS, field_label
+from plot_decimated import REPORT_SUFFIXES, FieldBrowser, PlotPanel, save_report
 
 ################################################################################
-# Data Structures
+# Constants
 ################################################################################
 
-@dataclass
-class Frame:
-    payload: bytes
+# Cycles decoded per streamed chunk; bounds memory use of the reader
+CHUNK_CYCLES = 65536
+# Analysed when no capture is given, wherever the script is started from
+SAMPLE_CAPTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                              "docs", "communication", "log_start_running_stop.txt")
+
+################################################################################
+# Data Structures
+################################################################################
 
 @dataclass
-class Cycle:
-    request: Frame
-    response: Frame
+class FrameMatrices:
+    """
+    All frames of a capture, one row per request/response cycle.
+    """
+    request: np.ndarray   # shape (cycles, SHORT_FRAME_LEN), dtype uint8
+    response: np.ndarray  # shape (cycles, LONG_FRAME_LEN), dtype uint8
 
 @dataclass
 class Stats:
@@ -42,107 +60,314 @@ def hexstr_to_bytes(hexstr_with_spaces: str) -> bytes:
     parts = hexstr_with_spaces.strip().split()
     return bytes.fromhex("".join(parts))
 
-def big_endian_16(high: int, low: int) -> int:
+def big_endian_16(high, low):
     """
     Combine two bytes (high, low) into a 16-bit integer.
+    Works on plain ints as well as on whole NumPy columns.
     """
+    if isinstance(high, np.ndarray):
+        high = high.astype(np.uint16)
     return (high << 8) | low
 
-def compute_stats(values: List[int]) -> Stats:
+def pairs_16_matrix(matrix: np.ndarray) -> np.ndarray:
     """
-    Compute statistics for a list of numeric values.
+    Big-endian 16-bit values for every adjacent byte pair of every row.
+    Column i holds the pair (i, i+1).
     """
-    if not values:
-        return Stats(0, 0, 0, 0.0, 0.0)
-    mn = min(values)
-    mx = max(values)
-    avg = mean(values)
-    sd = stdev(values) if len(values) > 1 else 0.0
-    return Stats(count=len(values), min=mn, max=mx, mean=avg, stdev=sd)
-
-################################################################################
-# Main Script
-################################################################################
+    return big_endian_16(matrix[:, :-1], matrix[:, 1:])
 
-def main():
-    # Change this to your TXT name or path
-    txt_filename = "docs/communication/log_start_running_stop.txt"
-
-    # List to store all cycles in order
-    cycles: List[Cycle] = []
-
-    ########################################################################
-    # 1) Load TXT, filter and associate frames
-    ########################################################################
-    try:
-        with open(txt_filename, 'r') as f:
-            lines = f.readlines()
-    except FileNotFoundError:
-        print(f"File {txt_filename} not found!")
-        return
-
-    # Ensure that the number of lines is even (pairs of request and response)
-    if len(lines) % 2 != 0:
-        print("Warning: The number of lines in the TXT file is not even. "
-              "The last line will be ignored.")
-
-    # Process lines in pairs
-    for i in range(0, len(lines) - 1, 2):
-        request_line = lines[i].strip()
-        response_line = lines[i + 1].strip()
+@contextmanager
+def open_capture(path: str) -> Iterator[TextIO]:
+    """
+    Open a hex text capture for reading.
+    "-" reads from stdin, names ending in ".gz" are decompressed on the fly.
+    """
+    if path == "-":
+        yield sys.stdin
+    elif path.endswith(".gz"):
+        with gzip.open(path, "rt") as f:
+            yield f
+    else:
+        with open(path, "r") as f:
+            yield f
+
+def iter_frame_pairs(lines: Iterable[str], errors: DecoderStats = None) -> Iterator[Tuple[bytes, bytes]]:
+    """
+    Lazily decode request/response line pairs into raw frames.
+    Pairs with invalid hex data or unexpected frame sizes are skipped; each
+    counts as a resync in errors, and its bytes as dropped.
+    """
+    lines = iter(lines)
+    line_no = 0
+    for request_line in lines:
+        response_line = next(lines, None)
+        line_no += 2
+        if response_line is None:
+            print("Warning: The number of lines in the TXT file is not even. "
+                  "The last line will be ignored.")
+            return
 
         try:
             request_bytes = hexstr_to_bytes(request_line)
             response_bytes = hexstr_to_bytes(response_line)
         except ValueError:
             # Skip pairs with invalid hex data
-            print(f"Skipping invalid pair at lines {i+1} and {i+2}.")
+            print(f"Skipping invalid pair at lines {line_no-1} and {line_no}.")
+            _count_skipped(errors, len(request_line.split()) + len(response_line.split()))
             continue
 
-        # Create Frame objects for request and response
-        request_frame = Frame(payload=request_bytes)
-        response_frame = Frame(payload=response_bytes)
+        if len(request_bytes) != SHORT_FRAME_LEN or len(response_bytes) != LONG_FRAME_LEN:
+            print(f"Skipping pair with unexpected frame size at lines {line_no-1} and {line_no}.")
+            _count_skipped(errors, len(request_bytes) + len(response_bytes))
+            continue
+
+        yield request_bytes, response_bytes
+
+def _count_skipped(errors: DecoderStats, dropped_bytes: int) -> None:
+    if errors is not None:
+        errors.resyncs += 1
+        errors.dropped_bytes += dropped_bytes
+
+def iter_frame_chunks(lines: Iterable[str], chunk_size: int = CHUNK_CYCLES,
+                      errors: DecoderStats = None) -> Iterator[FrameMatrices]:
+    """
+    Lazily decode a capture into FrameMatrices of at most chunk_size cycles.
+    Memory use is bounded by the chunk size, not by the capture length.
+    """
+    request_buf = bytearray()
+    response_buf = bytearray()
+    count = 0
+    for request_bytes, response_bytes in iter_frame_pairs(lines, errors):
+        request_buf += request_bytes
+        response_buf += response_bytes
+        count += 1
+        if count == chunk_size:
+            yield _to_matrices(request_buf, response_buf)
+            request_buf = bytearray()
+            response_buf = bytearray()
+            count = 0
+    if count:
+        yield _to_matrices(request_buf, response_buf)
+
+@contextmanager
+def iter_capture_chunks(path: str, start: float = None, end: float = None,
+                        errors: DecoderStats = None) -> Iterator[Iterator[FrameMatrices]]:
+    """
+    Open any supported capture and yield an iterator over its FrameMatrices.
+    Binary captures are memory-mapped and can be restricted to [start, end).
+    """
+    from capture_file import CAPTURE_SUFFIX, FRAME_STREAM_SUFFIX, CaptureFile, read_frame_stream
+
+    if path.endswith(CAPTURE_SUFFIX):
+        yield CaptureFile(path).iter_chunks(start, end)
+    elif path.endswith(FRAME_STREAM_SUFFIX):
+        stream = read_frame_stream(path)
+        keep = np.ones(len(stream.timestamps), dtype=bool)
+        if start is not None:
+            keep &= stream.timestamps >= start
+        if end is not None:
+            keep &= stream.timestamps < end
+        yield iter([FrameMatrices(stream.frames.request[keep], stream.frames.response[keep])])
+    else:
+        with open_capture(path) as f:
+            yield iter_frame_chunks(f, errors=errors)
+
+def _to_matrices(request_buf: bytearray, response_buf: bytearray) -> FrameMatrices:
+    return FrameMatrices(
+        request=np.frombuffer(request_buf, dtype=np.uint8).reshape(-1, SHORT_FRAME_LEN),
+        response=np.frombuffer(response_buf, dtype=np.uint8).reshape(-1, LONG_FRAME_LEN),
+    )
+
+def load_frame_matrices(lines: Iterable[str]) -> FrameMatrices:
+    """
+    Parse a whole capture into two fixed-width uint8 matrices.
+    """
+    chunks = list(iter_frame_chunks(lines))
+    if not chunks:
+        return _to_matrices(bytearray(), bytearray())
+    return FrameMatrices(
+        request=np.concatenate([c.request for c in chunks]),
+        response=np.concatenate([c.response for c in chunks]),
+    )
+
+class RunningStats:
+    """
+    Online per-offset statistics with constant memory.
+    Mean and variance follow Welford's algorithm, merged a whole chunk of
+    rows at a time (Chan et al.) so updates stay vectorized.
+    """
+
+    def __init__(self, width: int):
+        self.count = 0
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+        self.min = np.full(width, np.iinfo(np.int64).max, dtype=np.int64)
+        self.max = np.full(width, np.iinfo(np.int64).min, dtype=np.int64)
+
+    def update(self, matrix: np.ndarray) -> None:
+        """
+        Fold a (rows, width) matrix into the running statistics.
+        """
+        if matrix.shape[0] == 0:
+            return
+        values = matrix.astype(np.float64)
+        batch = RunningStats(matrix.shape[1])
+        batch.count = matrix.shape[0]
+        batch.mean = values.mean(axis=0)
+        batch.m2 = ((values - batch.mean) ** 2).sum(axis=0)
+        batch.min = matrix.min(axis=0).astype(np.int64)
+        batch.max = matrix.max(axis=0).astype(np.int64)
+        self.merge(batch)
+
+    def merge(self, other: "RunningStats") -> None:
+        """
+        Fold the statistics of other rows into these. Merging is associative,
+        so partial statistics can be combined in any grouping.
+        """
+        n_b = other.count
+        if n_b == 0:
+            return
+        n_a = self.count
+        n = n_a + n_b
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (n_b / n)
+        self.m2 = self.m2 + other.m2 + delta ** 2 * (n_a * n_b / n)
+        self.count = n
+        np.minimum(self.min, other.min, out=self.min)
+        np.maximum(self.max, other.max, out=self.max)
+
+def drop_bad_checksums(chunk: FrameMatrices, errors: DecoderStats) -> FrameMatrices:
+    """
+    Remove cycles where either frame fails its checksum, counting them in errors.
+    """
+    request_ok = checksums_ok(chunk.request)
+    response_ok = checksums_ok(chunk.response)
+    errors.frames += 2 * len(request_ok)
+    errors.checksum_errors += int(len(request_ok) - request_ok.sum() + len(response_ok) - response_ok.sum())
+    valid = request_ok & response_ok
+    if valid.all():
+        return chunk
+    return FrameMatrices(request=chunk.request[valid], response=chunk.response[valid])
+
+def compute_stats(running: RunningStats) -> List[Stats]:
+    """
+    Compute statistics for every offset tracked by a RunningStats.
+    """
+    if running.count == 0:
+        return [Stats(0, 0, 0, 0.0, 0.0) for _ in range(len(running.mean))]
+    if running.count > 1:
+        sds = np.sqrt(running.m2 / (running.count - 1))
+    else:
+        sds = np.zeros(len(running.mean))
+    return [Stats(count=running.count, min=int(mn), max=int(mx), mean=float(avg), stdev=float(sd))
+            for mn, mx, avg, sd in zip(running.min, running.max, running.mean, sds)]
+
+def build_panels(single_bytes: np.ndarray) -> List[PlotPanel]:
+    """
+    The plots of a (cycles, offsets) matrix of analysed frames: one panel
+    per single byte, combined group and 16-bit pair worth plotting.
+    """
+    pairs_16 = pairs_16_matrix(single_bytes)
+
+    # Frame layouts with the meaning of every offset are documented in
+    # vevor_protocol/frames.py next to SHORT_STRUCT and LONG_STRUCT; the
+    # fields published as sensors come from vevor_protocol.fields.
+
+    offsets_to_skip = [4, 7, 8,9,10, 12, 13, 22,30,51,54,55, 16,17,20,21,28,29,52,53,0,1,2,3,18,19,31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,49,50]
+
+    # 16-bit pairs to plot: the two-byte long frame fields
+    pairs_to_plot = [field.offset for field in LONG_FRAME_FIELDS if field.width == 2]
+
+    plots_into_one = [[13,24,25,26,27]]
 
-        # Append as a Cycle
-        cycles.append(Cycle(request=request_frame, response=response_frame))
+    # Only offsets present in the analysed frames can be plotted
+    data_len = single_bytes.shape[1]
+    def label(offset: int) -> str:
+        name = field_label(offset) if data_len == LONG_FRAME_LEN else ""
+        return f"\n{name}" if name else ""
+    plots_into_one = [[i for i in group if i < data_len] for group in plots_into_one]
+    plots_into_one = [group for group in plots_into_one if group]
 
-    if not cycles:
+    # Determine the offsets to include for single-byte plots (excluding those in plots_into_one)
+    included_offsets = [i for i in range(data_len) if i not in offsets_to_skip and not any(i in group for group in plots_into_one)]
+
+    # Validate pairs_to_plot
+    valid_pairs_to_plot = [pair for pair in pairs_to_plot if 0 <= pair < (data_len -1)]
+
+    # One panel per single byte, combined group and 16-bit pair
+    panels: List[PlotPanel] = []
+    for offset in included_offsets:
+        panels.append(PlotPanel(f"Byte {offset}", f"Byte {offset}{label(offset)}",
+                                [(f"Byte {offset}", single_bytes[:, offset])]))
+    for group in plots_into_one:
+        group_label = "-".join(map(str, group))
+        panels.append(PlotPanel(f"Combined Bytes {group_label}", f"Bytes {group_label}",
+                                [(f"Byte {offset}", single_bytes[:, offset]) for offset in group]))
+    for pair_start in valid_pairs_to_plot:
+        pair_label = f"Pair {pair_start}-{pair_start +1}"
+        panels.append(PlotPanel(pair_label, f"{pair_label}{label(pair_start)}",
+                                [(pair_label, pairs_16[:, pair_start])]))
+    return panels
+
+################################################################################
+# Analysis and Plotting
+################################################################################
+
+def analyse_capture(path: str, start: float = None, end: float = None,
+                    keep_frames: bool = False) -> Optional[np.ndarray]:
+    """
+    Stream a capture, print per-offset statistics of its request frames and
+    return the analysed frames, one row per cycle. Without keep_frames the
+    returned matrix is empty and memory use stays constant. Returns None if
+    the capture holds nothing to analyse.
+    """
+    ########################################################################
+    # 1) Stream TXT, filter frames and keep running stats
+    ########################################################################
+    single_bytes_running = RunningStats(SHORT_FRAME_LEN)
+    pairs_16_running = RunningStats(SHORT_FRAME_LEN - 1)
+    plotted_chunks: List[np.ndarray] = []
+    original_length = 0
+    errors = DecoderStats()
+
+    try:
+        with iter_capture_chunks(path, start, end, errors) as chunks:
+            for chunk in chunks:
+                chunk = drop_bad_checksums(chunk, errors)
+                original_length += len(chunk.request)
+
+                # Filter out cycles where response payload is all zeros
+                analysed = chunk.request[chunk.response.any(axis=1)]
+                single_bytes_running.update(analysed)
+                pairs_16_running.update(pairs_16_matrix(analysed))
+                if keep_frames:
+                    plotted_chunks.append(analysed)
+    except FileNotFoundError:
+        print(f"File {path} not found!")
+        return None
+
+    if original_length == 0:
         print("No valid frame pairs found! Check your TXT file.")
-        return
+        return None
 
-    # Filter out cycles where response payload is all zeros
-    original_length = len(cycles)
-    cycles = [cycle for cycle in cycles if any(byte != 0 for byte in cycle.response.payload)]
-    filtered_length = len(cycles)
+    filtered_length = single_bytes_running.count
     print(f"Filtered out {original_length - filtered_length} frame pairs with all-zero response payloads.")
+    print(f"Frame errors: bad_frames={errors.checksum_errors}, resyncs={errors.resyncs}, "
+          f"dropped_bytes={errors.dropped_bytes}")
 
-    if not cycles:
+    if filtered_length == 0:
         print("No non-zero response payload frame pairs found after filtering!")
-        return
+        return None
 
     ########################################################################
     # 2) Basic stats for single bytes and 16-bit pairs
     ########################################################################
     # Determine the maximum payload length
-    max_len = max(len(cycle.response.payload) for cycle in cycles)
-
-    # Initialize lists for single bytes and 16-bit pairs
-    single_bytes: List[List[int]] = [[] for _ in range(max_len)]
-    pairs_16: List[List[int]] = [[] for _ in range(max_len - 1)]
-
-    # Populate the lists with response payloads
-    for cycle in cycles:
-        frame = cycle.request
-        plen = len(frame.payload)
-        for i in range(plen):
-            single_bytes[i].append(frame.payload[i])
-        for i in range(plen - 1):
-            val16 = big_endian_16(frame.payload[i], frame.payload[i+1])
-            pairs_16[i].append(val16)
+    max_len = LONG_FRAME_LEN
 
     # Compute statistics
-    single_bytes_stats: List[Stats] = [compute_stats(sb) for sb in single_bytes]
-    pairs_16_stats: List[Stats] = [compute_stats(p) for p in pairs_16]
+    single_bytes_stats: List[Stats] = compute_stats(single_bytes_running)
+    pairs_16_stats: List[Stats] = compute_stats(pairs_16_running)
 
     # Print out some stats
     print("\n======== Single-Byte Offsets Stats ========")
@@ -175,150 +400,56 @@ def main():
         if stt.count > 0 and stt.min >= 0 and stt.max < 1000:
             print(f"Likely Temperature at pair [2-3], range {stt.min}..{stt.max} => {stt.min/10.0:.1f}..{stt.max/10.0:.1f} °C")
 
-    ########################################################################
-    # 4) Plotting Statistics and Data
-    ########################################################################
-    print("\nPlotting data and statistics... Close plots to end.\n")
-
-    frame_ids = list(range(len(cycles)))
-    ## short frame controller->main unit
-    # 0:     100%  0xAA        identifier 0xAA
-    # 1:     100%  0x66        device ID (controller 0x66, heater 0x77)
-    # 2:     50%   0x02        command?
-    # 3:     100%  0x0B        length field (0x0B for controller->heater, 0x33 for heater->controller)
-    # 4:     0%    0x00        unknown
-    # 5:     0%    0x00        unknown
-    # 6:     0%    0x00        unknown
-    # 7:     0%    0x00        unknown
-    # 8:     100%  1-10        power level [level]
-    # 9:     90%   2, 6, 8     requested state (0x02: off, 0x06: start, 0x08: running) [state]
-    # 10:    0%    0x00        unknown
-    # 11:    0%    0x00        unknown
-    # 12:    0%    0x00        unknown
-    # 13:    0%    0x00        unknown
-    # 14:    100%  1-255       checksum
-
-    ## long frame main unit->controller
-    # 0:     100%  0xAA        identifier 0xAA
-    # 1:     100%  0x77  device ID (controller 0x66, heater 0x77)
-    # 2:     50%   0x02        command?
-    # 3:     100%  0x33  length field (0x0B for controller->heater, 0x33 for heater->controller)
-    # 4:     80%   0-1         all 1, last one 0 | heater enabled?
-    # 5:     99%   0x00-0x04   state (0x00: off, 0x01: glow plug pre heat, 0x02: ignited, 0x03: stable combustion, 0x04: stoping, cooling) [state]
-    # 6:     100%  0x01-0x0A   power level [level]
-    # 7:     0%    0x00        unknown
-    # 8:     0%    0x00, 0x03  0x03 if running, 0x00 if stopped (just last one is 0)
-    # 9:     0%    0x00, 0xFB  0xFB if running, 0x00 if stopped (just last one is 0)
-    # 10:    0%    0x00        unknown
-    # 11:    99%   153-158     input voltage [V * 10]
-    # 12:    0%    0x00        unknown
-    # 13:    40%   0-12        glow plug current [A]
-    # 14:    50%   0-1         cooling down [0/1]
-    # 15:    30%   0-16        Fan voltage? Some temperature? [V]
-    # 16-17: 99%   480,1630    heat exchanger temperature [°C * 100]
-    # 18:    0%    0x00        unknown
-    # 19:    0%    0x00        unknown
-    # 20-21: 90%   0-325       state duration [s]
-    # 22:    0%    0x00        unknown
-    # 23:    90%   0-51        pump frequency [Hz*10]
-    # 24:    25%   0-66        glow plug voltage/current/temperature
-    # 25:    25%   0-86        glow plug voltage/current/temperature
-    # 26:    25%   0-56        glow plug voltage/current/temperature
-    # 27:    25%   0-12        glow plug voltage/current/temperature
-    # 28-29  90%   0-3939      fan speed [rpm]
-    # 30-45: 0%    0x00        unknown
-    # 46:    0%    35          unknown constant
-    # 47:    0%    4           unknown constant
-    # 48:    0%    17          unknown constant
-    # 49:    0%    35          unknown constant
-    # 50:    0%    0x00        unknown
-    # 51:    0%    30, 40      unknown
-    # 52-53  10%   0-420       something glow plug related
-    # 54:    0%    0x00        unknown
-    # 55:    100%  1-254       checksum
-
-    offsets_to_skip = [4, 7, 8,9,10, 12, 13, 22,30,51,54,55, 16,17,20,21,28,29,52,53,0,1,2,3,18,19,31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,49,50]
+    if not plotted_chunks:
+        return np.empty((0, SHORT_FRAME_LEN), dtype=np.uint8)
+    # Column matrices of the analysed frames: one row per cycle
+    return np.concatenate(plotted_chunks)
 
-    # Define the 16-bit pairs to plot
-    # For example, to plot only pair starting at offset 15 (i.e., pair 15-16)
-    pairs_to_plot = [16, 20, 28, 52]
+def plot_frames(single_bytes: np.ndarray, output: str = None, layout: str = "browse") -> None:
+    """
+    Plot every offset and 16-bit pair of the analysed frames, on screen or
+    into a .png or .html report.
+    """
+    frame_ids = np.arange(len(single_bytes))
+    panels = build_panels(single_bytes)
 
-    plots_into_one = [[13,24,25,26,27]]
+    if not panels:
+        print("No data available to plot.")
+        return
 
-    # ===========================
-    # Plot Single-Byte Payloads, 16-bit Pairs, and Combined Groups into One Figure
-    # ===========================
+    title = "All Payload Offsets and 16-bit Pairs vs. Frame ID"
+    if output:
+        save_report(panels, output, title)
+        print(f"\nPlots written to {output}")
+        return
 
-    # Determine the offsets to include for single-byte plots (excluding those in plots_into_one)
-    included_offsets = [i for i in range(max_len) if i not in offsets_to_skip and not any(i in group for group in plots_into_one)]
-
-    # Calculate the number of subplots:
-    # - Single-byte plots
-    # - plots_into_one groups
-    # - 16-bit pair plots
-    num_single_byte_plots = len(included_offsets)
-    num_plots_into_one = len(plots_into_one)
-    # Validate pairs_to_plot
-    valid_pairs_to_plot = [pair for pair in pairs_to_plot if 0 <= pair < (max_len -1)]
-    num_pairs_to_plot = len(valid_pairs_to_plot)
-    total_subplots = num_single_byte_plots + num_plots_into_one + num_pairs_to_plot
+    print("\nPlotting data and statistics... Close plots to end.\n")
+    import matplotlib.pyplot as plt
 
-    if total_subplots == 0:
-        print("No data available to plot.")
+    if layout == "browse":
+        browser = FieldBrowser(panels, title)  # widgets stop responding once garbage collected
+        plt.show()
         return
 
-    # Create a single figure with all subplots
+    # Create a single figure with all subplots, every frame drawn
+    total_subplots = len(panels)
     fig, axes = plt.subplots(nrows=total_subplots, ncols=1, figsize=(15, 3 * total_subplots), sharex=True)
     
     # If there's only one subplot, axes is not a list, so make it a list for consistency
     if total_subplots == 1:
         axes = [axes]
 
-    fig.suptitle("All Payload Offsets and 16-bit Pairs vs. Frame ID", fontsize=16)
+    fig.suptitle(title, fontsize=16)
 
-    current_subplot = 0  # To keep track of the current subplot index
-
-    # ===========================
-    # Plot Single-Byte Payloads
-    # ===========================
-    if included_offsets:
-        for offset in included_offsets:
-            ax = axes[current_subplot]
-            byte_values = single_bytes[offset]
-            ax.plot(frame_ids, byte_values, ".-", label=f"Byte {offset}")
-            ax.set_ylabel(f"Byte {offset}\nRange: {min(byte_values)}-{max(byte_values)}")
-            ax.grid(True)
-            ax.legend(loc='upper right')
-            current_subplot += 1
-
-    # ===========================
-    # Plot Combined Groups from plots_into_one
-    # ===========================
-    if plots_into_one:
-        for group in plots_into_one:
-            ax = axes[current_subplot]
-            for offset in group:
-                byte_values = single_bytes[offset]
-                ax.plot(frame_ids, byte_values, ".-", label=f"Byte {offset}")
-            group_label = "-".join(map(str, group))
-            ax.set_ylabel(f"Bytes {group_label}\nRange: {min(min(single_bytes[offset] for offset in group))}-{max(max(single_bytes[offset] for offset in group))}")
-            ax.set_title(f"Combined Bytes {group_label}")
-            ax.grid(True)
-            ax.legend(loc='upper right')
-            current_subplot += 1
-
-    # ===========================
-    # Plot 16-bit Pair Payloads
-    # ===========================
-    if valid_pairs_to_plot:
-        for pair_start in valid_pairs_to_plot:
-            ax = axes[current_subplot]
-            pair_values = pairs_16[pair_start]
-            ax.plot(frame_ids, pair_values, ".-", label=f"Pair {pair_start}-{pair_start +1}")
-            ax.set_ylabel(f"Pair {pair_start}-{pair_start +1}\nRange: {min(pair_values)}-{max(pair_values)}")
-            ax.grid(True)
-            ax.legend(loc='upper right')
-            current_subplot += 1
+    for ax, panel in zip(axes, panels):
+        for line_label, values in panel.lines:
+            ax.plot(frame_ids, values, ".-", label=line_label)
+        lo, hi = panel.range
+        ax.set_ylabel(f"{panel.ylabel}\nRange: {lo}-{hi}")
+        if len(panel.lines) > 1:
+            ax.set_title(panel.title)
+        ax.grid(True)
+        ax.legend(loc='upper right')
 
     # Set the xlabel for the last subplot
     axes[-1].set_xlabel("Frame ID")
@@ -330,5 +461,34 @@ def main():
     # ===========================
     plt.show()
 
+################################################################################
+# Main Script
+################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse and plot Vevor heater bus captures.")
+    parser.add_argument("capture", nargs="?", default=SAMPLE_CAPTURE,
+                        help="hex text capture, optionally gzip-compressed (.gz), or - for stdin "
+                             "(default: the sample log in docs/communication)")
+    parser.add_argument("--no-plot", action="store_true",
+                        help="print statistics only; memory use stays constant")
+    parser.add_argument("--start", type=float,
+                        help="first timestamp [s] to analyse (binary captures only)")
+    parser.add_argument("--end", type=float,
+                        help="timestamp [s] to stop before (binary captures only)")
+    parser.add_argument("--layout", choices=("browse", "subplots"), default="browse",
+                        help="browse: one decimated plot with a field selector (default); "
+                             "subplots: every field in its own subplot, every frame drawn")
+    parser.add_argument("-o", "--output",
+                        help="write the decimated plots to a .png or .html report instead of showing them")
+    args = parser.parse_args(argv)
+    if args.output and not args.output.endswith(REPORT_SUFFIXES):
+        parser.error(f"--output must end in {' or '.join(REPORT_SUFFIXES)}")
+
+    single_bytes = analyse_capture(args.capture, args.start, args.end, keep_frames=not args.no_plot)
+    if single_bytes is None or args.no_plot:
+        return
+    plot_frames(single_bytes, args.output, args.layout)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Replay a capture through the VevorHeater publish policy.
+
+Counts how many sensor messages the component would send to Home Assistant
+for every long frame, with and without a publish policy, using the same
+rules as PublishPolicy::should_publish in the firmware.
+
+Usage:
+    python software/publish_replay.py docs/communication/log_start_running_stop.txt \\
+        --only-on-change --deadband 0.5 --heartbeat 300
+"""
+
+import argparse
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from plot_frame import iter_capture_chunks, drop_bad_checksums
+from vevor_protocol import DecoderStats
+from vevor_protocol.bulk import LONG_DTYPE, decode_long_frames
+from vevor_protocol.fields import LONG_FRAME_FIELDS
+
+# Sensors published from the long frame: (LONG_DTYPE field, scale, signed),
+# from the firmware's field table
+_DTYPE_FIELD_AT = {offset: name for name, (_, offset) in LONG_DTYPE.fields.items()}
+LONG_FRAME_SENSORS: Dict[str, Tuple[str, float, bool]] = {
+    f"{field.key}_sensor": (_DTYPE_FIELD_AT[field.offset], field.scale, field.signed)
+    for field in LONG_FRAME_FIELDS
+}
+
+@dataclass
+class PublishPolicy:
+    only_on_change: bool = False
+    deadband: float = 0.0
+    relative_deadband: float = 0.0
+    heartbeat: float = 0.0  # seconds, 0 = never
+
+    def should_publish(self, value: float, last_value: float, since_last: float) -> bool:
+        if self.heartbeat > 0 and since_last >= self.heartbeat:
+            return True
+        if not self.only_on_change and self.deadband <= 0 and self.relative_deadband <= 0:
+            return True
+        diff = abs(value - last_value)
+        return diff > self.deadband and diff > self.relative_deadband * abs(last_value)
+
+def count_published(values: List[float], times: List[float], policy: PublishPolicy) -> int:
+    """
+    Number of messages a sensor would send for a series of values.
+    """
+    published = 0
+    last_value = last_time = None
+    for value, t in zip(values, times):
+        if last_value is None or policy.should_publish(value, last_value, t - last_time):
+            published += 1
+            last_value, last_time = value, t
+    return published
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count Home Assistant messages under a publish policy.")
+    parser.add_argument("capture", help="capture file (.txt, .gz, .vcap) or - for stdin")
+    parser.add_argument("--only-on-change", action="store_true")
+    parser.add_argument("--deadband", type=float, default=0.0, help="absolute deadband")
+    parser.add_argument("--relative-deadband", type=float, default=0.0,
+                        help="relative deadband as a fraction, e.g. 0.02")
+    parser.add_argument("--heartbeat", type=float, default=0.0, help="heartbeat [s], 0 = never")
+    parser.add_argument("--period", type=float, default=1.0, help="seconds between frames (default 1.0)")
+    args = parser.parse_args(argv)
+    policy = PublishPolicy(args.only_on_change, args.deadband, args.relative_deadband, args.heartbeat)
+
+    chunks = []
+    with iter_capture_chunks(args.capture) as it:
+        for chunk in it:
+            chunks.append(drop_bad_checksums(chunk, DecoderStats()).response)
+    if not chunks:
+        print("No valid frames found!")
+        return
+    records = decode_long_frames(np.concatenate(chunks))
+    times = (np.arange(len(records)) * args.period).tolist()
+
+    total_before = total_after = 0
+    print(f"{'Sensor':<30} {'frames':>8} {'published':>10} {'reduction':>10}")
+    for name, (field, scale, signed) in LONG_FRAME_SENSORS.items():
+        raw = records[field]
+        if signed:
+            raw = raw.astype(f"i{raw.dtype.itemsize}")
+        values = (raw * scale).tolist()
+        published = count_published(values, times, policy)
+        total_before += len(values)
+        total_after += published
+        print(f"{name:<30} {len(values):>8} {published:>10} {1 - published / len(values):>9.1%}")
+
+    duration = len(records) * args.period
+    print(f"\nTotal messages: {total_before} -> {total_after} "
+          f"({1 - total_after / total_before:.1%} fewer, "
+          f"{total_before / duration:.1f} -> {total_after / duration:.1f} per second)")
+
+if __name__ == "__main__":
+    main()
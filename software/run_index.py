@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Split captures into heater runs and keep per-run summaries in a sidecar index.
+
+A run starts when the heater leaves OFF (long frame byte 5) and ends when it
+is OFF again. A run is also cut where the capture has a gap of more than
+MAX_GAP seconds, or where the state duration (bytes 20-21) falls while the
+state stays the same: the heater restarted between two frames, or text logs
+were concatenated, whose synthetic timestamps show no gap.
+
+Every run is summarized by one RUN_DTYPE record:
+
+    start, end          capture timestamps [s] of the run; a run captured
+                        from within pre-heat starts state duration earlier
+    time_to_ignition    start of pre-heat to the first ignited frame [s]
+    preheat, stable, cooldown
+                        time spent in those states [s]
+    peak_temp           highest heat exchanger temperature [°C]
+    pump_pulses         pump frequency integrated over time, a fuel estimate
+    min_voltage         lowest input voltage [V]
+    error               highest error code (byte 7)
+    flags               PARTIAL (began before the capture), COMPLETE (seen
+                        back to OFF), IGNITED, STABLE
+
+The records are kept next to the capture in <capture>.runs, a few dozen
+bytes per run, and rebuilt when the capture's size or modification time
+changes. Queries over many captures read only these sidecars.
+
+Usage:
+    python software/run_index.py capture.vcap
+    python software/run_index.py captures/*.vcap --failed-ignition --since 2026-09-01
+    python software/run_index.py captures/*.vcap --csv runs.csv
+"""
+
+import argparse
+import csv
+import os
+import struct
+import sys
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from capture_file import CAPTURE_SUFFIX, FRAME_STREAM_SUFFIX, CaptureFile, parse_time, read_frame_stream
+from plot_frame import CHUNK_CYCLES, iter_frame_chunks, open_capture
+from vevor_protocol import DecoderStats, HeaterState
+from vevor_protocol.bulk import checksums_ok, field_column
+from vevor_protocol.fields import FIELDS_BY_KEY
+
+################################################################################
+# Constants
+################################################################################
+
+INDEX_SUFFIX = ".runs"
+MAGIC = b"VHRUN\0"
+VERSION = 1
+
+# magic, version, record size, run count, capture size, capture mtime [ns]
+HEADER_STRUCT = struct.Struct("<6sHHQQq")
+HEADER_SIZE = 64
+
+RUN_DTYPE = np.dtype([
+    ("start", "<f8"),
+    ("end", "<f8"),
+    ("frames", "<u4"),
+    ("first_state", "u1"),
+    ("flags", "u1"),
+    ("error", "u1"),
+    ("time_to_ignition", "<f4"),  # NaN if not ignited or PARTIAL
+    ("preheat", "<f4"),
+    ("stable", "<f4"),
+    ("cooldown", "<f4"),
+    ("peak_temp", "<f4"),
+    ("pump_pulses", "<f4"),
+    ("min_voltage", "<f4"),
+])
+
+# flags
+PARTIAL = 0x01
+COMPLETE = 0x02
+IGNITED = 0x04
+STABLE = 0x08
+FLAG_NAMES = ((PARTIAL, "partial"), (COMPLETE, "complete"), (IGNITED, "ignited"), (STABLE, "stable"))
+
+# Longer gaps between cycles [s] end a run
+MAX_GAP = 30.0
+
+# Error code reported by the heater, 90% certain per the README byte table
+# (5.2); not published as a sensor
+ERROR_OFFSET = 7
+
+################################################################################
+# Segmentation
+################################################################################
+
+def iter_timed_chunks(path: str, period: float = 1.0,
+                      errors: DecoderStats = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Yield (timestamps, long frame matrix) for every chunk of any supported
+    capture. Text captures are timestamped one period per cycle; their
+    skipped lines are counted in errors.
+    """
+    if path.endswith(CAPTURE_SUFFIX):
+        capture = CaptureFile(path)
+        for i in range(0, len(capture), CHUNK_CYCLES):
+            part = capture.records[i:i + CHUNK_CYCLES]
+            yield part["timestamp"], part["response"]
+    elif path.endswith(FRAME_STREAM_SUFFIX):
+        stream = read_frame_stream(path)
+        yield stream.timestamps, stream.frames.response
+    else:
+        count = 0
+        with open_capture(path) as f:
+            for chunk in iter_frame_chunks(f, errors=errors):
+                n = len(chunk.response)
+                yield (count + np.arange(n)) * period, chunk.response
+                count += n
+
+def _per_run(ufunc, values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    # ufunc over values[start:end] of every run in one reduceat call
+    bounds = np.empty(2 * len(starts), dtype=np.intp)
+    bounds[0::2] = starts
+    bounds[1::2] = ends
+    return ufunc.reduceat(np.append(values, values[-1:]), bounds)[0::2]
+
+def segment_runs(path: str, period: float = 1.0) -> np.ndarray:
+    """
+    Scan a capture and summarize each of its runs in a RUN_DTYPE record.
+    """
+    return summarize_runs(iter_timed_chunks(path, period))
+
+def summarize_runs(chunks: Iterable[Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+    """
+    Summarize the runs in (timestamps, long frame matrix) chunks, as yielded
+    by iter_timed_chunks, in RUN_DTYPE records. Cycles with a bad response
+    checksum are skipped.
+    """
+    columns = {key: [] for key in ("t", "state", "duration", "temp", "pump", "voltage", "error")}
+    for timestamps, response in chunks:
+        ok = checksums_ok(response)
+        response = response[ok]
+        columns["t"].append(np.asarray(timestamps)[ok])
+        columns["state"].append(field_column(response, "state"))
+        columns["duration"].append(field_column(response, "state_duration"))
+        columns["temp"].append(field_column(response, "heat_exchanger_temp"))
+        columns["pump"].append(field_column(response, "pump_frequency"))
+        columns["voltage"].append(field_column(response, "input_voltage"))
+        columns["error"].append(response[:, ERROR_OFFSET])
+    if not columns["t"] or not sum(len(c) for c in columns["t"]):
+        return np.empty(0, dtype=RUN_DTYPE)
+    t, state, duration, temp, pump, voltage, error = (np.concatenate(columns[key]) for key in columns)
+
+    # continues[i]: cycle i follows cycle i - 1 without a gap or restart
+    n = len(t)
+    continues = np.zeros(n, dtype=bool)
+    continues[1:] = (np.diff(t) <= MAX_GAP) & ~((state[1:] == state[:-1]) & (duration[1:] < duration[:-1]))
+    on = state != HeaterState.OFF
+    linked = np.zeros(n, dtype=bool)  # cycle i belongs to the run of cycle i - 1
+    linked[1:] = on[1:] & on[:-1] & continues[1:]
+    starts = np.flatnonzero(on & ~linked)
+    ends = np.flatnonzero(on & ~np.append(linked[1:], False)) + 1
+    if not len(starts):
+        return np.empty(0, dtype=RUN_DTYPE)
+
+    # Time each cycle lasts, up to the next one on the same timeline
+    dt = np.zeros(n)
+    dt[:-1] = np.where(continues[1:], np.diff(t), 0.0)
+    elapsed = np.concatenate([[0.0], np.cumsum(dt)[:-1]])
+
+    runs = np.zeros(len(starts), dtype=RUN_DTYPE)
+    first_state = state[starts]
+    from_preheat = first_state == HeaterState.GLOW_PLUG_PRE_HEAT
+    # The state duration of the first cycle dates back a run captured from within pre-heat
+    offset = np.where(from_preheat, duration[starts], 0).astype(np.float64)
+    runs["start"] = t[starts] - offset
+    runs["end"] = t[ends - 1] + dt[ends - 1]
+    runs["frames"] = ends - starts
+    runs["first_state"] = first_state
+    runs["error"] = _per_run(np.maximum, error, starts, ends)
+
+    ignited = (state == HeaterState.IGNITED) | (state == HeaterState.STABLE_COMBUSTION)
+    first_ignited = _per_run(np.minimum, np.where(ignited, elapsed, np.inf), starts, ends)
+    was_ignited = np.isfinite(first_ignited)
+    runs["time_to_ignition"] = np.where(from_preheat & was_ignited,
+                                        first_ignited - elapsed[starts] + offset, np.nan)
+    for name, run_state in (("preheat", HeaterState.GLOW_PLUG_PRE_HEAT),
+                            ("stable", HeaterState.STABLE_COMBUSTION),
+                            ("cooldown", HeaterState.STOPPING_COOLING)):
+        runs[name] = _per_run(np.add, np.where(state == run_state, dt, 0.0), starts, ends)
+    runs["preheat"] += offset
+
+    runs["peak_temp"] = _per_run(np.maximum, temp, starts, ends) * FIELDS_BY_KEY["heat_exchanger_temp"].scale
+    runs["pump_pulses"] = _per_run(np.add, pump * dt, starts, ends) * FIELDS_BY_KEY["pump_frequency"].scale
+    runs["min_voltage"] = _per_run(np.minimum, voltage, starts, ends) * FIELDS_BY_KEY["input_voltage"].scale
+
+    complete = np.zeros(len(starts), dtype=bool)
+    after = ends < n
+    complete[after] = continues[ends[after]] & ~on[ends[after]]
+    stable = _per_run(np.maximum, (state == HeaterState.STABLE_COMBUSTION).view(np.uint8), starts, ends) > 0
+    runs["flags"] = (np.where(~from_preheat, PARTIAL, 0) | np.where(complete, COMPLETE, 0)
+                     | np.where(was_ignited, IGNITED, 0) | np.where(stable, STABLE, 0))
+    return runs
+
+def failed_ignitions(runs: np.ndarray) -> np.ndarray:
+    """
+    Mask of runs that began with pre-heat and ended, back to OFF or in
+    cooldown, without igniting.
+    """
+    flags = runs["flags"]
+    ended = ((flags & COMPLETE) != 0) | (runs["cooldown"] > 0)
+    return ((flags & (PARTIAL | IGNITED)) == 0) & ended
+
+################################################################################
+# Index File
+################################################################################
+
+def index_path(capture_path: str) -> str:
+    return capture_path + INDEX_SUFFIX
+
+def _capture_signature(capture_path: str) -> Tuple[int, int]:
+    st = os.stat(capture_path)
+    return st.st_size, st.st_mtime_ns
+
+def write_index(capture_path: str, runs: np.ndarray) -> None:
+    """
+    Write the runs of a capture to its sidecar index.
+    """
+    size, mtime_ns = _capture_signature(capture_path)
+    header = HEADER_STRUCT.pack(MAGIC, VERSION, RUN_DTYPE.itemsize, len(runs), size, mtime_ns)
+    with open(index_path(capture_path), "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+        f.write(runs.astype(RUN_DTYPE).tobytes())
+
+def read_index(capture_path: str) -> Optional[np.ndarray]:
+    """
+    Runs from the sidecar index of a capture, or None if it is missing,
+    unreadable or older than the capture.
+    """
+    try:
+        with open(index_path(capture_path), "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < HEADER_SIZE:
+        return None
+    magic, version, record_size, count, size, mtime_ns = HEADER_STRUCT.unpack_from(data)
+    if magic != MAGIC or version != VERSION or record_size != RUN_DTYPE.itemsize:
+        return None
+    if (size, mtime_ns) != _capture_signature(capture_path):
+        return None
+    if len(data) != HEADER_SIZE + count * record_size:
+        return None
+    return np.frombuffer(data, dtype=RUN_DTYPE, count=count, offset=HEADER_SIZE)
+
+def load_runs(capture_path: str, period: float = 1.0, rebuild: bool = False) -> np.ndarray:
+    """
+    Runs of a capture, from its index when that is current, otherwise
+    scanned from the capture and written to the index.
+    """
+    runs = None if rebuild else read_index(capture_path)
+    if runs is None:
+        runs = segment_runs(capture_path, period)
+        write_index(capture_path, runs)
+    return runs
+
+################################################################################
+# Reporting
+################################################################################
+
+def format_time(t: float) -> str:
+    # Captures written with wall-clock timestamps show dates, others seconds
+    if t >= 1e9:
+        return datetime.fromtimestamp(t).isoformat(sep=" ", timespec="seconds")
+    return f"{t:.0f}"
+
+def flag_names(flags: int) -> str:
+    return ",".join(name for bit, name in FLAG_NAMES if flags & bit)
+
+REPORT_COLUMNS = ("capture", "run", "start", "duration_s", "time_to_ignition_s", "preheat_s", "stable_s",
+                  "cooldown_s", "peak_temp_c", "pump_pulses", "min_voltage_v", "error", "flags")
+
+def report_rows(selected: List[Tuple[str, int, np.void]]) -> Iterator[tuple]:
+    for capture, number, run in selected:
+        yield (capture, number, format_time(run["start"]), round(float(run["end"] - run["start"])),
+               "" if np.isnan(run["time_to_ignition"]) else round(float(run["time_to_ignition"])),
+               round(float(run["preheat"])), round(float(run["stable"])), round(float(run["cooldown"])),
+               round(float(run["peak_temp"]), 1), round(float(run["pump_pulses"])),
+               round(float(run["min_voltage"]), 1), int(run["error"]), flag_names(int(run["flags"])))
+
+################################################################################
+# Main Script
+################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Index the heater runs of captures and list runs matching a query.")
+    parser.add_argument("captures", nargs="+",
+                        help=f"hex text captures (.gz), {CAPTURE_SUFFIX} or {FRAME_STREAM_SUFFIX} files")
+    parser.add_argument("--period", type=float, default=1.0,
+                        help="seconds between cycles of text captures (default 1.0)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="rescan the captures even if their index is current")
+    parser.add_argument("--since", type=parse_time,
+                        help="runs starting at or after this timestamp, seconds or an ISO date/time")
+    parser.add_argument("--until", type=parse_time,
+                        help="runs starting before this timestamp, seconds or an ISO date/time")
+    parser.add_argument("--failed-ignition", action="store_true",
+                        help="only runs that pre-heated and ended without igniting")
+    parser.add_argument("--error", action="store_true",
+                        help="only runs with a non-zero error code")
+    parser.add_argument("--csv", help="write the selected runs to this CSV file")
+    args = parser.parse_args(argv)
+
+    selected = []
+    total = 0
+    for capture in args.captures:
+        if capture == "-":
+            parser.error("captures from stdin have no index; save them to a file first")
+        try:
+            runs = load_runs(capture, args.period, args.rebuild)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Skipping {capture}: {e}", file=sys.stderr)
+            continue
+        total += len(runs)
+        keep = np.ones(len(runs), dtype=bool)
+        if args.since is not None:
+            keep &= runs["start"] >= args.since
+        if args.until is not None:
+            keep &= runs["start"] < args.until
+        if args.failed_ignition:
+            keep &= failed_ignitions(runs)
+        if args.error:
+            keep &= runs["error"] != 0
+        selected.extend((capture, int(i), runs[i]) for i in np.flatnonzero(keep))
+
+    rows = list(report_rows(selected))
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(REPORT_COLUMNS)
+            writer.writerows(rows)
+    print(f"{len(rows)} of {total} runs selected")
+    if rows:
+        widths = [max(len(str(value)) for value in column) for column in zip(REPORT_COLUMNS, *rows)]
+        for row in [REPORT_COLUMNS] + rows:
+            print("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
+
+if __name__ == "__main__":
+    main()
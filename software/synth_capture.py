@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Synthetic captures of any length, resampled from a recorded one.
+
+Heater runs (off, pre-heat, ignition, stable combustion, cooling) are laid
+out with randomized lengths. Every cycle copies a random request/response
+pair recorded in the same heater state, so byte values and the way they
+move together follow the sample capture. Bytes that vary within a state get
+up to --noise LSB of extra noise, the state duration (bytes 20-21) counts
+up and the checksums are recomputed. Then --corrupt of the cycles are
+damaged: half get a flipped bit that fails the checksum, and in text output
+a quarter each get a line with an invalid hex digit or with a byte missing.
+
+The output format follows the file name: hex text (.txt, .txt.gz), binary
+capture (.vcap) or a Saleae CSV export of single bytes (.csv) as read by
+assemble_frames.py.
+
+Usage:
+    python software/synth_capture.py 1000000 synth.txt
+    python software/synth_capture.py 10000000 synth.vcap --seed 2
+    python software/synth_capture.py 100000 synth.csv
+"""
+
+import argparse
+import gzip
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+
+from capture_file import CAPTURE_SUFFIX, write_capture
+from plot_frame import CHUNK_CYCLES, FrameMatrices, load_frame_matrices, open_capture
+from vevor_protocol import SHORT_FRAME_LEN, LONG_FRAME_LEN, HeaterState
+from vevor_protocol.bulk import checksums_ok, set_checksums
+from vevor_protocol.frames import CHECKSUM_START
+
+################################################################################
+# Constants
+################################################################################
+
+DEFAULT_SAMPLE = str(Path(__file__).resolve().parents[1] / "docs" / "communication" / "log_start_running_stop.txt")
+
+# Mean cycles spent in each state of a run (heater_sim.Timing, one cycle per
+# second); every run draws lengths within +-STATE_JITTER of these
+STATE_CYCLES = {
+    HeaterState.OFF: 600,
+    HeaterState.GLOW_PLUG_PRE_HEAT: 30,
+    HeaterState.IGNITED: 210,
+    HeaterState.STABLE_COMBUSTION: 1800,
+    HeaterState.STOPPING_COOLING: 175,
+}
+STATE_JITTER = 0.5
+
+STATE_OFFSET = 5
+DURATION_OFFSET = 20
+# Never given noise: header, level, state, state duration, checksum
+FIXED_OFFSETS = (0, 1, 2, 3, 5, 6, 20, 21, LONG_FRAME_LEN - 1)
+
+# Saleae export timing: 4800 baud, 10 bits per byte, reply 20 ms after the request
+BYTE_TIME_S = 10 / 4800
+REPLY_DELAY_S = 0.02
+
+################################################################################
+# Generator
+################################################################################
+
+def load_sample(path: str = DEFAULT_SAMPLE) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Recorded (requests, responses) matrices by heater state, valid checksums only.
+    """
+    with open_capture(path) as f:
+        frames = load_frame_matrices(f)
+    ok = checksums_ok(frames.request) & checksums_ok(frames.response)
+    request, response = frames.request[ok], frames.response[ok]
+    states = response[:, STATE_OFFSET]
+    return {int(state): (request[states == state], response[states == state]) for state in np.unique(states)}
+
+def state_schedule(cycles: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Heater state and state duration of every cycle, for back-to-back runs
+    with randomized state lengths.
+    """
+    order = list(STATE_CYCLES)
+    # Enough runs even if every state draws its shortest length
+    shortest_run = max(int(sum(STATE_CYCLES.values()) * (1 - STATE_JITTER)) - len(order), 1)
+    runs = cycles // shortest_run + 2
+    means = np.array([STATE_CYCLES[state] for state in order], dtype=np.float64)
+    lengths = np.maximum(means * rng.uniform(1 - STATE_JITTER, 1 + STATE_JITTER, (runs, len(order))), 1)
+    lengths = lengths.astype(np.int64).ravel()
+    states = np.tile(np.array(order, dtype=np.uint8), runs)
+    # Start somewhere in the first run, like a capture started at any time
+    skip = int(rng.integers(0, lengths[:len(order)].sum()))
+    state = np.repeat(states, lengths)[skip:skip + cycles]
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)[skip:skip + cycles]
+    duration = (np.arange(skip, skip + cycles) - starts).clip(0, 0xFFFF).astype(np.uint16)
+    return state, duration
+
+def synthesize(cycles: int, sample_path: str = DEFAULT_SAMPLE, seed: int = 0, noise: int = 1,
+               corrupt: float = 0.001, chunk_size: int = CHUNK_CYCLES) -> Iterator[FrameMatrices]:
+    """
+    Yield a synthetic capture of the given length in FrameMatrices chunks.
+    """
+    rng = np.random.default_rng(seed)
+    sample = load_sample(sample_path)
+    state, duration = state_schedule(cycles, rng)
+    # States missing from the sample borrow the frames of OFF, or of any state
+    fallback = sample.get(int(HeaterState.OFF)) or next(iter(sample.values()))
+    noisy = {s: np.array([c for c in range(LONG_FRAME_LEN) if c not in FIXED_OFFSETS
+                          and len(np.unique(resp[:, c])) > 1], dtype=np.intp)
+             for s, (_, resp) in sample.items()}
+
+    for begin in range(0, cycles, chunk_size):
+        chunk_state = state[begin:begin + chunk_size]
+        n = len(chunk_state)
+        request = np.empty((n, SHORT_FRAME_LEN), dtype=np.uint8)
+        response = np.empty((n, LONG_FRAME_LEN), dtype=np.uint8)
+        for s in np.unique(chunk_state):
+            rows = np.flatnonzero(chunk_state == s)
+            requests, responses = sample.get(int(s), fallback)
+            picks = rng.integers(0, len(responses), len(rows))
+            request[rows] = requests[picks]
+            block = responses[picks].astype(np.int16)
+            columns = noisy.get(int(s), np.empty(0, dtype=np.intp))
+            if noise and len(columns):
+                block[:, columns] += rng.integers(-noise, noise + 1, (len(rows), len(columns)), dtype=np.int16)
+            response[rows] = block.clip(0, 255)
+        response[:, STATE_OFFSET] = chunk_state
+        response[:, DURATION_OFFSET] = duration[begin:begin + n] >> 8
+        response[:, DURATION_OFFSET + 1] = duration[begin:begin + n] & 0xFF
+        set_checksums(request)
+        set_checksums(response)
+
+        # Half of the corrupted cycles fail their checksum; text output damages the rest
+        flipped = np.flatnonzero(rng.random(n) < corrupt / 2)
+        if len(flipped):
+            offsets = rng.integers(CHECKSUM_START, LONG_FRAME_LEN, len(flipped))
+            response[flipped, offsets] ^= (1 << rng.integers(0, 8, len(flipped))).astype(np.uint8)
+        yield FrameMatrices(request, response)
+
+################################################################################
+# Writers
+################################################################################
+
+# "XX  " for every byte value, as in the recorded logs
+_HEX_CELLS = np.frombuffer("".join(f"{b:02X}  " for b in range(256)).encode(), dtype=np.uint8).reshape(256, 4)
+
+def _hex_lines(matrix: np.ndarray) -> np.ndarray:
+    # (rows, 4 * width - 1) characters: bytes separated by two spaces, then a newline
+    cells = _HEX_CELLS[matrix].reshape(len(matrix), -1)[:, :-1].copy()
+    cells[:, -1] = ord("\n")
+    return cells
+
+def format_text(chunk: FrameMatrices, rng: np.random.Generator, damaged: float = 0.0) -> bytes:
+    """
+    Hex text of a chunk, a request line then a response line per cycle.
+    About damaged of the response lines are made unparsable, half with an
+    invalid hex digit and half with a byte blanked out.
+    """
+    lines = np.concatenate([_hex_lines(chunk.request), _hex_lines(chunk.response)], axis=1)
+    n = len(lines)
+    response_start = 4 * SHORT_FRAME_LEN - 1
+    bad = np.flatnonzero(rng.random(n) < damaged)
+    if len(bad):
+        cells = rng.integers(0, LONG_FRAME_LEN - 1, len(bad))
+        column = response_start + 4 * cells
+        invalid = rng.random(len(bad)) < 0.5
+        lines[bad[invalid], column[invalid]] = ord("Z")
+        lines[bad[~invalid], column[~invalid]] = ord(" ")
+        lines[bad[~invalid], column[~invalid] + 1] = ord(" ")
+    return lines.tobytes()
+
+def write_text(path: str, chunks: Iterator[FrameMatrices], damaged: float = 0.0, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed + 1)
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wb") as f:
+        for chunk in chunks:
+            f.write(format_text(chunk, rng, damaged))
+
+def write_saleae_csv(path: str, chunks: Iterator[FrameMatrices], period: float = 1.0) -> None:
+    """
+    One row per byte on the bus, as exported by the Saleae async serial analyser.
+    """
+    import pandas as pd
+
+    names = np.array([f"{b:02X}" for b in range(256)])
+    request_times = np.arange(SHORT_FRAME_LEN) * BYTE_TIME_S
+    response_times = (SHORT_FRAME_LEN * BYTE_TIME_S + REPLY_DELAY_S) + np.arange(LONG_FRAME_LEN) * BYTE_TIME_S
+    cycle_times = np.concatenate([request_times, response_times])
+    count = 0
+    with open(path, "w", newline="") as f:
+        f.write("Start Time (s);Data\n")
+        for chunk in chunks:
+            frames = np.concatenate([chunk.request, chunk.response], axis=1)
+            times = (count + np.arange(len(frames)))[:, None] * period + cycle_times
+            table = pd.DataFrame({"Start Time (s)": times.ravel(), "Data": names[frames.ravel()]})
+            table.to_csv(f, sep=";", decimal=",", header=False, index=False, float_format="%.7f")
+            count += len(frames)
+
+def write_synthetic(path: str, cycles: int, seed: int = 0, noise: int = 1, corrupt: float = 0.001,
+                    sample_path: str = DEFAULT_SAMPLE) -> None:
+    """
+    Write a synthetic capture in the format the file name selects.
+    """
+    chunks = synthesize(cycles, sample_path, seed, noise, corrupt)
+    if path.endswith(CAPTURE_SUFFIX):
+        write_capture(path, chunks)
+    elif path.endswith(".csv"):
+        write_saleae_csv(path, chunks)
+    else:
+        write_text(path, chunks, damaged=corrupt / 2, seed=seed)
+
+################################################################################
+# Main Script
+################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic capture resampled from a recorded one.")
+    parser.add_argument("cycles", type=lambda text: int(float(text)), help="request/response cycles, e.g. 1e6")
+    parser.add_argument("output", help=f"hex text (.txt, .txt.gz), binary capture ({CAPTURE_SUFFIX}) "
+                                       "or Saleae CSV (.csv) file to write")
+    parser.add_argument("--sample", default=DEFAULT_SAMPLE, help="recorded capture to resample")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--noise", type=int, default=1,
+                        help="extra noise [LSB] on bytes that vary within a state (default 1)")
+    parser.add_argument("--corrupt", type=float, default=0.001,
+                        help="share of corrupted cycles (default 0.001)")
+    args = parser.parse_args(argv)
+
+    write_synthetic(args.output, args.cycles, args.seed, args.noise, args.corrupt, args.sample)
+    print(f"Wrote {args.cycles} cycles to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Decode a telemetry dump downloaded from the VevorHeater component.
+
+The firmware keeps decoded long frames in a packed ring buffer (see
+firmware/esphome/components/vevorheater/telemetry_buffer.h) and serves it
+from the web server, by default at /vevorheater/<id>/telemetry. The first
+GET only asks the main loop for a snapshot and is answered 503 with
+Retry-After; the download is retried until the snapshot is served. The dump
+is a TelemetryDumpHeader followed by 8-byte records, oldest first:
+
+    header               bit 7 keyframe, bits 4-6 state, bits 0-3 power level
+    dt                   time since the previous record [dt_unit_ms], saturating
+    heat_exchanger_temp  0.1 °C, absolute in keyframes, else delta mod 2^16
+    input_voltage        0.1 V, absolute in keyframes, else delta mod 2^8
+    pump_frequency       0.1 Hz, absolute in keyframes, else delta mod 2^8
+    fan_speed            rpm, absolute in keyframes, else delta mod 2^16
+
+Records before the first keyframe cannot be decoded and are skipped. The
+samples can be written as a capture file (.vcap) with synthesized frames, so
+plot_frame.py and the other tools read them like any capture.
+
+Usage:
+    python software/telemetry_dump.py http://heater.local/vevorheater/vevor_heater/telemetry -o outage.vcap
+    python software/telemetry_dump.py telemetry.bin --csv telemetry.csv
+"""
+
+import argparse
+import struct
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+import vevor_protocol as vp
+from vevor_protocol.bulk import LONG_DTYPE, SHORT_DTYPE, set_checksums
+from plot_frame import FrameMatrices
+
+################################################################################
+# Constants
+################################################################################
+
+DUMP_MAGIC = b"VHTL"
+DUMP_VERSION = 1
+
+# magic, version, record size, dt unit [ms], record count, newest record uptime [ms]
+DUMP_HEADER = struct.Struct("<4sBBHII")
+
+RECORD_DTYPE = np.dtype([
+    ("header", "u1"),
+    ("dt", "u1"),
+    ("heat_exchanger_temp", "<u2"),
+    ("input_voltage", "u1"),
+    ("pump_frequency", "u1"),
+    ("fan_speed", "<u2"),
+])
+
+KEYFRAME = 0x80
+
+# The firmware answers 503 until its main loop has taken a snapshot of the ring
+SNAPSHOT_RETRIES = 5
+
+# The firmware's dt saturates at 255 units of 100 ms, longer pauses are gaps
+GAP_S = 25.5
+
+# Delta-encoded fields and their width mask
+DELTA_FIELDS = {
+    "heat_exchanger_temp": 0xFFFF,
+    "input_voltage": 0xFF,
+    "pump_frequency": 0xFF,
+    "fan_speed": 0xFFFF,
+}
+
+# Decoded samples, in long frame units; time is device uptime [s]
+SAMPLE_DTYPE = np.dtype([
+    ("time", "<f8"),
+    ("state", "u1"),
+    ("level", "u1"),
+    ("heat_exchanger_temp", "<u2"),
+    ("input_voltage", "u1"),
+    ("pump_frequency", "u1"),
+    ("fan_speed", "<u2"),
+])
+
+################################################################################
+# Decoding
+################################################################################
+
+def read_source(source: str) -> bytes:
+    """
+    Read a dump from an http(s) URL, a file, or stdin ("-").
+    """
+    if source.startswith(("http://", "https://")):
+        for attempt in range(SNAPSHOT_RETRIES + 1):
+            try:
+                with urllib.request.urlopen(source, timeout=30) as response:
+                    return response.read()
+            except urllib.error.HTTPError as e:
+                if e.code != 503 or attempt == SNAPSHOT_RETRIES:
+                    raise
+                time.sleep(float(e.headers.get("Retry-After", 1)))
+    if source == "-":
+        return sys.stdin.buffer.read()
+    with open(source, "rb") as f:
+        return f.read()
+
+def decode_dump(data: bytes) -> np.ndarray:
+    """
+    Decode a dump into an array of SAMPLE_DTYPE, oldest first.
+    """
+    if len(data) < DUMP_HEADER.size:
+        raise ValueError("truncated telemetry dump")
+    magic, version, record_size, dt_unit_ms, count, newest_ms = DUMP_HEADER.unpack_from(data)
+    if magic != DUMP_MAGIC:
+        raise ValueError("not a telemetry dump")
+    if version != DUMP_VERSION or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"unsupported telemetry dump version {version}")
+    records = np.frombuffer(data, dtype=RECORD_DTYPE, count=count, offset=DUMP_HEADER.size)
+
+    keyframes = np.flatnonzero(records["header"] & KEYFRAME)
+    if len(keyframes) == 0:
+        return np.empty(0, dtype=SAMPLE_DTYPE)
+    records = records[keyframes[0]:]
+    is_key = (records["header"] & KEYFRAME) != 0
+    # Index of the keyframe each record belongs to
+    segment = np.cumsum(is_key) - 1
+    key_rows = np.flatnonzero(is_key)
+
+    samples = np.empty(len(records), dtype=SAMPLE_DTYPE)
+    samples["state"] = (records["header"] >> 4) & 0x07
+    samples["level"] = records["header"] & 0x0F
+    for field, mask in DELTA_FIELDS.items():
+        # Keyframes are absolute, so a running sum restarted at every
+        # keyframe gives the value modulo the field width
+        values = records[field].astype(np.int64)
+        total = np.cumsum(values)
+        base = total[key_rows] - values[key_rows]
+        samples[field] = (total - base[segment]) & mask
+
+    elapsed = np.cumsum(records["dt"].astype(np.float64)) * dt_unit_ms / 1000.0
+    samples["time"] = newest_ms / 1000.0 - (elapsed[-1] - elapsed)
+    return samples
+
+def to_frame_matrices(samples: np.ndarray) -> FrameMatrices:
+    """
+    Synthesize the controller and heater frames of every sample. Fields not
+    kept in the telemetry buffer are zero; requests carry the level and a
+    running or off request matching the state.
+    """
+    n = len(samples)
+    response = np.zeros(n, dtype=LONG_DTYPE)
+    response["start"] = vp.START_BYTE
+    response["device"] = vp.HEATER_ID
+    response["command"] = 0x02
+    response["length"] = vp.LONG_LENGTH
+    response["enabled"] = samples["state"] != vp.HeaterState.OFF
+    for field in ("state", "level", "heat_exchanger_temp", "input_voltage", "pump_frequency", "fan_speed"):
+        response[field] = samples[field]
+
+    request = np.zeros(n, dtype=SHORT_DTYPE)
+    request["start"] = vp.START_BYTE
+    request["device"] = vp.CONTROLLER_ID
+    request["command"] = 0x02
+    request["length"] = vp.SHORT_LENGTH
+    request["level"] = samples["level"]
+    burning = np.isin(samples["state"], (vp.HeaterState.GLOW_PLUG_PRE_HEAT, vp.HeaterState.IGNITED,
+                                         vp.HeaterState.STABLE_COMBUSTION))
+    request["requested_state"] = np.where(burning, vp.RequestedState.RUNNING, vp.RequestedState.OFF)
+
+    matrices = []
+    for frames, length in ((request, vp.SHORT_FRAME_LEN), (response, vp.LONG_FRAME_LEN)):
+        matrix = frames.view(np.uint8).reshape(n, length)
+        set_checksums(matrix)
+        matrices.append(matrix)
+    return FrameMatrices(request=matrices[0], response=matrices[1])
+
+################################################################################
+# Main Script
+################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decode a VevorHeater telemetry dump.")
+    parser.add_argument("source", help="dump URL, file, or - for stdin")
+    parser.add_argument("-o", "--output", help="write the samples as a capture file (.vcap)")
+    parser.add_argument("--csv", help="write the samples as CSV")
+    parser.add_argument("--save", help="keep the raw dump in this file")
+    args = parser.parse_args(argv)
+
+    data = read_source(args.source)
+    if args.save:
+        with open(args.save, "wb") as f:
+            f.write(data)
+    samples = decode_dump(data)
+    if len(samples) == 0:
+        print("No decodable telemetry records")
+        return
+
+    gaps = int(np.count_nonzero(np.diff(samples["time"]) >= GAP_S))
+    print(f"{len(samples)} samples, uptime {samples['time'][0]:.1f}-{samples['time'][-1]:.1f} s, "
+          f"{gaps} gap(s)")
+    states, counts = np.unique(samples["state"], return_counts=True)
+    for state, count in zip(states, counts):
+        name = vp.HeaterState(state).name if state in vp.HeaterState._value2member_map_ else str(state)
+        print(f"  {name}: {count}")
+
+    if args.csv:
+        np.savetxt(args.csv, samples, delimiter=",", header=",".join(SAMPLE_DTYPE.names), comments="",
+                   fmt=["%.1f"] + ["%d"] * (len(SAMPLE_DTYPE.names) - 1))
+        print(f"Wrote {args.csv}")
+    if args.output:
+        from capture_file import write_capture
+        count = write_capture(args.output, [to_frame_matrices(samples)], timestamps=samples["time"])
+        print(f"Wrote {count} cycles to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+One entry point for the capture analysis tools.
+
+    assemble  Saleae CSV exports to frame lists (assemble_frames.py)
+    stats     per-offset statistics of a capture (plot_frame.py --no-plot)
+    plot      decimated plots of a capture, on screen or as a report
+    export    a capture to the binary capture format (.vcap) or to CSV with
+              one scaled column per long frame field
+
+Each subcommand imports what it needs when it runs: NumPy for every command
+that reads captures, pandas only for assemble, Matplotlib only for plot. A
+statistics run on a small capture therefore starts as fast as NumPy
+imports. python -X importtime shows where the start-up time goes, and
+benchmark.py --stages startup times whole stats runs.
+
+Usage:
+    python software/vevor_analyze.py stats capture.txt
+    python software/vevor_analyze.py plot capture.vcap -o report.html
+    python software/vevor_analyze.py export heater.vfrm heater.vcap
+    python software/vevor_analyze.py export capture.txt.gz fields.csv
+    python software/vevor_analyze.py assemble input_csv_files/*.csv -d frames/
+    python -X importtime software/vevor_analyze.py stats capture.txt 2> imports.txt
+"""
+
+import argparse
+import sys
+
+################################################################################
+# Constants
+################################################################################
+
+EXPORT_SUFFIXES = (".vcap", ".csv")
+CAPTURE_HELP = "hex text capture (optionally .gz, - for stdin), .vcap capture or .vfrm frame stream"
+
+################################################################################
+# Subcommands
+################################################################################
+
+def cmd_assemble(args: argparse.Namespace) -> None:
+    import glob
+    from assemble_frames import assemble
+
+    assemble(args.inputs or sorted(glob.glob("input_csv_files/*.csv")), args.output_dir)
+
+def cmd_stats(args: argparse.Namespace) -> None:
+    from plot_frame import analyse_capture
+
+    if analyse_capture(args.capture, args.start, args.end) is None:
+        sys.exit(1)
+
+def cmd_plot(args: argparse.Namespace) -> None:
+    from plot_frame import REPORT_SUFFIXES, analyse_capture, plot_frames
+
+    if args.output and not args.output.endswith(REPORT_SUFFIXES):
+        print(f"--output must end in {' or '.join(REPORT_SUFFIXES)}", file=sys.stderr)
+        sys.exit(2)
+    single_bytes = analyse_capture(args.capture, args.start, args.end, keep_frames=True)
+    if single_bytes is None:
+        sys.exit(1)
+    plot_frames(single_bytes, args.output, args.layout)
+
+def cmd_export(args: argparse.Namespace) -> None:
+    from capture_file import convert, parse_time
+
+    try:
+        start_time = parse_time(args.start_time)
+    except argparse.ArgumentTypeError as e:
+        print(f"--start-time: {e}", file=sys.stderr)
+        sys.exit(2)
+    if args.output.endswith(".vcap"):
+        convert(args.capture, args.output, args.period, start_time)
+    else:
+        export_csv(args.capture, args.output, args.period, start_time)
+
+def export_csv(capture: str, output: str, period: float = 1.0, start_time: float = 0.0) -> int:
+    """
+    Write the timestamp and every long frame field, scaled to its unit, of
+    each cycle with a valid checksum. Returns the number of rows written.
+    Text captures are timestamped from start_time, one period per cycle.
+    """
+    import numpy as np
+
+    from capture_file import CAPTURE_SUFFIX, FRAME_STREAM_SUFFIX
+    from run_index import iter_timed_chunks
+    from vevor_protocol import DecoderStats
+    from vevor_protocol.bulk import checksums_ok, field_column
+    from vevor_protocol.fields import LONG_FRAME_FIELDS
+
+    errors = DecoderStats()
+    header = ",".join(["timestamp"] + [field.key for field in LONG_FRAME_FIELDS])
+    formats = ["%.3f"] + [f"%.{field.accuracy_decimals or 0}f" for field in LONG_FRAME_FIELDS]
+    offset = 0.0 if capture.endswith((CAPTURE_SUFFIX, FRAME_STREAM_SUFFIX)) else start_time
+    rows = 0
+    bad = 0
+    with open(output, "w") as f:
+        f.write(header + "\n")
+        for timestamps, response in iter_timed_chunks(capture, period, errors):
+            ok = checksums_ok(response)
+            bad += int(np.count_nonzero(~ok))
+            response = response[ok]
+            columns = [timestamps[ok] + offset]
+            columns += [field_column(response, field.key) * field.scale for field in LONG_FRAME_FIELDS]
+            np.savetxt(f, np.column_stack(columns), delimiter=",", fmt=formats)
+            rows += len(response)
+    print(f"Wrote {rows} cycles to {output}, skipped {bad} bad checksums and "
+          f"{errors.resyncs} unreadable line pairs")
+    return rows
+
+################################################################################
+# Main Script
+################################################################################
+
+def add_capture_arguments(command: argparse.ArgumentParser) -> None:
+    command.add_argument("capture", help=CAPTURE_HELP)
+    command.add_argument("--start", type=float, help="first timestamp [s] to analyse (binary captures only)")
+    command.add_argument("--end", type=float, help="timestamp [s] to stop before (binary captures only)")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Analyse Vevor heater bus captures.")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    assemble = commands.add_parser("assemble", help="assemble logic-analyzer CSV exports into frames")
+    assemble.add_argument("inputs", nargs="*", help="Saleae CSV exports (default: input_csv_files/*.csv)")
+    assemble.add_argument("-d", "--output-dir", default=".",
+                          help="directory for frames_length_0x0B.csv and frames_other.csv (default: .)")
+    assemble.set_defaults(run=cmd_assemble)
+
+    stats = commands.add_parser("stats", help="print per-offset statistics of a capture")
+    add_capture_arguments(stats)
+    stats.set_defaults(run=cmd_stats)
+
+    plot = commands.add_parser("plot", help="plot every offset of a capture")
+    add_capture_arguments(plot)
+    plot.add_argument("--layout", choices=("browse", "subplots"), default="browse",
+                      help="browse: one decimated plot with a field selector (default); "
+                           "subplots: every field in its own subplot, every frame drawn")
+    plot.add_argument("-o", "--output", help="write a .png or .html report instead of showing the plots")
+    plot.set_defaults(run=cmd_plot)
+
+    export = commands.add_parser("export", help="convert a capture to .vcap or to a CSV of decoded fields")
+    export.add_argument("capture", help=CAPTURE_HELP)
+    export.add_argument("output", help=f"file to write, ending in {' or '.join(EXPORT_SUFFIXES)}")
+    export.add_argument("--period", type=float, default=1.0,
+                        help="seconds between cycles of a text capture (default 1.0)")
+    export.add_argument("--start-time", default="0",
+                        help="timestamp of the first cycle of a text capture, seconds or an ISO date/time "
+                             "(default 0)")
+    export.set_defaults(run=cmd_export)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "export" and not args.output.endswith(EXPORT_SUFFIXES):
+        parser.error(f"export output must end in {' or '.join(EXPORT_SUFFIXES)}")
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
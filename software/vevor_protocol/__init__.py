@@ -0,0 +1,60 @@
+"""
+Reference implementation of the Vevor heater bus protocol.
+
+Frame layouts, checksum and controller frame encoding live here so the
+analysis tools and the firmware code generation share one definition.
+Bulk decoding into NumPy arrays lives in vevor_protocol.bulk, the incremental
+byte-stream decoder shared with the firmware in vevor_protocol.stream, the
+long frame fields the firmware publishes as sensors in vevor_protocol.fields.
+"""
+
+from .frames import (
+    START_BYTE,
+    CONTROLLER_ID,
+    HEATER_ID,
+    SHORT_LENGTH,
+    LONG_LENGTH,
+    SHORT_FRAME_LEN,
+    LONG_FRAME_LEN,
+    LENGTH_OFFSET,
+    SHORT_STRUCT,
+    LONG_STRUCT,
+    HeaterState,
+    RequestedState,
+    ShortFrame,
+    LongFrame,
+    frame_length,
+    checksum,
+    verify_checksum,
+    decode_short,
+    decode_long,
+    decode,
+    encode_controller_frame,
+)
+from .stream import DecoderStats, FrameDecoder
+
+__all__ = [
+    "START_BYTE",
+    "CONTROLLER_ID",
+    "HEATER_ID",
+    "SHORT_LENGTH",
+    "LONG_LENGTH",
+    "SHORT_FRAME_LEN",
+    "LONG_FRAME_LEN",
+    "LENGTH_OFFSET",
+    "SHORT_STRUCT",
+    "LONG_STRUCT",
+    "HeaterState",
+    "RequestedState",
+    "ShortFrame",
+    "LongFrame",
+    "frame_length",
+    "checksum",
+    "verify_checksum",
+    "decode_short",
+    "decode_long",
+    "decode",
+    "encode_controller_frame",
+    "DecoderStats",
+    "FrameDecoder",
+]
@@ -0,0 +1,95 @@
+"""
+Vectorized decoding of many frames at once with NumPy.
+
+The structured dtypes mirror SHORT_STRUCT and LONG_STRUCT, so a buffer of
+back-to-back frames (or a uint8 matrix with one frame per row) is decoded
+by viewing it, not by copying it.
+"""
+
+import numpy as np
+
+from .frames import (
+    CHECKSUM_START,
+    LONG_FRAME_LEN,
+    LONG_STRUCT,
+    SHORT_FRAME_LEN,
+    SHORT_STRUCT,
+    LongFrame,
+    ShortFrame,
+)
+from .fields import FIELDS_BY_KEY
+
+def _dtype_for(struct_, fields, itemsize: int) -> np.dtype:
+    """
+    Build a structured dtype with one entry per named field of a Struct.
+    """
+    names, formats, offsets = [], [], []
+    fmt = struct_.format.lstrip(">")
+    offset = 0
+    field = iter(fields)
+    i = 0
+    while i < len(fmt):
+        count = ""
+        while fmt[i].isdigit():
+            count += fmt[i]
+            i += 1
+        code = fmt[i]
+        i += 1
+        repeat = int(count) if count else 1
+        if code == "x":
+            offset += repeat
+            continue
+        size = 1 if code == "B" else 2
+        for _ in range(repeat):
+            names.append(next(field))
+            formats.append("u1" if code == "B" else ">u2")
+            offsets.append(offset)
+            offset += size
+    return np.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": itemsize})
+
+SHORT_DTYPE = _dtype_for(SHORT_STRUCT, ShortFrame._fields, SHORT_FRAME_LEN)
+LONG_DTYPE = _dtype_for(LONG_STRUCT, LongFrame._fields, LONG_FRAME_LEN)
+
+def _as_records(frames, dtype: np.dtype) -> np.ndarray:
+    if isinstance(frames, np.ndarray) and frames.ndim == 2:
+        frames = np.ascontiguousarray(frames, dtype=np.uint8)
+        return frames.view(dtype).reshape(-1)
+    return np.frombuffer(frames, dtype=dtype)
+
+def decode_short_frames(frames) -> np.ndarray:
+    """
+    View back-to-back short frames (bytes or a (n, 16) uint8 matrix) as records.
+    """
+    return _as_records(frames, SHORT_DTYPE)
+
+def decode_long_frames(frames) -> np.ndarray:
+    """
+    View back-to-back long frames (bytes or a (n, 56) uint8 matrix) as records.
+    """
+    return _as_records(frames, LONG_DTYPE)
+
+def _checksums(matrix: np.ndarray) -> np.ndarray:
+    return matrix[:, CHECKSUM_START:-1].sum(axis=1, dtype=np.uint32) & 0xFF
+
+def checksums_ok(matrix: np.ndarray) -> np.ndarray:
+    """
+    Boolean mask of rows in a (n, frame length) uint8 matrix with a valid checksum.
+    """
+    return _checksums(matrix) == matrix[:, -1]
+
+def set_checksums(matrix: np.ndarray) -> None:
+    """
+    Write the checksum of every row of a (n, frame length) uint8 matrix into its last byte.
+    """
+    matrix[:, -1] = _checksums(matrix)
+
+def field_column(matrix: np.ndarray, key: str) -> np.ndarray:
+    """
+    Raw, unscaled values of a long frame field for every row of a (n, 56) uint8 matrix.
+    """
+    field = FIELDS_BY_KEY[key]
+    if field.width == 1:
+        values = matrix[:, field.offset]
+        return values.view(np.int8) if field.signed else values
+    values = (matrix[:, field.offset].astype(np.uint16) << 8) | matrix[:, field.offset + 1]
+    return values.view(np.int16) if field.signed else values
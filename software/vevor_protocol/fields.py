@@ -0,0 +1,41 @@
+"""
+Long frame fields published by the firmware as sensors.
+
+The table lives next to the ESPHome component, in
+firmware/esphome/components/vevorheater/long_frame_fields.py, where it
+generates the sensor options and the C++ descriptor table. It is loaded from
+there, so the analysis tools label and scale fields the same way.
+"""
+
+import importlib.util
+from pathlib import Path
+
+_TABLE_PATH = (Path(__file__).resolve().parents[2] / "firmware" / "esphome" / "components" / "vevorheater"
+               / "long_frame_fields.py")
+
+def _load_table():
+    spec = importlib.util.spec_from_file_location("vevorheater_long_frame_fields", _TABLE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+_table = _load_table()
+
+LongFrameField = _table.LongFrameField
+LONG_FRAME_FIELDS = _table.LONG_FRAME_FIELDS
+
+# First byte offset -> field
+FIELDS_BY_OFFSET = {field.offset: field for field in LONG_FRAME_FIELDS}
+
+# Key -> field
+FIELDS_BY_KEY = {field.key: field for field in LONG_FRAME_FIELDS}
+
+def field_label(offset: int) -> str:
+    """
+    Name and raw unit of the field starting at a long frame offset, "" if unknown.
+    """
+    field = FIELDS_BY_OFFSET.get(offset)
+    if field is None:
+        return ""
+    unit = f"{field.scale:g} {field.unit or ''}".strip() if field.scale != 1 else field.unit
+    return f"{field.name} [{unit}]" if unit else field.name
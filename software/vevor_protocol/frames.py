@@ -0,0 +1,222 @@
+"""
+Frame layouts, checksum and encoding for the Vevor heater bus.
+
+Both directions use the same framing:
+    0:       0xAA         identifier
+    1:       device ID    (controller 0x66, heater 0x77)
+    2:       command?     (0x02: get state, 0x06: start up / shut down)
+    3:       length field (0x0B for controller->heater, 0x33 for heater->controller)
+    ...      payload
+    N-1:     checksum     (sum of bytes 2..N-2, modulo 256)
+
+The frame is length field + 5 bytes long: 16 bytes short, 56 bytes long.
+"""
+
+import struct
+from enum import IntEnum
+from typing import NamedTuple, Union
+
+################################################################################
+# Constants
+################################################################################
+
+START_BYTE = 0xAA
+CONTROLLER_ID = 0x66
+HEATER_ID = 0x77
+
+SHORT_LENGTH = 0x0B  # controller -> main unit
+LONG_LENGTH = 0x33   # main unit -> controller
+
+SHORT_FRAME_LEN = SHORT_LENGTH + 5
+LONG_FRAME_LEN = LONG_LENGTH + 5
+
+# Offset of the length field, which gives the frame size (see frame_length)
+LENGTH_OFFSET = 3
+
+# Offset of the first checksummed byte
+CHECKSUM_START = 2
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+class HeaterState(IntEnum):
+    """
+    Long frame byte 5, mirrors VevorHeaterState in the firmware.
+    """
+    OFF = 0x00
+    GLOW_PLUG_PRE_HEAT = 0x01
+    IGNITED = 0x02
+    STABLE_COMBUSTION = 0x03
+    STOPPING_COOLING = 0x04
+
+class RequestedState(IntEnum):
+    """
+    Short frame byte 9, mirrors VevorHeaterShortFrameState in the firmware.
+    """
+    OFF = 0x02
+    SET_OFF = 0x05
+    SET_ON = 0x06
+    RUNNING = 0x08
+
+################################################################################
+# Frame Layouts
+################################################################################
+
+## short frame controller->main unit
+# 0-3:           header
+# 4-7:   0x00    unknown
+# 8:     1-10    power level [level]
+# 9:     2,5,6,8 requested state [RequestedState]
+# 10-14: 0x00    unknown
+# 15:    1-255   checksum
+SHORT_STRUCT = struct.Struct(">BBBB4xBB5xB")
+
+class ShortFrame(NamedTuple):
+    start: int
+    device: int
+    command: int
+    length: int
+    level: int
+    requested_state: int
+    checksum: int
+
+## long frame main unit->controller
+# 0-3:           header
+# 4:     0-1     heater enabled?
+# 5:     0-4     state [HeaterState]
+# 6:     1-10    power level [level]
+# 7:     0-9     error code, 90% certain per the README byte table (5.2)
+# 8:     0x00, 0x03  0x03 if running, 0x00 if stopped
+# 9:     0x00, 0xFB  0xFB if running, 0x00 if stopped
+# 10:    0x00    unknown
+# 11:    153-158 input voltage [V * 10]
+# 12:    0x00    unknown
+# 13:    0-12    glow plug current [A]
+# 14:    0-1     cooling down [0/1]
+# 15:    0-16    fan voltage? some temperature? [V]
+# 16-17: 480-1630 heat exchanger temperature [°C * 10]
+# 18-19: 0x00    unknown
+# 20-21: 0-325   state duration [s]
+# 22:    0x00    unknown
+# 23:    0-51    pump frequency [Hz * 10]
+# 24-27: ...     glow plug voltage/current/temperature
+# 28-29: 0-3939  fan speed [rpm]
+# 30-45: 0x00    unknown
+# 46-49: 35, 4, 17, 35  unknown constants
+# 50:    0x00    unknown
+# 51:    30, 40  unknown
+# 52-53: 0-420   something glow plug related
+# 54:    0x00    unknown
+# 55:    1-254   checksum
+LONG_STRUCT = struct.Struct(">BBBBBBBBBBxBxBBBHxxHxBBBBBH16xBBBBxBHxB")
+
+class LongFrame(NamedTuple):
+    start: int
+    device: int
+    command: int
+    length: int
+    enabled: int
+    state: int
+    level: int
+    error: int
+    byte_8: int
+    byte_9: int
+    input_voltage: int
+    glow_plug_current: int
+    cooling_down: int
+    fan_voltage: int
+    heat_exchanger_temp: int
+    state_duration: int
+    pump_frequency: int
+    glow_plug_voltage: int
+    glow_plug_current_2: int
+    glow_plug_temperature: int
+    glow_plug_misc: int
+    fan_speed: int
+    byte_46: int
+    byte_47: int
+    byte_48: int
+    byte_49: int
+    byte_51: int
+    glow_plug_related: int
+    checksum: int
+
+assert SHORT_STRUCT.size == SHORT_FRAME_LEN
+assert LONG_STRUCT.size == LONG_FRAME_LEN
+
+################################################################################
+# Decoding
+################################################################################
+
+def frame_length(length_field: int) -> int:
+    """
+    Total frame size for a length field value, 0 if the value is unknown.
+    """
+    if length_field == SHORT_LENGTH:
+        return SHORT_FRAME_LEN
+    if length_field == LONG_LENGTH:
+        return LONG_FRAME_LEN
+    return 0
+
+def checksum(frame: Buffer, size: int = None) -> int:
+    """
+    Checksum of a frame: sum of bytes 2..N-2, modulo 256.
+    The last byte of the frame (the checksum itself) is not included.
+    """
+    if size is None:
+        size = len(frame)
+    if size < 4:
+        return 0
+    return sum(memoryview(frame)[CHECKSUM_START:size - 1]) & 0xFF
+
+def verify_checksum(frame: Buffer) -> bool:
+    """
+    True if the last byte of the frame matches its checksum.
+    """
+    return len(frame) >= 4 and checksum(frame) == frame[-1]
+
+def decode_short(buffer: Buffer, offset: int = 0) -> ShortFrame:
+    """
+    Decode a short frame in place, without copying the buffer.
+    """
+    return ShortFrame._make(SHORT_STRUCT.unpack_from(buffer, offset))
+
+def decode_long(buffer: Buffer, offset: int = 0) -> LongFrame:
+    """
+    Decode a long frame in place, without copying the buffer.
+    """
+    return LongFrame._make(LONG_STRUCT.unpack_from(buffer, offset))
+
+def decode(buffer: Buffer, offset: int = 0) -> Union[ShortFrame, LongFrame]:
+    """
+    Decode the frame starting at offset, choosing the layout by its length field.
+    Raises ValueError for a bad start byte, unknown length field or a truncated frame.
+    """
+    view = memoryview(buffer)
+    if len(view) <= offset + LENGTH_OFFSET or view[offset] != START_BYTE:
+        raise ValueError("not a frame start")
+    length_field = view[offset + LENGTH_OFFSET]
+    size = frame_length(length_field)
+    if size == 0:
+        raise ValueError(f"unknown length field 0x{length_field:02X}")
+    if len(view) < offset + size:
+        raise ValueError("truncated frame")
+    if length_field == SHORT_LENGTH:
+        return decode_short(view, offset)
+    return decode_long(view, offset)
+
+################################################################################
+# Encoding
+################################################################################
+
+def encode_controller_frame(requested_state: int, level: int, command: int = None) -> bytes:
+    """
+    Build a controller -> main unit short frame with a valid checksum.
+    level is the power level 1-10. The command byte defaults to 0x06 when the
+    heater is asked to change state (SET_ON, SET_OFF) and 0x02 otherwise.
+    """
+    if command is None:
+        command = 0x06 if requested_state in (RequestedState.SET_ON, RequestedState.SET_OFF) else 0x02
+    frame = bytearray(SHORT_STRUCT.pack(START_BYTE, CONTROLLER_ID, command, SHORT_LENGTH,
+                                        level, requested_state, 0))
+    frame[-1] = checksum(frame)
+    return bytes(frame)
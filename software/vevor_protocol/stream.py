@@ -0,0 +1,113 @@
+"""
+Incremental byte-stream frame decoder.
+
+Python twin of FrameDecoder in firmware/esphome/components/vevorheater/frame_decoder.h,
+so the firmware state machine can be fuzzed on the host against captured logs.
+Keep the two in step.
+"""
+
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+from .frames import CONTROLLER_ID, HEATER_ID, LENGTH_OFFSET, START_BYTE, checksum, frame_length
+
+_NEED_MORE, _COMPLETE, _BAD_CHECKSUM, _INVALID = range(4)
+
+@dataclass
+class DecoderStats:
+    frames: int = 0
+    checksum_errors: int = 0
+    resyncs: int = 0
+    dropped_bytes: int = 0
+
+class FrameDecoder:
+    """
+    Splits a byte stream into frames using the start byte, device ID and
+    length field; a frame is complete as soon as its last byte arrives.
+    Frames with a bad checksum are dropped and the stream is rescanned from
+    the byte after their start. A frame is always cut to the size its length
+    field gives; bytes buffered behind it are scanned for the next frame.
+    """
+
+    def __init__(self):
+        self.buf = bytearray()
+        # Size of the frame at the start of buf returned last, 0 if none
+        self.frame_len = 0
+        self.stats = DecoderStats()
+
+    def reset(self) -> None:
+        self.buf.clear()
+        self.frame_len = 0
+
+    def _check_prefix(self) -> int:
+        buf = self.buf
+        if buf[0] != START_BYTE:
+            return _INVALID
+        if len(buf) < 2:
+            return _NEED_MORE
+        if buf[1] != CONTROLLER_ID and buf[1] != HEATER_ID:
+            return _INVALID
+        if len(buf) <= LENGTH_OFFSET:
+            return _NEED_MORE
+        expected = frame_length(buf[LENGTH_OFFSET])
+        if expected == 0:
+            return _INVALID
+        if len(buf) < expected:
+            return _NEED_MORE
+        if checksum(buf, expected) != buf[expected - 1]:
+            return _BAD_CHECKSUM
+        return _COMPLETE
+
+    def _drop_candidate(self) -> None:
+        if self.buf[0] == START_BYTE:
+            self.stats.resyncs += 1
+        else:
+            self.stats.dropped_bytes += 1
+        del self.buf[0]
+
+    def _consume(self) -> None:
+        if self.frame_len:
+            del self.buf[:self.frame_len]
+            self.frame_len = 0
+
+    def _scan(self):
+        buf = self.buf
+        while buf:
+            result = self._check_prefix()
+            if result == _NEED_MORE:
+                return None
+            if result == _COMPLETE:
+                self.frame_len = frame_length(buf[LENGTH_OFFSET])
+                self.stats.frames += 1
+                return bytes(buf[:self.frame_len])
+            if result == _BAD_CHECKSUM:
+                self.stats.checksum_errors += 1
+            self._drop_candidate()
+        return None
+
+    def push(self, byte: int):
+        """
+        Feed one byte. Returns the completed frame as bytes, or None.
+        """
+        self._consume()
+        self.buf.append(byte)
+        return self._scan()
+
+    def next(self):
+        """
+        Another complete frame among the bytes buffered behind the frame
+        returned last, or None. Call after push() returned a frame until it
+        returns None, or the frame is returned by the next push().
+        """
+        self._consume()
+        return self._scan()
+
+    def feed(self, data: Iterable[int]) -> Iterator[bytes]:
+        """
+        Feed a chunk of bytes and yield every frame it completes.
+        """
+        for byte in data:
+            frame = self.push(byte)
+            while frame is not None:
+                yield frame
+                frame = self.next()